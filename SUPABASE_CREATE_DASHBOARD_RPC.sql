@@ -0,0 +1,58 @@
+-- RPC: create a dashboard and its fields in one round trip
+-- Run this in Supabase SQL Editor after SUPABASE_CREATE_DASHBOARDS.sql
+
+-- Inserts the dashboard, bulk-inserts its fields and returns the joined row
+-- in the same shape as select('*, dashboard_fields(*)'). Runs in a single
+-- transaction, so a failed field insert never leaves a dangling dashboard.
+CREATE OR REPLACE FUNCTION create_dashboard_with_fields(p JSONB)
+RETURNS SETOF JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  new_id INTEGER;
+BEGIN
+  INSERT INTO dashboards (name, description, workflow_id, instance_id, theme_color)
+  VALUES (
+    p->>'name',
+    p->>'description',
+    p->>'workflow_id',
+    (p->>'instance_id')::UUID,
+    COALESCE(p->>'theme_color', 'blue')
+  )
+  RETURNING id INTO new_id;
+
+  INSERT INTO dashboard_fields (dashboard_id, name, label, type, required, default_value, description, options)
+  SELECT
+    new_id,
+    f.name,
+    f.label,
+    f.type,
+    COALESCE(f.required, false),
+    f.default_value,
+    f.description,
+    NULLIF(f.options, 'null'::JSONB)
+  FROM jsonb_to_recordset(COALESCE(p->'fields', '[]'::JSONB)) AS f(
+    name VARCHAR(255),
+    label VARCHAR(255),
+    type VARCHAR(50),
+    required BOOLEAN,
+    default_value TEXT,
+    description TEXT,
+    options JSONB
+  );
+
+  RETURN QUERY
+  SELECT to_jsonb(d) || jsonb_build_object(
+    'dashboard_fields',
+    COALESCE(
+      (SELECT jsonb_agg(to_jsonb(df) ORDER BY df.id) FROM dashboard_fields df WHERE df.dashboard_id = d.id),
+      '[]'::JSONB
+    )
+  )
+  FROM dashboards d
+  WHERE d.id = new_id;
+END;
+$$;
+
+-- Verify function created
+SELECT 'create_dashboard_with_fields created successfully!' as status;
@@ -0,0 +1,76 @@
+-- Execution summaries for list views
+-- Run this in Supabase SQL Editor after SUPABASE_MIGRATION.sql
+--
+-- A narrow copy of execution_logs without the JSONB payloads, kept in sync
+-- by a trigger. GET /api/v1/executions reads it for plain list/count views;
+-- search and include_data still read execution_logs.
+
+CREATE TABLE IF NOT EXISTS execution_summaries (
+  run_id UUID PRIMARY KEY REFERENCES execution_logs(run_id) ON DELETE CASCADE,
+  workflow_id VARCHAR(255) NOT NULL,
+  workflow_name VARCHAR(255),
+  instance_id UUID,
+  status VARCHAR(20) NOT NULL,
+  error_message TEXT,
+  created_at TIMESTAMP WITH TIME ZONE,
+  started_at TIMESTAMP WITH TIME ZONE,
+  completed_at TIMESTAMP WITH TIME ZONE
+);
+
+-- Indexes for performance
+CREATE INDEX IF NOT EXISTS idx_execution_summaries_created_at ON execution_summaries(created_at DESC, run_id DESC);
+CREATE INDEX IF NOT EXISTS idx_execution_summaries_status ON execution_summaries(status, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_execution_summaries_filter ON execution_summaries(workflow_id, instance_id, status, created_at DESC);
+
+-- Copy the summary columns on every insert and on updates that touch them
+CREATE OR REPLACE FUNCTION sync_execution_summary()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO execution_summaries (
+        run_id, workflow_id, workflow_name, instance_id, status,
+        error_message, created_at, started_at, completed_at
+    )
+    VALUES (
+        NEW.run_id, NEW.workflow_id, NEW.workflow_name, NEW.instance_id, NEW.status,
+        NEW.error_message, NEW.created_at, NEW.started_at, NEW.completed_at
+    )
+    ON CONFLICT (run_id) DO UPDATE SET
+        workflow_id = EXCLUDED.workflow_id,
+        workflow_name = EXCLUDED.workflow_name,
+        instance_id = EXCLUDED.instance_id,
+        status = EXCLUDED.status,
+        error_message = EXCLUDED.error_message,
+        created_at = EXCLUDED.created_at,
+        started_at = EXCLUDED.started_at,
+        completed_at = EXCLUDED.completed_at;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS sync_execution_summaries ON execution_logs;
+CREATE TRIGGER sync_execution_summaries
+    AFTER INSERT OR UPDATE OF workflow_id, workflow_name, instance_id, status,
+        error_message, created_at, started_at, completed_at
+    ON execution_logs
+    FOR EACH ROW EXECUTE FUNCTION sync_execution_summary();
+
+-- Backfill existing runs
+INSERT INTO execution_summaries (
+    run_id, workflow_id, workflow_name, instance_id, status,
+    error_message, created_at, started_at, completed_at
+)
+SELECT
+    run_id, workflow_id, workflow_name, instance_id, status,
+    error_message, created_at, started_at, completed_at
+FROM execution_logs
+ON CONFLICT (run_id) DO NOTHING;
+
+-- Enable Row Level Security (for future multi-tenancy)
+ALTER TABLE execution_summaries ENABLE ROW LEVEL SECURITY;
+
+-- For MVP: Allow all access (no authentication)
+-- TODO: Replace with proper policies when adding auth
+DROP POLICY IF EXISTS "Allow all for MVP execution_summaries" ON execution_summaries;
+CREATE POLICY "Allow all for MVP execution_summaries" ON execution_summaries FOR ALL USING (true) WITH CHECK (true);
+
+SELECT 'Execution summaries created successfully!' AS status;
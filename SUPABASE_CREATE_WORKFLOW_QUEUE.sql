@@ -0,0 +1,59 @@
+-- Workflow execution queue (pgmq / Supabase Queues)
+-- Run this in Supabase SQL Editor
+
+-- Enable pgmq (Supabase: Database > Extensions > pgmq, or run below)
+CREATE EXTENSION IF NOT EXISTS pgmq;
+
+-- Queue consumed by the workflow worker (backend/api/workflow_worker.py)
+SELECT pgmq.create('workflows');
+
+-- PostgREST only exposes the public schema, so wrap the pgmq calls the
+-- backend needs. Restricted to the service role.
+CREATE OR REPLACE FUNCTION pgmq_send(queue_name TEXT, msg JSONB, delay INTEGER DEFAULT 0)
+RETURNS SETOF BIGINT
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path = ''
+AS $$
+  SELECT * FROM pgmq.send(queue_name, msg, delay);
+$$;
+
+CREATE OR REPLACE FUNCTION pgmq_read(queue_name TEXT, vt INTEGER, qty INTEGER)
+RETURNS SETOF pgmq.message_record
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path = ''
+AS $$
+  SELECT * FROM pgmq.read(queue_name, vt, qty);
+$$;
+
+CREATE OR REPLACE FUNCTION pgmq_delete(queue_name TEXT, msg_ids BIGINT[])
+RETURNS SETOF BIGINT
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path = ''
+AS $$
+  SELECT * FROM pgmq.delete(queue_name, msg_ids);
+$$;
+
+CREATE OR REPLACE FUNCTION pgmq_archive(queue_name TEXT, msg_ids BIGINT[])
+RETURNS SETOF BIGINT
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path = ''
+AS $$
+  SELECT * FROM pgmq.archive(queue_name, msg_ids);
+$$;
+
+REVOKE EXECUTE ON FUNCTION pgmq_send(TEXT, JSONB, INTEGER) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION pgmq_read(TEXT, INTEGER, INTEGER) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION pgmq_delete(TEXT, BIGINT[]) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION pgmq_archive(TEXT, BIGINT[]) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION pgmq_send(TEXT, JSONB, INTEGER) TO service_role;
+GRANT EXECUTE ON FUNCTION pgmq_read(TEXT, INTEGER, INTEGER) TO service_role;
+GRANT EXECUTE ON FUNCTION pgmq_delete(TEXT, BIGINT[]) TO service_role;
+GRANT EXECUTE ON FUNCTION pgmq_archive(TEXT, BIGINT[]) TO service_role;
+
+-- Verify queue created
+SELECT 'Workflow queue created successfully!' as status;
+SELECT queue_name FROM pgmq.list_queues() WHERE queue_name = 'workflows';
@@ -0,0 +1,14 @@
+-- Indexes backing GET /api/v1/executions filters
+-- Run this in Supabase SQL Editor.
+-- CREATE INDEX CONCURRENTLY cannot run inside a transaction block, so run
+-- each statement on its own (highlight it and click Run).
+
+-- Filtered history: equality columns first, then the sort key so the
+-- ORDER BY created_at DESC page is read straight off the index
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_execution_logs_filter
+  ON execution_logs (workflow_id, instance_id, status, created_at DESC);
+
+-- Hot path: runs that are still in flight
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_execution_logs_in_flight
+  ON execution_logs (created_at DESC)
+  WHERE status IN ('pending', 'running');
@@ -0,0 +1,110 @@
+"""
+In-process cache of active n8n instance records.
+
+Every workflow request and every queued run resolves its instance (url +
+API key) before calling n8n. Instances change rarely, so the record is kept
+briefly per process and dropped when the instance is created or deactivated
+through the API.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+from cachetools import TTLCache
+
+# Columns needed to talk to an instance
+INSTANCE_COLUMNS = 'id,url,api_key_encrypted'
+
+_instances: TTLCache = TTLCache(maxsize=512, ttl=60)
+_fetch_locks: Dict[str, asyncio.Lock] = {}
+
+
+async def cached_instance(
+    instance_id: str,
+    fetch: Callable[[], Awaitable[Optional[Dict[str, Any]]]]
+) -> Optional[Dict[str, Any]]:
+    """
+    Return the active instance record, calling `fetch` on a cache miss.
+    
+    Concurrent misses for the same instance wait on a shared lock so only
+    one fetch reaches the database. Missing or inactive instances are not
+    cached.
+    
+    Args:
+        instance_id: ID of the n8n instance
+        fetch: Coroutine function returning the active row with
+            INSTANCE_COLUMNS, or None if there is none
+    
+    Returns:
+        Dict with id, url and api_key_encrypted, or None if not found
+    """
+    instance_id = str(instance_id)
+    instance = _instances.get(instance_id)
+    if instance is not None:
+        return instance
+    
+    lock = _fetch_locks.setdefault(instance_id, asyncio.Lock())
+    try:
+        async with lock:
+            instance = _instances.get(instance_id)
+            if instance is None:
+                instance = await fetch()
+                if instance is None:
+                    return None
+                _instances[instance_id] = instance
+            return instance
+    finally:
+        if not lock.locked() and _fetch_locks.get(instance_id) is lock:
+            del _fetch_locks[instance_id]
+
+
+async def get_active_instance(supabase, instance_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Return the active instance record, from cache when possible.
+    
+    Args:
+        supabase: Async Supabase client
+        instance_id: ID of the n8n instance
+    
+    Returns:
+        Dict with id, url and api_key_encrypted, or None if not found
+    """
+    async def fetch() -> Optional[Dict[str, Any]]:
+        response = await (
+            supabase.table('instances')
+            .select(INSTANCE_COLUMNS)
+            .eq('id', instance_id)
+            .eq('is_active', True)
+            .execute()
+        )
+        return response.data[0] if response.data else None
+    
+    return await cached_instance(instance_id, fetch)
+
+
+@asynccontextmanager
+async def updating_instance(instance_id: str) -> AsyncIterator[None]:
+    """
+    Hold the instance's fetch lock while its row is written.
+
+    A lookup already in flight finishes first, and lookups that arrive
+    during the write wait for it, so neither can cache the pre-write row.
+    The cached entry is dropped before the lock is released.
+    """
+    instance_id = str(instance_id)
+    lock = _fetch_locks.setdefault(instance_id, asyncio.Lock())
+    try:
+        async with lock:
+            try:
+                yield
+            finally:
+                _instances.pop(instance_id, None)
+    finally:
+        if not lock.locked() and _fetch_locks.get(instance_id) is lock:
+            del _fetch_locks[instance_id]
+
+
+def invalidate_instance(instance_id: str) -> None:
+    """Drop a cached instance so the next lookup hits the database."""
+    _instances.pop(str(instance_id), None)
@@ -0,0 +1,104 @@
+"""
+Batching loaders for single-row reads.
+
+Pages that render many rows fan out parallel GET /executions/{run_id} or
+GET /instances/{id} calls. A loader shared by the app collects the keys
+requested within a few milliseconds, across requests, and resolves them
+with one `in` query instead of one round-trip each.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+Row = Dict[str, Any]
+
+
+class BatchLoader:
+    """
+    Coalesces concurrent `load(key)` calls into batched fetches.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[List[str]], Awaitable[Dict[str, Row]]],
+        delay: float = 0.005,
+        max_batch: int = 100
+    ):
+        """
+        Initialize the loader.
+
+        Args:
+            fetch: Coroutine mapping a list of keys to {key: row}; missing keys are omitted
+            delay: Seconds to wait for more keys after the first one arrives
+            max_batch: Dispatch immediately once this many keys are pending
+        """
+        self._fetch = fetch
+        self.delay = delay
+        self.max_batch = max_batch
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def load(self, key: str) -> Optional[Row]:
+        """
+        Load one row, batched with any other keys requested in the same window.
+
+        Returns:
+            The row, or None if it does not exist
+
+        Raises:
+            Exception: Whatever the batch fetch raised
+        """
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._pending[key] = future
+            if len(self._pending) >= self.max_batch:
+                self._dispatch()
+            elif self._handle is None:
+                self._handle = loop.call_later(self.delay, self._dispatch)
+        # Shielded so a disconnecting client doesn't cancel a result others share
+        return await asyncio.shield(future)
+
+    def _dispatch(self) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            task = asyncio.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: Dict[str, asyncio.Future]) -> None:
+        try:
+            rows = await self._fetch(list(batch))
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(rows.get(key))
+
+
+def table_loader(supabase, table: str, key_column: str, columns: str = '*') -> BatchLoader:
+    """
+    Build a loader reading rows of `table` by `key_column`.
+
+    Args:
+        supabase: Async Supabase client
+        table: Table name
+        key_column: Column the keys are matched against
+        columns: PostgREST select list; must include `key_column`
+
+    Returns:
+        BatchLoader keyed by the string form of `key_column`
+    """
+    async def fetch(keys: List[str]) -> Dict[str, Row]:
+        response = await supabase.table(table).select(columns).in_(key_column, keys).execute()
+        return {str(row[key_column]): row for row in response.data}
+
+    return BatchLoader(fetch)
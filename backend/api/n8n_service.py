@@ -1,10 +1,18 @@
 import asyncio
+import re
+from functools import lru_cache
 import httpx
+import ijson
 import logging
-from typing import Dict, List, Optional, Tuple, Any
-from urllib.parse import urljoin, urlparse
-from pydantic import BaseModel, Field
-import random
+import msgspec
+import orjson
+from typing import Any, AsyncIterator, Awaitable, Callable, ClassVar, Dict, List, Literal, NamedTuple, Optional, Tuple, Union
+from cachetools import TTLCache
+
+from api.retry import async_retry
+
+
+logger = logging.getLogger(__name__)
 
 
 # Custom exceptions
@@ -18,19 +26,116 @@ class WorkflowNotFoundError(Exception):
     pass
 
 
-# Pydantic models for type hints
-class WorkflowDefinition(BaseModel):
-    """Pydantic model for workflow definition."""
-    id: str
-    name: str
-    active: bool
+# Attempts per n8n API request, including the first
+MAX_ATTEMPTS = 3
+
+# Status codes worth retrying; other HTTP errors are returned to the caller immediately
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+
+def _retry_after_seconds(response: httpx.Response) -> float:
+    """Return the Retry-After delay in seconds, or 0 if absent or not a number."""
+    try:
+        return float(response.headers.get("Retry-After", 0))
+    except ValueError:
+        return 0.0
+
+
+class _RetryableStatusError(Exception):
+    """
+    Internal signal for a retryable HTTP status.
+    
+    Only the status code and Retry-After delay are kept, not the response,
+    so large error bodies aren't held alive by the exception.
+    """
+    
+    def __init__(self, response: httpx.Response):
+        self.status_code = response.status_code
+        self.retry_after = _retry_after_seconds(response) if self.status_code in (429, 503) else 0.0
+        super().__init__(f"HTTP {self.status_code}")
+
+
+# Splits a URL into "scheme://netloc" and the rest
+_INSTANCE_URL_RE = re.compile(r"^([A-Za-z][A-Za-z0-9+.-]*://[^/?#]+)(.*)$")
+
+
+@lru_cache(maxsize=256)
+def _sanitize_instance_url(instance_url: str) -> Tuple[str, str]:
+    """
+    Validate an n8n instance URL and reduce it to the instance base URL.
+    
+    If the user pasted a page URL (e.g. .../workflow/ID or .../home/workflows),
+    it is stripped back to the base. Results are cached since the same
+    instance URLs are seen on every request.
+    
+    Args:
+        instance_url: The URL entered for the n8n instance
+        
+    Returns:
+        A tuple of (base URL ending with a slash, "scheme://netloc" host key)
+        
+    Raises:
+        ValueError: If the URL has no scheme or host
+    """
+    match = _INSTANCE_URL_RE.match(instance_url)
+    if not match:
+        raise ValueError(f"Invalid instance URL: {instance_url}")
+    
+    host_key, path = match.groups()
+    for page_marker in ("/workflow/", "/home/"):
+        if page_marker in path:
+            path = path.split(page_marker)[0]
+            break
+    
+    # Ensure the URL ends with a slash for proper joining
+    base_url = host_key + path
+    return (base_url if base_url.endswith('/') else base_url + '/'), host_key
+
 
+class _AsyncByteStream:
+    """Async file-like wrapper that lets ijson read from an httpx byte stream."""
+    
+    def __init__(self, chunks: AsyncIterator[bytes]):
+        self._chunks = chunks.__aiter__()
+        self._buffer = b""
+    
+    async def read(self, size: int = -1) -> bytes:
+        if size == 0:
+            return b""
+        while not self._buffer:
+            try:
+                self._buffer = await self._chunks.__anext__()
+            except StopAsyncIteration:
+                return b""
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
 
-class TriggerNodeDefinition(BaseModel):
-    """Pydantic model for trigger node definition."""
+
+# Typed views of n8n payloads. Decoding into these skips every field that isn't
+# declared, e.g. the nodes and connections n8n includes in workflow listings.
+class WorkflowDefinition(msgspec.Struct):
+    """Workflow summary as returned in n8n's workflow list."""
+    # Older n8n versions use numeric ids, and names can be null
+    id: Union[str, int] = ""
+    name: Optional[str] = ""
+    active: bool = False
+
+
+class TriggerNodeDefinition(msgspec.Struct):
+    """Trigger node definition."""
     name: str
     type: str
-    parameters: Dict[str, Any] = Field(default_factory=dict)
+    parameters: Dict[str, Any] = {}
+
+
+class _WorkflowListPage(msgspec.Struct):
+    """Paginated workflow list response ({"data": [...]})."""
+    data: List[WorkflowDefinition] = []
+
+
+_WORKFLOW_LIST_DECODER = msgspec.json.Decoder(Union[_WorkflowListPage, List[WorkflowDefinition]])
 
 
 class N8nClient:
@@ -42,8 +147,19 @@ class N8nClient:
     - Fetching full workflow definition by ID
     - Parsing input_schema from workflow JSON
     - Detecting trigger node (Webhook vs Manual)
+    
+    HTTP connections are pooled per n8n host and shared by every client
+    targeting it; the API key is sent per request.
     """
     
+    # Shared httpx clients keyed by "scheme://netloc"
+    _pool: ClassVar[Dict[str, httpx.AsyncClient]] = {}
+    
+    # Workflows change rarely, so definitions and listings are cached briefly
+    _workflow_cache: ClassVar[TTLCache] = TTLCache(maxsize=1024, ttl=60)
+    _workflow_list_cache: ClassVar[TTLCache] = TTLCache(maxsize=256, ttl=30)
+    _fetch_locks: ClassVar[Dict[Tuple[str, ...], asyncio.Lock]] = {}
+    
     def __init__(self, instance_url: str, api_key: str):
         """
         Initialize the N8nClient.
@@ -55,35 +171,58 @@ class N8nClient:
         Raises:
             ValueError: If the instance URL is invalid or API key is empty
         """
-        # Validate URLs
-        parsed_url = urlparse(instance_url)
-        if not parsed_url.scheme or not parsed_url.netloc:
-            raise ValueError(f"Invalid instance URL: {instance_url}")
+        # Validate and sanitize the URL
+        self.instance_url, host_key = _sanitize_instance_url(instance_url)
         
         if not api_key:
             raise ValueError("API key cannot be empty")
-            
-        # Ensure the URL ends with a slash for proper joining
-        # Sanitize URL: If user pasted a page URL (e.g. .../workflow/ID or .../home/workflows), strip it back to base
-        if "/workflow/" in instance_url:
-            instance_url = instance_url.split("/workflow/")[0]
-            self.logger.warning(f"Sanitized instance URL to: {instance_url}")
-        elif "/home/" in instance_url:
-            instance_url = instance_url.split("/home/")[0]
-            self.logger.warning(f"Sanitized instance URL to: {instance_url}")
-        
-        self.instance_url = instance_url if instance_url.endswith('/') else instance_url + '/'
+        
+        if self.instance_url.rstrip('/') != instance_url.rstrip('/'):
+            logger.warning(f"Sanitized instance URL to: {self.instance_url}")
+        
         self.api_key = api_key
-        self.client = httpx.AsyncClient(
-            headers={
-                "X-N8N-API-KEY": api_key,
-                "Content-Type": "application/json"
-            },
-            timeout=30.0
-        )
+        self.headers = {
+            "X-N8N-API-KEY": api_key,
+            "Content-Type": "application/json"
+        }
+        self.client = self._get_pooled_client(host_key)
+        
+    @classmethod
+    def _get_pooled_client(cls, host_key: str) -> httpx.AsyncClient:
+        """
+        Return the shared HTTP client for a host, creating it on first use.
+        
+        Keeping connections alive between calls lets repeated requests to the
+        same host skip the TCP/TLS handshake, whichever API key they use.
+        """
+        client = cls._pool.get(host_key)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                timeout=30.0,
+                http2=True,
+                limits=httpx.Limits(
+                    max_keepalive_connections=100,
+                    max_connections=100,
+                    keepalive_expiry=30.0
+                )
+            )
+            cls._pool[host_key] = client
+        return client
+
+    async def __aenter__(self) -> "N8nClient":
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """
+        Release this client.
         
-        # Set up logger
-        self.logger = logging.getLogger(__name__)
+        The underlying connections are shared with other clients for the same
+        host and stay open until shutdown_pools() is called.
+        """
+        self.client = None
 
     async def _make_request(self, method: str, endpoint: str, **kwargs) -> httpx.Response:
         """
@@ -91,7 +230,7 @@ class N8nClient:
         
         Args:
             method: HTTP method (GET, POST, etc.)
-            endpoint: API endpoint to call
+            endpoint: API endpoint to call, relative to the instance URL
             **kwargs: Additional arguments to pass to httpx
         
         Returns:
@@ -101,90 +240,281 @@ class N8nClient:
             N8nConnectionError: If there's a connection error
             WorkflowNotFoundError: If the requested resource is not found
         """
-        url = urljoin(self.instance_url, endpoint)
-        self.logger.debug(f"Making {method} request to {url}")
+        url = f"{self.instance_url}{endpoint}"
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Making {method} request to {url}")
         
-        # Implement retry logic with exponential backoff
-        max_retries = 3
-        base_delay = 1  # Base delay in seconds
+        try:
+            return await self._raw_request(method, url, **kwargs)
+        except (httpx.RequestError, _RetryableStatusError) as e:
+            raise N8nConnectionError(f"Failed to connect to n8n instance after {MAX_ATTEMPTS} attempts: {str(e)}") from e
+
+    @async_retry(
+        max_attempts=MAX_ATTEMPTS,
+        base_delay=1.0,
+        max_delay=20.0,
+        retry_on=(httpx.RequestError, _RetryableStatusError)
+    )
+    async def _raw_request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """
+        Send a single request and classify the response.
         
-        for attempt in range(max_retries):
-            try:
-                response = await self.client.request(method, url, **kwargs)
-                self.logger.debug(f"Response status: {response.status_code}")
-                
-                if response.status_code == 401:
-                    raise N8nConnectionError(f"Unauthorized: Invalid API key for instance {self.instance_url}")
-                elif response.status_code == 404:
-                    raise WorkflowNotFoundError(f"Resource not found: {url}")
-                elif response.status_code >= 400:
-                    response.raise_for_status()
-                
-                return response
-                
-            except (httpx.RequestError, httpx.HTTPStatusError) as e:
-                if attempt == max_retries - 1:  # Last attempt
-                    if isinstance(e, httpx.HTTPStatusError) and e.response.status_code == 401:
-                        raise N8nConnectionError(f"Unauthorized: Invalid API key for instance {self.instance_url}") from e
-                    else:
-                        raise N8nConnectionError(f"Failed to connect to n8n instance after {max_retries} attempts: {str(e)}") from e
-                
-                # Exponential backoff with jitter
-                delay = base_delay * (2 ** attempt) + random.uniform(0, 1)
-                self.logger.warning(f"Request failed (attempt {attempt + 1}/{max_retries}): {str(e)}. Retrying in {delay:.2f}s")
-                await asyncio.sleep(delay)
+        Raises:
+            _RetryableStatusError: For 429/5xx responses, to be retried
+            N8nConnectionError: For non-retryable client errors
+            WorkflowNotFoundError: If the requested resource is not found
+        """
+        response = await self.client.request(method, url, headers=self.headers, **kwargs)
+        logger.debug("Response status: %s", response.status_code)
+        
+        outcome = self._classify(response)
+        if outcome == "ok":
+            return response
+        if outcome == "fatal":
+            # Client errors won't succeed on retry, so fail fast
+            raise self._fatal_error(response, url)
+        raise _RetryableStatusError(response)
+
+    @staticmethod
+    def _classify(response: httpx.Response) -> Literal["ok", "retry", "fatal"]:
+        """
+        Classify a response for the retry loop.
+        
+        Returns:
+            "ok" for success, "retry" for transient failures (429/5xx) and
+            "fatal" for errors that would fail again on retry
+        """
+        status_code = response.status_code
+        if status_code < 400:
+            return "ok"
+        if status_code in RETRYABLE_STATUS_CODES:
+            return "retry"
+        return "fatal"
+
+    def _fatal_error(self, response: httpx.Response, url: str) -> Exception:
+        """Map a non-retryable error response to the exception raised to callers."""
+        if response.status_code == 401:
+            return N8nConnectionError(f"Unauthorized: Invalid API key for instance {self.instance_url}")
+        if response.status_code == 404:
+            return WorkflowNotFoundError(f"Resource not found: {url}")
+        return N8nConnectionError(f"Request to n8n instance failed with HTTP {response.status_code}: {url}")
+
+    async def _cached(
+        self,
+        cache: TTLCache,
+        key: Tuple[str, ...],
+        fetch: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """
+        Return a cached value or fetch and store it.
+        
+        Concurrent misses for the same key wait on a shared lock so only one
+        request reaches n8n.
+        """
+        value = cache.get(key)
+        if value is not None:
+            return value
+        
+        lock = self._fetch_locks.setdefault(key, asyncio.Lock())
+        try:
+            async with lock:
+                value = cache.get(key)
+                if value is None:
+                    value = await fetch()
+                    cache[key] = value
+                return value
+        finally:
+            if not lock.locked() and self._fetch_locks.get(key) is lock:
+                del self._fetch_locks[key]
+
+    def invalidate_cache(self, workflow_id: Optional[str] = None) -> None:
+        """
+        Drop cached workflow data for this instance so the next read hits n8n.
+        
+        Args:
+            workflow_id: Only invalidate this workflow's definition; the
+                workflow list is always invalidated
+        """
+        self._evict(self.instance_url, self.api_key, workflow_id)
+    
+    @classmethod
+    def invalidate_for(
+        cls,
+        instance_url: Optional[str],
+        api_key: Optional[str],
+        workflow_id: Optional[str] = None
+    ) -> None:
+        """
+        Drop cached workflow data for an instance without building a client.
+        
+        Never raises: a URL or API key a client could not be built from has
+        nothing cached under it.
+        
+        Args:
+            instance_url: The stored URL of the n8n instance
+            api_key: The stored API key for the instance
+            workflow_id: Only invalidate this workflow's definition; the
+                workflow list is always invalidated
+        """
+        if not instance_url or not api_key:
+            return
+        try:
+            base_url, _ = _sanitize_instance_url(instance_url)
+        except ValueError:
+            return
+        cls._evict(base_url, api_key, workflow_id)
+    
+    @classmethod
+    def _evict(cls, instance_url: str, api_key: str, workflow_id: Optional[str]) -> None:
+        cls._workflow_list_cache.pop((instance_url, api_key), None)
+        if workflow_id is not None:
+            cls._workflow_cache.pop((instance_url, api_key, workflow_id), None)
+            return
+        for key in [k for k in cls._workflow_cache if k[:2] == (instance_url, api_key)]:
+            cls._workflow_cache.pop(key, None)
 
     async def get_workflows(self) -> List[Dict[str, Any]]:
         """
         Fetch a list of workflows from the n8n instance.
         
+        Results are cached for 30 seconds per instance and API key.
+        
         Returns:
             List of workflow dictionaries with id, name, and active status
         """
+        return await self._cached(
+            self._workflow_list_cache,
+            (self.instance_url, self.api_key),
+            self._fetch_workflows
+        )
+
+    async def _fetch_workflows(self) -> List[Dict[str, Any]]:
+        """Fetch the workflow list from n8n, bypassing the cache."""
         response = await self._make_request("GET", "api/v1/workflows")
         
         try:
-            workflows_data = response.json()
-            self.logger.info(f"Raw n8n workflows response: {workflows_data}")
-        except Exception as e:
-            self.logger.error(f"Failed to parse n8n response as JSON. Status: {response.status_code}, Content: {response.text[:200]}...")
-            raise N8nConnectionError(f"Invalid response from n8n instance: {response.text[:100]}") from e
+            workflows = _WORKFLOW_LIST_DECODER.decode(response.content)
+        except msgspec.DecodeError as e:
+            # Decode only the start of the body rather than the whole response
+            preview = response.content[:200].decode("utf-8", errors="replace")
+            logger.error(f"Failed to parse n8n response as JSON. Status: {response.status_code}, Content: {preview}...")
+            raise N8nConnectionError(f"Invalid response from n8n instance: {preview[:100]}") from e
+        
+        # Handle both {"data": [...]} and a direct array of workflows
+        if isinstance(workflows, _WorkflowListPage):
+            workflows = workflows.data
         
         # Return format: [{"id": "xxx", "name": "yyy", "active": true}, ...]
-        workflows = []
-        if "data" in workflows_data:
-            # Handle different response structures
-            for wf in workflows_data["data"]:
-                workflows.append({
-                    "id": wf.get("id", ""),
-                    "name": wf.get("name", ""),
-                    "active": wf.get("active", False)
-                })
-        else:
-            # Direct array of workflows
-            for wf in workflows_data:
-                workflows.append({
-                    "id": wf.get("id", ""),
-                    "name": wf.get("name", ""),
-                    "active": wf.get("active", False)
-                })
-        
-        return workflows
+        return [{"id": str(wf.id), "name": wf.name or "", "active": wf.active} for wf in workflows]
 
     async def get_workflow_by_id(self, workflow_id: str) -> Dict[str, Any]:
         """
         Fetch a full workflow definition by its ID.
         
+        Definitions are cached for a minute per instance, API key and workflow.
+        
         Args:
             workflow_id: The ID of the workflow to fetch
         
         Returns:
             The full workflow JSON definition
         """
+        return await self._cached(
+            self._workflow_cache,
+            (self.instance_url, self.api_key, workflow_id),
+            lambda: self._fetch_workflow_by_id(workflow_id)
+        )
+
+    async def _fetch_workflow_by_id(self, workflow_id: str) -> Dict[str, Any]:
+        """Fetch a workflow definition from n8n, bypassing the cache."""
         response = await self._make_request("GET", f"api/v1/workflows/{workflow_id}")
-        workflow_data = response.json()
+        try:
+            workflow_data = orjson.loads(response.content)
+        except orjson.JSONDecodeError as e:
+            raise N8nConnectionError(f"Invalid workflow response from n8n instance for {workflow_id}") from e
         return workflow_data
 
+    async def get_workflows_with_details(self, concurrency: int = 10) -> List[Dict[str, Any]]:
+        """
+        Fetch the workflow list and every workflow's full definition.
+        
+        Definitions are fetched concurrently, at most `concurrency` at a time
+        so the shared connection pool isn't exhausted.
+        
+        Args:
+            concurrency: Maximum number of definition requests in flight
+        
+        Returns:
+            List of full workflow definitions; workflows deleted between the
+            list and detail requests are skipped
+        """
+        workflows = await self.get_workflows()
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def fetch_one(workflow_id: str) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.get_workflow_by_id(workflow_id)
+        
+        results = await asyncio.gather(
+            *(fetch_one(wf["id"]) for wf in workflows),
+            return_exceptions=True
+        )
+        
+        details = []
+        for result in results:
+            if isinstance(result, WorkflowNotFoundError):
+                logger.warning(f"Skipping workflow removed during fetch: {result}")
+                continue
+            if isinstance(result, BaseException):
+                raise result
+            details.append(result)
+        return details
+
+    async def get_workflow_trigger(self, workflow_id: str, max_nodes: int = 50) -> Tuple[str, Dict[str, Any]]:
+        """
+        Find a workflow's trigger node without decoding the whole definition.
+        
+        The response is streamed and parsed node by node, stopping at the
+        first trigger node. Uses the cached definition when there is one, and
+        falls back to a full fetch if no trigger shows up within `max_nodes`
+        nodes or the streamed request fails.
+        
+        Args:
+            workflow_id: The ID of the workflow to inspect
+            max_nodes: How many nodes to scan before falling back
+        
+        Returns:
+            A tuple containing (trigger_type, node_definition), as returned by
+            detect_trigger_type
+        """
+        cached = self._workflow_cache.get((self.instance_url, self.api_key, workflow_id))
+        if cached is not None:
+            return detect_trigger_type(cached)
+        
+        url = f"{self.instance_url}api/v1/workflows/{workflow_id}"
+        first_node = None
+        try:
+            async with self.client.stream("GET", url, headers=self.headers) as response:
+                if self._classify(response) == "ok":
+                    scanned = 0
+                    nodes = ijson.items_async(_AsyncByteStream(response.aiter_bytes()), "nodes.item", use_float=True)
+                    async for node in nodes:
+                        trigger_type = _trigger_label(node)
+                        if trigger_type is not None:
+                            return trigger_type, node
+                        if first_node is None:
+                            first_node = node
+                        scanned += 1
+                        if scanned >= max_nodes:
+                            break
+                    else:
+                        # Every node was scanned and none is a trigger
+                        return "unknown", first_node or {}
+        except (httpx.RequestError, ijson.JSONError) as e:
+            logger.warning(f"Streaming trigger lookup failed for workflow {workflow_id}: {str(e)}")
+        
+        return detect_trigger_type(await self.get_workflow_by_id(workflow_id))
+
     async def validate_connection(self) -> bool:
         """
         Validate the connection to the n8n instance.
@@ -203,6 +533,115 @@ class N8nClient:
             return False
 
 
+async def shutdown_pools() -> None:
+    """Close every pooled HTTP client shared by N8nClient instances."""
+    clients = list(N8nClient._pool.values())
+    N8nClient._pool.clear()
+    await asyncio.gather(*(client.aclose() for client in clients))
+
+
+def _default_schema() -> Dict[str, Any]:
+    """Return the empty schema used when a workflow doesn't define one."""
+    return {
+        "type": "object",
+        "properties": {},
+        "required": [],
+        "definitions": {}
+    }
+
+
+# Keywords in a lowercased node type that mark a trigger, in priority order,
+# mapped to the trigger type reported by detect_trigger_type
+_TRIGGER_KEYWORDS: Tuple[Tuple[str, str], ...] = (
+    ("webhook", "webhook"),
+    ("manual", "manual"),
+    ("execute", "manual"),
+    ("trigger", "trigger"),
+)
+
+# Keywords that mark the node whose parameters hold the input schema
+_INPUT_TRIGGER_KEYWORDS: Tuple[str, ...] = ("trigger", "webhook", "manual")
+
+
+@lru_cache(maxsize=512)
+def _classify_node_type(node_type: str) -> Tuple[Optional[str], bool]:
+    """
+    Classify a raw n8n node type string.
+    
+    Workflows reuse a small set of node types, so the result is cached per
+    type and each distinct type is lowercased and scanned only once.
+    
+    Returns:
+        A tuple of (trigger type or None, whether the node holds the input schema)
+    """
+    lowered = node_type.lower()
+    trigger_type = next((label for keyword, label in _TRIGGER_KEYWORDS if keyword in lowered), None)
+    return trigger_type, any(keyword in lowered for keyword in _INPUT_TRIGGER_KEYWORDS)
+
+
+def _trigger_label(node: Dict[str, Any]) -> Optional[str]:
+    """Return the trigger type reported by detect_trigger_type for a node, or None."""
+    return _classify_node_type(node.get("type", ""))[0]
+
+
+def is_webhook_node(node: Dict[str, Any]) -> bool:
+    """Return True if the node is a webhook, using the per-type classification cache."""
+    return _classify_node_type(node.get("type", ""))[0] == "webhook"
+
+
+class WorkflowAnalysis(NamedTuple):
+    """Result of a single pass over a workflow's nodes."""
+    trigger_type: str
+    trigger_node: Dict[str, Any]
+    input_schema: Dict[str, Any]
+    output_schema: Dict[str, Any]
+
+
+def _analyze_workflow(workflow_json: Dict[str, Any]) -> WorkflowAnalysis:
+    """
+    Scan a workflow's nodes and extract everything the parsers need.
+    
+    Args:
+        workflow_json: The full workflow JSON definition
+        
+    Returns:
+        WorkflowAnalysis with the detected trigger and the input/output schemas
+    """
+    nodes = workflow_json.get("nodes", [])
+    if not nodes:
+        return WorkflowAnalysis("unknown", {}, _default_schema(), _default_schema())
+    
+    # One pass finds both the first trigger and the first node holding the
+    # input schema, stopping once both are found (usually at the first
+    # node); either falls back to the first node if nothing matches
+    trigger_type, trigger_node, input_node = "unknown", None, None
+    for node in nodes:
+        label, holds_input = _classify_node_type(node.get("type", ""))
+        if trigger_node is None and label is not None:
+            trigger_type, trigger_node = label, node
+        if input_node is None and holds_input:
+            input_node = node
+        if trigger_node is not None and input_node is not None:
+            break
+    if trigger_node is None:
+        trigger_node = nodes[0]
+    if input_node is None:
+        input_node = nodes[0]
+    
+    input_schema = input_node.get("parameters", {}).get("schema")
+    
+    # The last node is typically the output/final node
+    output_parameters = nodes[-1].get("parameters", {})
+    output_schema = output_parameters.get("output_schema") or output_parameters.get("schema")
+    
+    return WorkflowAnalysis(
+        trigger_type,
+        trigger_node,
+        input_schema or _default_schema(),
+        output_schema or _default_schema()
+    )
+
+
 def parse_input_schema(workflow_json: Dict[str, Any]) -> Dict[str, Any]:
     """
     Parse the input schema from a workflow JSON.
@@ -228,36 +667,7 @@ def parse_input_schema(workflow_json: Dict[str, Any]) -> Dict[str, Any]:
           "definitions": {}
         }
     """
-    # Find the trigger node - typically the first node in the workflow
-    nodes = workflow_json.get("nodes", [])
-    trigger_node = None
-    
-    # Look for trigger-type nodes
-    for node in nodes:
-        node_type = node.get("type", "").lower()
-        if any(trigger_type in node_type for trigger_type in ["trigger", "webhook", "manual"]):
-            trigger_node = node
-            break
-    
-    # If no trigger found at the beginning, just get the first node
-    if not trigger_node and nodes:
-        trigger_node = nodes[0]
-    
-    # Extract schema if available
-    if trigger_node:
-        parameters = trigger_node.get("parameters", {})
-        schema = parameters.get("schema")
-        
-        if schema:
-            return schema
-    
-    # Fallback to default schema
-    return {
-        "type": "object",
-        "properties": {},
-        "required": [],
-        "definitions": {}
-    }
+    return _analyze_workflow(workflow_json).input_schema
 
 
 def parse_output_schema(workflow_json: Dict[str, Any]) -> Dict[str, Any]:
@@ -274,33 +684,7 @@ def parse_output_schema(workflow_json: Dict[str, Any]) -> Dict[str, Any]:
     Returns:
         The output schema dictionary
     """
-    nodes = workflow_json.get("nodes", [])
-    
-    if not nodes:
-        return {
-            "type": "object",
-            "properties": {},
-            "required": [],
-            "definitions": {}
-        }
-    
-    # Get the last node (typically the output/final node)
-    last_node = nodes[-1]
-    
-    # Check if there's a schema defined in parameters
-    parameters = last_node.get("parameters", {})
-    schema = parameters.get("output_schema") or parameters.get("schema")
-    
-    if schema:
-        return schema
-    
-    # Fallback: return default schema
-    return {
-        "type": "object",
-        "properties": {},
-        "required": [],
-        "definitions": {}
-    }
+    return _analyze_workflow(workflow_json).output_schema
 
 
 def detect_trigger_type(workflow_json: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
@@ -316,23 +700,5 @@ def detect_trigger_type(workflow_json: Dict[str, Any]) -> Tuple[str, Dict[str, A
         A tuple containing (trigger_type, node_definition)
         trigger_type ∈ ['webhook', 'manual', 'trigger', 'unknown']
     """
-    nodes = workflow_json.get("nodes", [])
-    
-    for node in nodes:
-        node_type = node.get("type", "").lower()
-        
-        # Handle various n8n node naming conventions
-        if "webhook" in node_type:
-            return "webhook", node
-        elif "manual" in node_type or "execute" in node_type:
-            return "manual", node
-        elif "trigger" in node_type:
-            return "trigger", node
-    
-    # If no specific trigger found, return unknown
-    # Use the first node as the default if it exists
-    if nodes:
-        return "unknown", nodes[0]
-    
-    # Return empty default if no nodes
-    return "unknown", {}
\ No newline at end of file
+    analysis = _analyze_workflow(workflow_json)
+    return analysis.trigger_type, analysis.trigger_node
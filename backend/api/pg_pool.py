@@ -0,0 +1,33 @@
+"""
+Process-wide asyncpg pool for direct Postgres access.
+
+Used by the dashboard reads and by the workflow executor and worker for
+execution log writes, so those skip PostgREST and the thread pool. Only
+created when SUPABASE_DB_URL is configured; callers fall back to the
+Supabase client otherwise.
+"""
+
+import asyncpg
+
+
+async def create_pg_pool(dsn: str) -> asyncpg.Pool:
+    """
+    Create the shared Postgres pool.
+
+    asyncpg's prepared statement cache is disabled so the DSN may point at
+    Supabase's transaction-mode pooler, which does not keep prepared
+    statements across transactions.
+
+    Args:
+        dsn: Postgres connection string
+
+    Returns:
+        asyncpg.Pool: Connection pool sized for Supabase's connection limits
+    """
+    return await asyncpg.create_pool(
+        dsn=dsn,
+        min_size=10,
+        max_size=50,
+        max_inactive_connection_lifetime=300,
+        statement_cache_size=0
+    )
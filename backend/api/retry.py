@@ -0,0 +1,57 @@
+"""
+Retry policy for async calls to external services.
+
+Provides a decorator that retries a coroutine with exponential backoff
+and full jitter, so callers share one policy instead of hand-rolled loops.
+"""
+import asyncio
+import functools
+import logging
+import random
+from typing import Any, Awaitable, Callable, Tuple, Type, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def async_retry(
+    max_attempts: int = 3,
+    base_delay: float = 1.0,
+    max_delay: float = 20.0,
+    retry_on: Tuple[Type[BaseException], ...] = (Exception,)
+) -> Callable[[Callable[..., Awaitable[T]]], Callable[..., Awaitable[T]]]:
+    """
+    Retry an async function when it raises one of `retry_on`.
+    
+    Delays use full jitter: a uniform draw from
+    [0, min(max_delay, base_delay * 2**attempt)], which keeps concurrent
+    callers from retrying in lockstep. If the exception has a `retry_after`
+    attribute (seconds), the delay is at least that long, but never more
+    than max_delay. After the last attempt the exception is re-raised to
+    the caller.
+    
+    Args:
+        max_attempts: Total number of attempts, including the first
+        base_delay: Base delay in seconds
+        max_delay: Upper bound for a single backoff
+        retry_on: Exception types that trigger a retry
+    """
+    def decorator(func: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> T:
+            for attempt in range(max_attempts):
+                try:
+                    return await func(*args, **kwargs)
+                except retry_on as e:
+                    if attempt == max_attempts - 1:  # Last attempt
+                        raise
+                    
+                    delay = random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+                    # A server-supplied Retry-After is capped so it cannot
+                    # park the caller for hours
+                    delay = min(max_delay, max(delay, getattr(e, "retry_after", 0.0)))
+                    logger.warning(f"{func.__qualname__} failed (attempt {attempt + 1}/{max_attempts}): {str(e)}. Retrying in {delay:.2f}s")
+                    await asyncio.sleep(delay)
+        return wrapper
+    return decorator
@@ -0,0 +1,53 @@
+"""
+Async-native Supabase client.
+
+supabase-py 2.0 only ships a synchronous client, so every query has to be
+pushed onto the default thread pool with asyncio.to_thread. The PostgREST
+layer underneath does have an async client; this module points it at the
+project's REST endpoint with a pooled HTTP/2 connection so handlers can
+await queries directly on the socket.
+"""
+
+from typing import Dict, Union
+
+import httpx
+from postgrest import AsyncPostgrestClient
+
+
+class AsyncSupabase(AsyncPostgrestClient):
+    """
+    AsyncPostgrestClient backed by a pooled, keep-alive HTTP/2 session.
+
+    Exposes the same query builder as ``supabase.table(...)`` so call sites
+    only need to ``await`` the final ``execute()``.
+    """
+
+    def __init__(self, supabase_url: str, service_key: str):
+        """
+        Initialize the client.
+
+        Args:
+            supabase_url: Base URL of the Supabase project
+            service_key: Service role key used for both apikey and bearer auth
+        """
+        super().__init__(
+            f"{str(supabase_url).rstrip('/')}/rest/v1",
+            headers={
+                "apikey": service_key,
+                "Authorization": f"Bearer {service_key}",
+            },
+        )
+
+    def create_session(
+        self,
+        base_url: str,
+        headers: Dict[str, str],
+        timeout: Union[int, float, httpx.Timeout],
+    ) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            http2=True,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        )
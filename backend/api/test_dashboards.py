@@ -0,0 +1,301 @@
+import orjson
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from api.v1.dashboards import (
+    DashboardCreate,
+    DashboardFieldCreate,
+    create_dashboard,
+    get_dashboard,
+)
+
+
+@pytest.fixture
+def redis_client():
+    """Mocked async Redis client, empty by default."""
+    mock_client = AsyncMock()
+    mock_client.get.return_value = None
+    return mock_client
+
+
+def _row(**overrides):
+    row = {
+        "id": 1,
+        "name": "Leads",
+        "description": None,
+        "workflow_id": "wf-1",
+        "instance_id": "00000000-0000-0000-0000-000000000001",
+        "theme_color": "blue",
+        "created_at": "2025-01-01T00:00:00+00:00",
+        "dashboard_fields": [],
+    }
+    row.update(overrides)
+    return row
+
+
+@pytest.mark.asyncio
+async def test_create_dashboard_single_rpc(redis_client):
+    """Test that dashboard + fields are created through one RPC call."""
+    field = {
+        "id": 7, "dashboard_id": 1, "name": "email", "label": "Email", "type": "text",
+        "required": True, "default_value": None, "description": None, "options": None,
+    }
+    supabase = MagicMock()
+    supabase.rpc.return_value.execute = AsyncMock(
+        return_value=MagicMock(data=[_row(dashboard_fields=[field])])
+    )
+    payload = DashboardCreate(
+        name="Leads",
+        workflow_id="wf-1",
+        instance_id="00000000-0000-0000-0000-000000000001",
+        fields=[DashboardFieldCreate(name="email", label="Email", type="text", required=True)],
+    )
+
+    result = await create_dashboard(payload, supabase=supabase, redis=redis_client)
+
+    supabase.rpc.assert_called_once()
+    name, params = supabase.rpc.call_args[0]
+    assert name == "create_dashboard_with_fields"
+    assert params["p"]["fields"][0]["name"] == "email"
+    supabase.table.assert_not_called()
+    assert result.id == 1
+    assert [f.model_dump() for f in result.fields] == [field]
+    redis_client.delete.assert_awaited_once_with("dashboard:1", "dashboards:list")
+
+
+@pytest.mark.asyncio
+async def test_get_dashboard_populates_cache_on_miss(redis_client):
+    """Test that a cache miss reads Supabase and stores the row."""
+    supabase = MagicMock()
+    query = supabase.table.return_value.select.return_value.eq.return_value
+    query.execute = AsyncMock(return_value=MagicMock(data=[_row()]))
+
+    result = await get_dashboard(1, supabase=supabase, redis=redis_client, pg=None)
+
+    assert result.id == 1
+    key, value = redis_client.set.call_args[0]
+    assert key == "dashboard:1"
+    assert orjson.loads(value)["workflow_id"] == "wf-1"
+
+
+@pytest.mark.asyncio
+async def test_get_dashboard_served_from_cache(redis_client):
+    """Test that a cache hit skips Supabase entirely."""
+    redis_client.get.return_value = orjson.dumps(_row(name="Cached"))
+    supabase = MagicMock()
+
+    result = await get_dashboard(1, supabase=supabase, redis=redis_client, pg=None)
+
+    assert result.name == "Cached"
+    supabase.table.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_get_dashboard_redis_down_falls_back(redis_client):
+    """Test that Redis errors degrade to a Supabase read."""
+    redis_client.get.side_effect = ConnectionError("redis down")
+    redis_client.set.side_effect = ConnectionError("redis down")
+    supabase = MagicMock()
+    query = supabase.table.return_value.select.return_value.eq.return_value
+    query.execute = AsyncMock(return_value=MagicMock(data=[_row()]))
+
+    result = await get_dashboard(1, supabase=supabase, redis=redis_client, pg=None)
+
+    assert result.id == 1
+
+
+@pytest.mark.asyncio
+async def test_list_dashboards_keyset_page(redis_client):
+    """Test that list_dashboards pages by id and returns rows unmodified."""
+    from api.v1.dashboards import DASHBOARD_CACHE_TTL, DashboardResponse, list_dashboards
+
+    redis_client.hget.return_value = None
+    rows = [_row(id=11), _row(id=12)]
+    supabase = MagicMock()
+    query = supabase.table.return_value.select.return_value
+    query.gt.return_value.order.return_value.limit.return_value.execute = AsyncMock(
+        return_value=MagicMock(data=rows)
+    )
+
+    result = await list_dashboards(cursor=10, limit=2, supabase=supabase, redis=redis_client, pg=None)
+
+    assert result is rows
+    query.gt.assert_called_once_with('id', 10)
+    query.gt.return_value.order.return_value.limit.assert_called_once_with(2)
+    assert redis_client.hset.call_args[0][:2] == ("dashboards:list", "10:2")
+    # The TTL is set only when the hash is created, never extended
+    redis_client.expire.assert_awaited_once_with("dashboards:list", DASHBOARD_CACHE_TTL, nx=True)
+    # Raw Supabase rows validate against the response model
+    assert DashboardResponse.model_validate(rows[0]).fields == []
+
+
+@pytest.mark.asyncio
+async def test_list_dashboards_without_paging_returns_all(redis_client):
+    """Test that a plain listing (as the sidebar requests) is not cut off at a page size."""
+    from api.v1.dashboards import list_dashboards
+
+    redis_client.hget.return_value = None
+    rows = [_row(id=i) for i in range(1, 61)]
+    supabase = MagicMock()
+    query = supabase.table.return_value.select.return_value.gt.return_value.order.return_value
+    query.execute = AsyncMock(return_value=MagicMock(data=rows))
+
+    result = await list_dashboards(cursor=None, limit=None, supabase=supabase, redis=redis_client, pg=None)
+
+    assert result is rows
+    query.limit.assert_not_called()
+    assert redis_client.hset.call_args[0][:2] == ("dashboards:list", "all")
+
+
+@pytest.mark.asyncio
+async def test_list_dashboards_cursor_uses_default_page_size(redis_client):
+    """Test that paging with only a cursor returns a default-sized page."""
+    from api.v1.dashboards import DEFAULT_DASHBOARD_PAGE_SIZE, PG_LIST_DASHBOARDS, list_dashboards
+
+    redis_client.hget.return_value = None
+    pg = MagicMock()
+    pg.fetchval = AsyncMock(return_value="[]")
+
+    await list_dashboards(cursor=5, limit=None, supabase=MagicMock(), redis=redis_client, pg=pg)
+
+    pg.fetchval.assert_awaited_once_with(PG_LIST_DASHBOARDS, 5, DEFAULT_DASHBOARD_PAGE_SIZE)
+
+
+@pytest.mark.asyncio
+async def test_execute_dashboard_defers_run(redis_client):
+    """Test that execution is handed to the queue without waiting on the run."""
+    from api.v1.dashboards import DashboardExecuteRequest, execute_dashboard
+
+    redis_client.get.return_value = orjson.dumps(_row())
+    executor = MagicMock()
+    executor.defer_execution = AsyncMock(return_value="run-1")
+
+    result = await execute_dashboard(
+        1,
+        DashboardExecuteRequest(inputs={"email": "a@b.c"}),
+        supabase=MagicMock(),
+        redis=redis_client,
+        pg=None,
+        executor=executor,
+    )
+
+    assert result["run_id"] == "run-1"
+    executor.defer_execution.assert_awaited_once_with(
+        workflow_id="wf-1",
+        user_id="anonymous_dashboard_user",
+        input_data={"email": "a@b.c"},
+        instance_id="00000000-0000-0000-0000-000000000001",
+    )
+
+
+@pytest.mark.asyncio
+async def test_create_dashboard_falls_back_without_rpc(redis_client):
+    """Test that a missing RPC degrades to two inserts with no reselect."""
+    from postgrest.exceptions import APIError
+
+    field = {
+        "id": 7, "dashboard_id": 5, "name": "email", "label": "Email", "type": "text",
+        "required": False, "default_value": None, "description": None, "options": None,
+    }
+    supabase = MagicMock()
+    supabase.rpc.return_value.execute = AsyncMock(
+        side_effect=APIError({"code": "PGRST202", "message": "Could not find the function"})
+    )
+    dashboard_insert = MagicMock()
+    dashboard_insert.execute = AsyncMock(return_value=MagicMock(data=[_row(id=5, dashboard_fields=None)]))
+    fields_insert = MagicMock()
+    fields_insert.execute = AsyncMock(return_value=MagicMock(data=[field]))
+    supabase.table.return_value.insert.side_effect = [dashboard_insert, fields_insert]
+    payload = DashboardCreate(
+        name="Leads",
+        workflow_id="wf-1",
+        instance_id="00000000-0000-0000-0000-000000000001",
+        fields=[DashboardFieldCreate(name="email", label="Email", type="text")],
+    )
+
+    result = await create_dashboard(payload, supabase=supabase, redis=redis_client)
+
+    assert result.id == 5
+    assert [f.id for f in result.fields] == [7]
+    fields_rows = supabase.table.return_value.insert.call_args_list[1][0][0]
+    assert fields_rows[0]["dashboard_id"] == 5
+    supabase.table.return_value.select.assert_not_called()
+
+
+def test_compile_dashboard_model_validates_and_is_cached():
+    """Test that field specs compile to one reusable input model."""
+    from pydantic import ValidationError
+    from api.v1.dashboards import _field_specs, compile_dashboard_model
+
+    fields = [
+        {"name": "count", "type": "number", "required": True},
+        {"name": "plan", "type": "select", "options": ["free", "pro"]},
+        {"name": "_id", "type": "text"},
+    ]
+    model = compile_dashboard_model(_field_specs(fields))
+
+    assert compile_dashboard_model(_field_specs([dict(f) for f in fields])) is model
+    inputs = model.model_validate({"count": 3, "_id": "x", "extra": True})
+    assert inputs.model_dump(by_alias=True, exclude_unset=True) == {"count": 3, "_id": "x", "extra": True}
+    with pytest.raises(ValidationError):
+        model.model_validate({"count": 1, "plan": "enterprise"})
+    with pytest.raises(ValidationError):
+        model.model_validate({"plan": "free"})
+
+
+def test_compiled_model_accepts_empty_optional_select():
+    """Test that an unselected optional <select> ("") is accepted and passed through."""
+    from pydantic import ValidationError
+    from api.v1.dashboards import _field_specs, compile_dashboard_model
+
+    fields = [
+        {"name": "plan", "type": "select", "options": ["free", "pro"]},
+        {"name": "tier", "type": "select", "options": ["a", "b"], "required": True},
+    ]
+    model = compile_dashboard_model(_field_specs(fields))
+
+    inputs = model.model_validate({"plan": "", "tier": "a"})
+    assert inputs.model_dump(by_alias=True, exclude_unset=True) == {"plan": "", "tier": "a"}
+    with pytest.raises(ValidationError):
+        model.model_validate({"tier": ""})
+
+
+@pytest.mark.asyncio
+async def test_execute_dashboard_rejects_inputs_not_matching_fields(redis_client):
+    """Test that inputs are validated against the dashboard's fields before queueing."""
+    from fastapi import HTTPException
+    from api.v1.dashboards import DashboardExecuteRequest, execute_dashboard
+
+    field = {"name": "email", "type": "email", "required": True}
+    redis_client.get.return_value = orjson.dumps(_row(dashboard_fields=[field]))
+    executor = MagicMock()
+    executor.defer_execution = AsyncMock()
+
+    with pytest.raises(HTTPException) as exc:
+        await execute_dashboard(
+            1,
+            DashboardExecuteRequest(inputs={"name": "x"}),
+            supabase=MagicMock(),
+            redis=redis_client,
+            pg=None,
+            executor=executor,
+        )
+
+    assert exc.value.status_code == 422
+    executor.defer_execution.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_get_dashboard_reads_postgres_when_pooled(redis_client):
+    """Test that cache misses go to the asyncpg pool instead of PostgREST."""
+    from api.v1.dashboards import PG_GET_DASHBOARD
+
+    pg = MagicMock()
+    pg.fetchval = AsyncMock(return_value=orjson.dumps(_row(id=3)).decode())
+    supabase = MagicMock()
+
+    result = await get_dashboard(3, supabase=supabase, redis=redis_client, pg=pg)
+
+    assert result.id == 3
+    pg.fetchval.assert_awaited_once_with(PG_GET_DASHBOARD, 3)
+    supabase.table.assert_not_called()
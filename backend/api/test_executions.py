@@ -0,0 +1,235 @@
+import orjson
+import pytest
+from datetime import datetime
+from uuid import UUID
+from fastapi import Response
+from postgrest.exceptions import APIError
+from unittest.mock import AsyncMock, MagicMock
+
+from api.v1 import executions
+from api.v1.executions import (
+    count_executions, decode_cursor, encode_cursor, execution_stats, get_execution, list_executions
+)
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    executions._count_cache.clear()
+    executions._terminal_cache.clear()
+    executions._stats_cache.clear()
+    yield
+    executions._count_cache.clear()
+    executions._terminal_cache.clear()
+    executions._stats_cache.clear()
+
+
+def _query(data=None, count=None):
+    """Chainable PostgREST query mock; every builder call returns itself."""
+    query = MagicMock()
+    for method in ('select', 'eq', 'gte', 'lt', 'lte', 'order', 'range', 'limit'):
+        getattr(query, method).return_value = query
+    query.execute = AsyncMock(return_value=MagicMock(data=data or [], count=count))
+    supabase = MagicMock()
+    supabase.table.return_value = query
+    return supabase, query
+
+
+@pytest.mark.asyncio
+async def test_list_executions_half_open_range_without_count():
+    """Test that the list uses [start, end) and does not ask for a total."""
+    supabase, query = _query()
+    start, end = datetime(2025, 1, 1), datetime(2025, 1, 2)
+
+    await list_executions(
+        workflow_id=None, instance_id=None, status=None, start_date=start, end_date=end,
+        search=None, include_data=False, limit=50, offset=0, cursor=None, supabase=supabase
+    )
+
+    query.select.assert_called_once_with(executions.EXECUTION_SUMMARY_COLUMNS)
+    query.gte.assert_called_once_with('created_at', start.isoformat())
+    query.lt.assert_called_once_with('created_at', end.isoformat())
+    query.lte.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_list_executions_summary_omits_payloads():
+    """Test that JSONB payloads are only fetched and returned with include_data."""
+    row = {
+        'run_id': 'run-1', 'workflow_id': 'wf-1', 'workflow_name': None, 'status': 'success',
+        'created_at': '2025-01-01T00:00:00+00:00', 'started_at': None, 'completed_at': None,
+        'error_message': None, 'input_data': {'a': 1}, 'output_data': {'b': 2},
+    }
+    supabase, query = _query(data=[row])
+    filters = dict(workflow_id=None, instance_id=None, status=None, start_date=None,
+                   end_date=None, search=None, limit=50, offset=0, cursor=None)
+
+    summary = orjson.loads((await list_executions(**filters, include_data=False, supabase=supabase)).body)
+    full = orjson.loads((await list_executions(**filters, include_data=True, supabase=supabase)).body)
+
+    assert summary[0]['run_id'] == 'run-1'
+    assert 'input_data' not in summary[0]
+    assert 'input_schema' not in full[0]
+    assert full[0]['input_data'] == {'a': 1}
+    assert full[0]['output_data'] == {'b': 2}
+    assert query.select.call_args_list[1][0][0].endswith(executions.EXECUTION_DATA_COLUMNS)
+
+
+@pytest.mark.asyncio
+async def test_list_executions_seeks_from_cursor():
+    """Test that a cursor becomes a keyset filter and a full page returns the next cursor."""
+    rows = [
+        {'run_id': f'00000000-0000-0000-0000-00000000000{i}', 'workflow_id': 'wf-1', 'status': 'success',
+         'created_at': f'2025-01-0{i}T00:00:00+00:00'}
+        for i in (2, 1)
+    ]
+    supabase, query = _query(data=rows)
+    params = query.params
+    cursor = encode_cursor('2025-01-03T00:00:00+00:00', '00000000-0000-0000-0000-000000000003')
+
+    response = await list_executions(
+        workflow_id=None, instance_id=None, status=None, start_date=None, end_date=None,
+        search=None, include_data=False, limit=2, offset=0, cursor=cursor, supabase=supabase
+    )
+
+    params.set.assert_called_once_with('order', 'created_at.desc,run_id.desc')
+    params.set.return_value.add.assert_called_once_with(
+        'or',
+        '(created_at.lt."2025-01-03T00:00:00+00:00",'
+        'and(created_at.eq."2025-01-03T00:00:00+00:00",run_id.lt.00000000-0000-0000-0000-000000000003))'
+    )
+    query.limit.assert_called_once_with(2)
+    query.range.assert_not_called()
+    assert decode_cursor(response.headers['X-Next-Cursor']) == (
+        '2025-01-01T00:00:00+00:00', '00000000-0000-0000-0000-000000000001'
+    )
+
+
+def test_decode_cursor_rejects_garbage():
+    """Test that malformed cursors raise ValueError."""
+    for cursor in ('not-base64!', encode_cursor('yesterday', 'run-1')):
+        with pytest.raises(ValueError):
+            decode_cursor(cursor)
+
+
+@pytest.mark.asyncio
+async def test_count_executions_is_cached():
+    """Test that repeated counts with the same filters hit the database once."""
+    supabase, query = _query(count=42)
+    filters = dict(workflow_id='wf-1', instance_id=None, status='running',
+                   start_date=None, end_date=None, search=None)
+
+    first = await count_executions(**filters, supabase=supabase)
+    second = await count_executions(**filters, supabase=supabase)
+
+    assert first.count == second.count == 42
+    query.select.assert_called_once_with('run_id', count='exact')
+    query.execute.assert_awaited_once()
+
+
+def _loader(row):
+    loader = MagicMock()
+    loader.load = AsyncMock(return_value=row)
+    return loader
+
+
+RUN_ID = UUID('00000000-0000-0000-0000-000000000001')
+
+
+@pytest.mark.asyncio
+async def test_get_execution_caches_terminal_runs():
+    """Test that finished runs are read once and then served from cache."""
+    loader = _loader({'run_id': str(RUN_ID), 'workflow_id': 'wf-1', 'status': 'success',
+                      'created_at': '2025-01-01T00:00:00+00:00', 'completed_at': '2025-01-01T00:01:00+00:00'})
+
+    await get_execution(RUN_ID, Response(), if_none_match=None, loader=loader)
+    await get_execution(RUN_ID, Response(), if_none_match=None, loader=loader)
+    loader.load.assert_awaited_once_with(str(RUN_ID))
+
+    executions.invalidate_execution(str(RUN_ID))
+    await get_execution(RUN_ID, Response(), if_none_match=None, loader=loader)
+    assert loader.load.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_get_execution_does_not_cache_running():
+    """Test that in-flight runs are re-read on every poll."""
+    loader = _loader({'run_id': str(RUN_ID), 'workflow_id': 'wf-1', 'status': 'running',
+                      'created_at': '2025-01-01T00:00:00+00:00'})
+
+    await get_execution(RUN_ID, Response(), if_none_match=None, loader=loader)
+    await get_execution(RUN_ID, Response(), if_none_match=None, loader=loader)
+
+    assert loader.load.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_get_execution_etag_returns_304():
+    """Test that a matching If-None-Match short-circuits with 304."""
+    loader = _loader({'run_id': str(RUN_ID), 'workflow_id': 'wf-1', 'status': 'running',
+                      'created_at': '2025-01-01T00:00:00+00:00'})
+    response = Response()
+
+    await get_execution(RUN_ID, response, if_none_match=None, loader=loader)
+    etag = response.headers['ETag']
+    result = await get_execution(RUN_ID, Response(), if_none_match=etag, loader=loader)
+
+    assert result.status_code == 304
+    assert result.headers['ETag'] == etag
+
+
+LIST_FILTERS = dict(workflow_id=None, instance_id=None, status=None, start_date=None, end_date=None,
+                    limit=50, offset=0, cursor=None)
+
+
+@pytest.mark.asyncio
+async def test_list_executions_reads_summaries_unless_payloads_needed():
+    """Test that plain lists read execution_summaries and payload queries read execution_logs."""
+    supabase, _ = _query()
+
+    await list_executions(**LIST_FILTERS, search=None, include_data=False, supabase=supabase)
+    await list_executions(**LIST_FILTERS, search='foo', include_data=False, supabase=supabase)
+    await list_executions(**LIST_FILTERS, search=None, include_data=True, supabase=supabase)
+
+    tables = [c[0][0] for c in supabase.table.call_args_list]
+    assert tables == ['execution_summaries', 'execution_logs', 'execution_logs']
+
+
+@pytest.mark.asyncio
+async def test_list_executions_falls_back_without_summary_table():
+    """Test that a missing execution_summaries table falls back to execution_logs."""
+    supabase, query = _query()
+    query.execute.side_effect = [
+        APIError({'code': '42P01', 'message': 'relation "execution_summaries" does not exist'}),
+        MagicMock(data=[]),
+    ]
+
+    await list_executions(**LIST_FILTERS, search=None, include_data=False, supabase=supabase)
+
+    tables = [c[0][0] for c in supabase.table.call_args_list]
+    assert tables == ['execution_summaries', 'execution_logs']
+
+
+@pytest.mark.asyncio
+async def test_execution_stats_reads_planner_estimate():
+    """Test that stats use pg_class when the Postgres pool is available and are cached."""
+    supabase, query = _query()
+    pg = MagicMock()
+    pg.fetchval = AsyncMock(return_value=1234)
+
+    first = await execution_stats(supabase=supabase, pg=pg)
+    second = await execution_stats(supabase=supabase, pg=pg)
+
+    assert first.total == second.total == 1234
+    pg.fetchval.assert_awaited_once_with(executions.PG_ESTIMATE_EXECUTIONS)
+    query.execute.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_execution_stats_falls_back_to_estimated_count():
+    """Test that stats use PostgREST's estimated count without a Postgres pool."""
+    supabase, query = _query(count=-1)
+
+    result = await execution_stats(supabase=supabase, pg=None)
+
+    assert result.total == 0
+    query.select.assert_called_once_with('run_id', count='estimated')
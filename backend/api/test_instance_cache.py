@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from api import instance_cache
+from api.instance_cache import get_active_instance, invalidate_instance, updating_instance
+
+INSTANCE = {"id": "inst-1", "url": "https://n8n.example.com", "api_key_encrypted": "key"}
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    instance_cache._instances.clear()
+    yield
+    instance_cache._instances.clear()
+
+
+def _supabase(data):
+    supabase = MagicMock()
+    query = supabase.table.return_value.select.return_value.eq.return_value.eq.return_value
+    query.execute = AsyncMock(return_value=MagicMock(data=data))
+    return supabase, query
+
+
+@pytest.mark.asyncio
+async def test_get_active_instance_caches_row():
+    """Test that repeated lookups only query the database once."""
+    supabase, query = _supabase([INSTANCE])
+
+    first = await get_active_instance(supabase, "inst-1")
+    second = await get_active_instance(supabase, "inst-1")
+
+    assert first == second == INSTANCE
+    query.execute.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_get_active_instance_coalesces_concurrent_misses():
+    """Test that concurrent misses share one database query."""
+    supabase, query = _supabase([INSTANCE])
+
+    results = await asyncio.gather(*(get_active_instance(supabase, "inst-1") for _ in range(5)))
+
+    assert all(r == INSTANCE for r in results)
+    query.execute.assert_awaited_once()
+    assert instance_cache._fetch_locks == {}
+
+
+@pytest.mark.asyncio
+async def test_get_active_instance_does_not_cache_missing():
+    """Test that an unknown instance is looked up again next time."""
+    supabase, query = _supabase([])
+
+    assert await get_active_instance(supabase, "inst-1") is None
+    assert await get_active_instance(supabase, "inst-1") is None
+    assert query.execute.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_invalidate_instance_forces_reload():
+    """Test that invalidation drops the cached record."""
+    supabase, query = _supabase([INSTANCE])
+
+    await get_active_instance(supabase, "inst-1")
+    invalidate_instance("inst-1")
+    await get_active_instance(supabase, "inst-1")
+
+    assert query.execute.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_lookup_during_update_waits_and_rereads():
+    """Test that a lookup racing an instance update cannot cache the old row."""
+    supabase, query = _supabase([INSTANCE])
+
+    async with updating_instance("inst-1"):
+        pending = asyncio.ensure_future(get_active_instance(supabase, "inst-1"))
+        await asyncio.sleep(0)
+        assert not pending.done()
+        query.execute.return_value = MagicMock(data=[])
+
+    assert await pending is None
+    assert "inst-1" not in instance_cache._instances
+    assert instance_cache._fetch_locks == {}
@@ -0,0 +1,107 @@
+import pytest
+from fastapi import HTTPException
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from api.n8n_service import N8nClient
+from api.v1.instances import InstanceCreate, create_instance, delete_instance
+
+ROW = {
+    "id": "00000000-0000-0000-0000-000000000001",
+    "name": "Prod",
+    "url": "https://n8n.example.com/",
+    "is_active": True,
+    "created_at": "2025-01-01T00:00:00+00:00",
+    "updated_at": "2025-01-01T00:00:00+00:00",
+}
+
+
+def _supabase(existing):
+    supabase = MagicMock()
+    table = supabase.table.return_value
+    table.select.return_value.eq.return_value.eq.return_value.limit.return_value.execute = AsyncMock(
+        return_value=MagicMock(data=existing)
+    )
+    table.insert.return_value.execute = AsyncMock(return_value=MagicMock(data=[ROW]))
+    return supabase
+
+
+def _n8n_client(is_valid):
+    client = MagicMock()
+    client.validate_connection = AsyncMock(return_value=is_valid)
+    client.__aenter__ = AsyncMock(return_value=client)
+    client.__aexit__ = AsyncMock(return_value=None)
+    return MagicMock(return_value=client)
+
+
+PAYLOAD = InstanceCreate(name="Prod", url="https://n8n.example.com", api_key="key")
+
+
+@pytest.mark.asyncio
+async def test_create_instance_inserts_after_checks():
+    """Test that a reachable, uniquely named instance is inserted."""
+    supabase = _supabase(existing=[])
+
+    with patch("api.v1.instances.N8nClient", _n8n_client(True)):
+        result = await create_instance(PAYLOAD, supabase=supabase)
+
+    assert result.id == ROW["id"]
+    supabase.table.return_value.insert.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_create_instance_reports_all_errors():
+    """Test that connection and duplicate-name failures are merged into one 400."""
+    supabase = _supabase(existing=[{"id": ROW["id"]}])
+
+    with patch("api.v1.instances.N8nClient", _n8n_client(False)):
+        with pytest.raises(HTTPException) as exc_info:
+            await create_instance(PAYLOAD, supabase=supabase)
+
+    assert exc_info.value.status_code == 400
+    assert "Failed to connect" in exc_info.value.detail
+    assert "already exists" in exc_info.value.detail
+    supabase.table.return_value.insert.assert_not_called()
+
+
+def _deleting_supabase(row):
+    supabase = MagicMock()
+    supabase.table.return_value.update.return_value.eq.return_value.execute = AsyncMock(
+        return_value=MagicMock(data=[{**ROW, "is_active": False, **row}])
+    )
+    return supabase
+
+
+@pytest.fixture
+def workflow_caches():
+    N8nClient._workflow_list_cache.clear()
+    N8nClient._workflow_cache.clear()
+    yield N8nClient._workflow_list_cache, N8nClient._workflow_cache
+    N8nClient._workflow_list_cache.clear()
+    N8nClient._workflow_cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_delete_instance_evicts_cached_workflows(workflow_caches):
+    """Test that deleting an instance drops its cached n8n workflow data."""
+    listings, definitions = workflow_caches
+    listings[(ROW["url"], "key")] = []
+    definitions[(ROW["url"], "key", "wf-1")] = {}
+    definitions[(ROW["url"], "other-key", "wf-1")] = {}
+
+    with patch.object(N8nClient, "_get_pooled_client") as get_pooled_client:
+        await delete_instance(ROW["id"], supabase=_deleting_supabase({"api_key_encrypted": "key"}))
+
+    assert dict(listings) == {}
+    assert list(definitions) == [(ROW["url"], "other-key", "wf-1")]
+    get_pooled_client.assert_not_called()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("row", [
+    {"api_key_encrypted": None},
+    {"api_key_encrypted": ""},
+    {"url": "not a url", "api_key_encrypted": "key"},
+])
+async def test_delete_instance_with_unusable_credentials_succeeds(workflow_caches, row):
+    """Test that a committed soft delete is not reported as a 500 when nothing can be cached."""
+    assert await delete_instance(ROW["id"], supabase=_deleting_supabase(row)) is None
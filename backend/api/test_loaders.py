@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from api.loaders import BatchLoader, table_loader
+
+
+@pytest.mark.asyncio
+async def test_concurrent_loads_share_one_fetch():
+    """Test that keys requested in the same window are fetched together."""
+    fetch = AsyncMock(return_value={"a": {"id": "a"}, "b": {"id": "b"}})
+    loader = BatchLoader(fetch)
+
+    results = await asyncio.gather(loader.load("a"), loader.load("b"), loader.load("a"))
+
+    assert results == [{"id": "a"}, {"id": "b"}, {"id": "a"}]
+    fetch.assert_awaited_once_with(["a", "b"])
+
+
+@pytest.mark.asyncio
+async def test_missing_key_resolves_to_none():
+    """Test that keys absent from the fetch result load as None."""
+    loader = BatchLoader(AsyncMock(return_value={}))
+
+    assert await loader.load("missing") is None
+
+
+@pytest.mark.asyncio
+async def test_max_batch_dispatches_immediately():
+    """Test that a full batch is fetched without waiting for the delay."""
+    fetch = AsyncMock(side_effect=lambda keys: {k: {"id": k} for k in keys})
+    loader = BatchLoader(fetch, delay=10, max_batch=2)
+
+    results = await asyncio.wait_for(asyncio.gather(loader.load("a"), loader.load("b")), timeout=1)
+
+    assert results == [{"id": "a"}, {"id": "b"}]
+
+
+@pytest.mark.asyncio
+async def test_fetch_error_reaches_every_caller():
+    """Test that a failed batch raises in each waiting request."""
+    loader = BatchLoader(AsyncMock(side_effect=RuntimeError("db down")))
+
+    results = await asyncio.gather(loader.load("a"), loader.load("b"), return_exceptions=True)
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+@pytest.mark.asyncio
+async def test_table_loader_uses_in_filter():
+    """Test that the table loader queries all keys with one `in` filter."""
+    supabase = MagicMock()
+    query = supabase.table.return_value.select.return_value.in_.return_value
+    query.execute = AsyncMock(return_value=MagicMock(data=[{"run_id": "r1", "status": "success"}]))
+    loader = table_loader(supabase, "execution_logs", "run_id")
+
+    results = await asyncio.gather(loader.load("r1"), loader.load("r2"))
+
+    assert results == [{"run_id": "r1", "status": "success"}, None]
+    supabase.table.assert_called_once_with("execution_logs")
+    supabase.table.return_value.select.return_value.in_.assert_called_once_with("run_id", ["r1", "r2"])
@@ -1,10 +1,31 @@
+import asyncio
+import json
 import pytest
 import httpx
-from unittest.mock import AsyncMock, MagicMock
-from api.n8n_service import N8nClient, N8nConnectionError, WorkflowNotFoundError, parse_input_schema, detect_trigger_type
+from unittest.mock import AsyncMock, MagicMock, patch
+from api.n8n_service import (
+    N8nClient,
+    N8nConnectionError,
+    WorkflowNotFoundError,
+    parse_input_schema,
+    parse_output_schema,
+    detect_trigger_type,
+    is_webhook_node,
+    _analyze_workflow
+)
 
 
 # Pytest fixtures for mocking httpx responses
+@pytest.fixture(autouse=True)
+def clear_workflow_caches():
+    """Reset the class-level workflow caches between tests."""
+    N8nClient._workflow_cache.clear()
+    N8nClient._workflow_list_cache.clear()
+    yield
+    N8nClient._workflow_cache.clear()
+    N8nClient._workflow_list_cache.clear()
+
+
 @pytest.fixture
 def mock_httpx_client():
     """Mock httpx AsyncClient for testing."""
@@ -62,7 +83,7 @@ def mock_successful_response():
     """Mock a successful httpx response."""
     response = MagicMock(spec=httpx.Response)
     response.status_code = 200
-    response.json.return_value = {"key": "value"}
+    response.content = json.dumps({"key": "value"}).encode()
     return response
 
 
@@ -93,7 +114,7 @@ class TestN8nClient:
         # Mock the response
         mock_response = MagicMock(spec=httpx.Response)
         mock_response.status_code = 200
-        mock_response.json.return_value = {"data": sample_workflows_list}
+        mock_response.content = json.dumps({"data": sample_workflows_list}).encode()
         
         # Set up the mock client's request method
         n8n_client_with_mocked_responses.client.request = AsyncMock(return_value=mock_response)
@@ -106,13 +127,45 @@ class TestN8nClient:
         assert result[0]["id"] == "1"
         assert result[0]["name"] == "Workflow 1"
 
+    @pytest.mark.asyncio
+    async def test_get_workflows_numeric_id_and_null_name(self, n8n_client_with_mocked_responses):
+        """Test that numeric ids (older n8n) and null names do not fail the listing."""
+        mock_response = MagicMock(spec=httpx.Response)
+        mock_response.status_code = 200
+        mock_response.content = json.dumps([
+            {"id": 7, "name": None, "active": True},
+            {"id": "8", "name": "Workflow 8", "active": False},
+        ]).encode()
+        n8n_client_with_mocked_responses.client.request = AsyncMock(return_value=mock_response)
+        
+        result = await n8n_client_with_mocked_responses.get_workflows()
+        
+        assert result == [
+            {"id": "7", "name": "", "active": True},
+            {"id": "8", "name": "Workflow 8", "active": False},
+        ]
+
+    @pytest.mark.asyncio
+    async def test_get_workflows_invalid_json(self, n8n_client_with_mocked_responses):
+        """Test that a non-JSON body raises N8nConnectionError with a short preview."""
+        mock_response = MagicMock(spec=httpx.Response)
+        mock_response.status_code = 200
+        mock_response.content = b"<html>" + b"x" * 1000
+        n8n_client_with_mocked_responses.client.request = AsyncMock(return_value=mock_response)
+        
+        with pytest.raises(N8nConnectionError, match="<html>") as exc_info:
+            await n8n_client_with_mocked_responses.get_workflows()
+        
+        # Assertions
+        assert len(str(exc_info.value)) < 200
+
     @pytest.mark.asyncio
     async def test_get_workflow_by_id_success(self, n8n_client_with_mocked_responses, sample_workflow_data):
         """Test successful retrieval of a specific workflow."""
         # Mock the response
         mock_response = MagicMock(spec=httpx.Response)
         mock_response.status_code = 200
-        mock_response.json.return_value = sample_workflow_data
+        mock_response.content = json.dumps(sample_workflow_data).encode()
         
         # Set up the mock client's request method
         n8n_client_with_mocked_responses.client.request = AsyncMock(return_value=mock_response)
@@ -124,13 +177,79 @@ class TestN8nClient:
         assert result["id"] == "123"
         assert result["name"] == "Test Workflow"
 
+    @pytest.mark.asyncio
+    async def test_get_workflow_by_id_uses_cache(self, n8n_client_with_mocked_responses, sample_workflow_data):
+        """Test that concurrent and repeated reads of a workflow hit n8n once."""
+        mock_response = MagicMock(spec=httpx.Response)
+        mock_response.status_code = 200
+        mock_response.content = json.dumps(sample_workflow_data).encode()
+        n8n_client_with_mocked_responses.client.request = AsyncMock(return_value=mock_response)
+        
+        results = await asyncio.gather(
+            n8n_client_with_mocked_responses.get_workflow_by_id("123"),
+            n8n_client_with_mocked_responses.get_workflow_by_id("123")
+        )
+        await n8n_client_with_mocked_responses.get_workflow_by_id("123")
+        
+        # Assertions
+        assert results[0]["id"] == "123"
+        assert n8n_client_with_mocked_responses.client.request.await_count == 1
+        
+        n8n_client_with_mocked_responses.invalidate_cache("123")
+        await n8n_client_with_mocked_responses.get_workflow_by_id("123")
+        assert n8n_client_with_mocked_responses.client.request.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_get_workflows_with_details_skips_missing(self, n8n_client_with_mocked_responses, sample_workflows_list, sample_workflow_data, mock_404_response):
+        """Test that details are fetched per workflow and missing ones are skipped."""
+        list_response = MagicMock(spec=httpx.Response)
+        list_response.status_code = 200
+        list_response.content = json.dumps({"data": sample_workflows_list}).encode()
+        detail_response = MagicMock(spec=httpx.Response)
+        detail_response.status_code = 200
+        detail_response.content = json.dumps(sample_workflow_data).encode()
+        
+        async def fake_request(method, url, **kwargs):
+            if url.endswith("api/v1/workflows"):
+                return list_response
+            if url.endswith("api/v1/workflows/1"):
+                return detail_response
+            return mock_404_response
+        
+        n8n_client_with_mocked_responses.client.request = AsyncMock(side_effect=fake_request)
+        
+        result = await n8n_client_with_mocked_responses.get_workflows_with_details(concurrency=2)
+        
+        # Assertions
+        assert len(result) == 1
+        assert result[0]["id"] == "123"
+
+    @pytest.mark.asyncio
+    async def test_get_workflow_trigger_streams_nodes(self, n8n_client_with_mocked_responses):
+        """Test that the trigger node is found from a streamed workflow response."""
+        body = json.dumps({
+            "id": "123",
+            "nodes": [
+                {"name": "Set", "type": "n8n-nodes-base.set", "parameters": {"value": 1.5}},
+                {"name": "Webhook", "type": "n8n-nodes-base.webhook", "parameters": {"path": "abc"}}
+            ]
+        }).encode()
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, content=body))
+        n8n_client_with_mocked_responses.client = httpx.AsyncClient(transport=transport)
+        
+        trigger_type, node_definition = await n8n_client_with_mocked_responses.get_workflow_trigger("123")
+        
+        # Assertions
+        assert trigger_type == "webhook"
+        assert node_definition["parameters"]["path"] == "abc"
+
     @pytest.mark.asyncio
     async def test_validate_connection_success(self, n8n_client_with_mocked_responses):
         """Test successful validation of connection."""
         # Mock the response
         mock_response = MagicMock(spec=httpx.Response)
         mock_response.status_code = 200
-        mock_response.json.return_value = {"data": []}
+        mock_response.content = json.dumps({"data": []}).encode()
         
         # Set up the mock client's request method
         n8n_client_with_mocked_responses.client.request = AsyncMock(return_value=mock_response)
@@ -153,6 +272,73 @@ class TestN8nClient:
         # Assertions
         assert result is False
 
+    @pytest.mark.asyncio
+    async def test_async_context_manager_keeps_shared_pool_open(self, n8n_client_with_mocked_responses):
+        """Test that leaving the async context does not close the host's shared pool."""
+        shared_client = n8n_client_with_mocked_responses.client
+        async with n8n_client_with_mocked_responses as client:
+            assert client is n8n_client_with_mocked_responses
+        
+        # Assertions
+        shared_client.aclose.assert_not_awaited()
+
+    def test_page_url_is_sanitized(self):
+        """Test that a pasted workflow page URL is reduced to the instance base URL."""
+        client = N8nClient("https://example-n8n.com/workflow/abc123", "test-api-key")
+        
+        # Assertions
+        assert client.instance_url == "https://example-n8n.com/"
+
+    def test_clients_share_pool_per_host(self):
+        """Test that clients for the same host reuse one HTTP client regardless of API key."""
+        first = N8nClient("https://shared-n8n.com/", "key-one")
+        second = N8nClient("https://shared-n8n.com/", "key-two")
+        other = N8nClient("https://other-n8n.com/", "key-one")
+        
+        # Assertions
+        assert first.client is second.client
+        assert first.client is not other.client
+        assert second.headers["X-N8N-API-KEY"] == "key-two"
+
+    @pytest.mark.asyncio
+    async def test_retries_on_retryable_status(self, n8n_client_with_mocked_responses, mock_successful_response):
+        """Test that 503 responses are retried with backoff honoring Retry-After."""
+        unavailable = httpx.Response(503, headers={"Retry-After": "2"}, request=httpx.Request("GET", "https://example-n8n.com/"))
+        n8n_client_with_mocked_responses.client.request = AsyncMock(side_effect=[unavailable, mock_successful_response])
+        
+        with patch("api.retry.asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
+            result = await n8n_client_with_mocked_responses._make_request("GET", "api/v1/workflows")
+        
+        # Assertions
+        assert result is mock_successful_response
+        mock_sleep.assert_awaited_once()
+        assert mock_sleep.call_args[0][0] >= 2.0
+
+    @pytest.mark.asyncio
+    async def test_no_retry_on_client_error(self, n8n_client_with_mocked_responses):
+        """Test that non-retryable 4xx responses fail without sleeping."""
+        bad_request = httpx.Response(400, request=httpx.Request("GET", "https://example-n8n.com/"))
+        n8n_client_with_mocked_responses.client.request = AsyncMock(return_value=bad_request)
+        
+        with patch("api.retry.asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
+            with pytest.raises(N8nConnectionError):
+                await n8n_client_with_mocked_responses._make_request("GET", "api/v1/workflows")
+        
+        # Assertions
+        assert n8n_client_with_mocked_responses.client.request.await_count == 1
+        mock_sleep.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_get_workflow_by_id_not_found(self, n8n_client_with_mocked_responses, mock_404_response):
+        """Test that a 404 raises WorkflowNotFoundError on the first attempt."""
+        n8n_client_with_mocked_responses.client.request = AsyncMock(return_value=mock_404_response)
+        
+        with pytest.raises(WorkflowNotFoundError):
+            await n8n_client_with_mocked_responses.get_workflow_by_id("missing")
+        
+        # Assertions
+        assert n8n_client_with_mocked_responses.client.request.await_count == 1
+
     @pytest.mark.asyncio
     async def test_n8n_connection_error(self):
         """Test that N8nConnectionError is raised appropriately."""
@@ -235,6 +421,12 @@ class TestUtilityFunctions:
         assert trigger_type == "unknown"
         assert node_definition == workflow_json["nodes"][0]
 
+    def test_is_webhook_node(self):
+        """Test webhook node classification ignores case and other node types."""
+        assert is_webhook_node({"type": "n8n-nodes-base.Webhook"})
+        assert not is_webhook_node({"type": "n8n-nodes-base.manualTrigger"})
+        assert not is_webhook_node({})
+
     @pytest.mark.asyncio
     async def test_parse_input_schema_with_no_trigger_node(self):
         """Test parsing input schema when no trigger node exists."""
@@ -257,4 +449,52 @@ class TestUtilityFunctions:
             "required": [],
             "definitions": {}
         }
-        assert result == expected_default
\ No newline at end of file
+        assert result == expected_default
+
+    @pytest.mark.asyncio
+    async def test_fused_analysis_matches_individual_rules(self):
+        """Test that trigger detection and schema parsing keep their own node rules."""
+        input_schema = {"type": "object", "properties": {"q": {"type": "string"}}}
+        output_schema = {"type": "object", "properties": {"answer": {"type": "string"}}}
+        workflow_json = {
+            "nodes": [
+                {"name": "Run Sub-workflow", "type": "n8n-nodes-base.executeWorkflow", "parameters": {}},
+                {"name": "Webhook", "type": "n8n-nodes-base.webhook", "parameters": {"schema": input_schema}},
+                {"name": "Respond", "type": "n8n-nodes-base.respondToWebhook", "parameters": {"output_schema": output_schema}}
+            ]
+        }
+        
+        trigger_type, node_definition = detect_trigger_type(workflow_json)
+        
+        # Assertions
+        assert trigger_type == "manual"
+        assert node_definition == workflow_json["nodes"][0]
+        assert parse_input_schema(workflow_json) == input_schema
+        assert parse_output_schema(workflow_json) == output_schema
+
+    @pytest.mark.asyncio
+    async def test_analysis_reflects_in_place_changes(self, sample_workflow_data):
+        """Test that editing an unversioned workflow dict is never answered from a stale analysis."""
+        sample_workflow_data.pop("versionId", None)
+        sample_workflow_data.pop("updatedAt", None)
+        sample_workflow_data["nodes"][0]["type"] = "n8n-nodes-base.manualTrigger"
+        assert _analyze_workflow(sample_workflow_data).trigger_type == "manual"
+        
+        sample_workflow_data["nodes"][0]["type"] = "n8n-nodes-base.webhook"
+        assert detect_trigger_type(sample_workflow_data)[0] == "webhook"
+
+    @pytest.mark.asyncio
+    async def test_analysis_finds_trigger_and_input_node_separately(self):
+        """Test that the single pass keeps looking for the input node after the trigger is found."""
+        input_schema = {"type": "object", "properties": {"q": {"type": "string"}}}
+        workflow_json = {"nodes": [
+            {"type": "n8n-nodes-base.executeWorkflow", "parameters": {"schema": {"ignored": True}}},
+            {"type": "n8n-nodes-base.webhook", "parameters": {"schema": input_schema}},
+        ]}
+        
+        analysis = _analyze_workflow(workflow_json)
+        
+        # Assertions
+        assert analysis.trigger_type == "manual"
+        assert analysis.trigger_node is workflow_json["nodes"][0]
+        assert analysis.input_schema == input_schema
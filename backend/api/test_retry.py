@@ -0,0 +1,96 @@
+import pytest
+from unittest.mock import AsyncMock, patch
+from api.retry import async_retry
+
+
+class TransientError(Exception):
+    """Error raised by the functions under test to trigger a retry."""
+    retry_after = 0.0
+
+
+@pytest.mark.asyncio
+async def test_async_retry_succeeds_after_transient_errors():
+    """Test that the call is retried until it succeeds."""
+    calls = []
+    
+    @async_retry(max_attempts=3, retry_on=(TransientError,))
+    async def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise TransientError("try again")
+        return "ok"
+    
+    with patch("api.retry.asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
+        result = await flaky()
+    
+    # Assertions
+    assert result == "ok"
+    assert len(calls) == 3
+    assert mock_sleep.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_async_retry_reraises_after_last_attempt():
+    """Test that the last error is re-raised once attempts run out."""
+    @async_retry(max_attempts=2, retry_on=(TransientError,))
+    async def always_fails():
+        raise TransientError("still failing")
+    
+    with patch("api.retry.asyncio.sleep", new_callable=AsyncMock):
+        with pytest.raises(TransientError):
+            await always_fails()
+
+
+@pytest.mark.asyncio
+async def test_async_retry_does_not_retry_other_errors():
+    """Test that exceptions outside retry_on propagate immediately."""
+    calls = []
+    
+    @async_retry(max_attempts=3, retry_on=(TransientError,))
+    async def broken():
+        calls.append(1)
+        raise ValueError("bad input")
+    
+    with patch("api.retry.asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
+        with pytest.raises(ValueError):
+            await broken()
+    
+    # Assertions
+    assert len(calls) == 1
+    mock_sleep.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_async_retry_honors_retry_after():
+    """Test that the delay is at least the exception's retry_after."""
+    error = TransientError("rate limited")
+    error.retry_after = 5.0
+    
+    @async_retry(max_attempts=2, base_delay=0.1, max_delay=10.0, retry_on=(TransientError,))
+    async def rate_limited():
+        raise error
+    
+    with patch("api.retry.asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
+        with pytest.raises(TransientError):
+            await rate_limited()
+    
+    # Assertions
+    assert mock_sleep.call_args[0][0] == 5.0
+
+
+@pytest.mark.asyncio
+async def test_async_retry_caps_retry_after_at_max_delay():
+    """Test that a huge Retry-After cannot make the caller sleep past max_delay."""
+    error = TransientError("rate limited")
+    error.retry_after = 86400.0
+    
+    @async_retry(max_attempts=2, max_delay=20.0, retry_on=(TransientError,))
+    async def rate_limited():
+        raise error
+    
+    with patch("api.retry.asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
+        with pytest.raises(TransientError):
+            await rate_limited()
+    
+    # Assertions
+    assert mock_sleep.call_args[0][0] == 20.0
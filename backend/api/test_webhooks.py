@@ -0,0 +1,106 @@
+import pytest
+from fastapi import HTTPException
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from api.v1 import webhooks
+from api.v1.webhooks import WebhookPayload, webhook_callback
+
+PAYLOAD = WebhookPayload(output_data={"result": "ok"}, secret_key="wrong")
+VALID = WebhookPayload(output_data={"result": "ok"}, secret_key="right")
+
+
+@pytest.fixture(autouse=True)
+def secret():
+    with patch("api.v1.webhooks.verify_callback_secret", lambda key: key == "right"):
+        yield
+
+
+@pytest.fixture(autouse=True)
+def clear_failures():
+    webhooks._callback_failures.clear()
+    yield
+    webhooks._callback_failures.clear()
+
+
+def _request(host="203.0.113.7"):
+    request = MagicMock()
+    request.client.host = host
+    return request
+
+
+@pytest.mark.asyncio
+async def test_rejected_callback_returns_400():
+    """Test that a callback the handler rejects is a 400, not a 500."""
+    with patch("api.v1.webhooks.record_workflow_callback", AsyncMock(return_value=False)):
+        with pytest.raises(HTTPException) as exc_info:
+            await webhook_callback("run-1", _request(), VALID, supabase=MagicMock(), pg=None)
+
+    assert exc_info.value.status_code == 400
+    assert webhooks._callback_failures == {}
+
+
+@pytest.mark.asyncio
+async def test_repeated_bad_secrets_are_throttled_before_the_handler():
+    """Test that a client over the failure limit gets a 429 and never reaches the handler."""
+    handler = AsyncMock(return_value=True)
+    with patch("api.v1.webhooks.record_workflow_callback", handler):
+        for _ in range(webhooks.CALLBACK_FAILURE_LIMIT):
+            with pytest.raises(HTTPException):
+                await webhook_callback("run-1", _request(), PAYLOAD, supabase=MagicMock(), pg=None)
+
+        with pytest.raises(HTTPException) as exc_info:
+            await webhook_callback("run-1", _request(), PAYLOAD, supabase=MagicMock(), pg=None)
+        # Other clients are unaffected
+        with pytest.raises(HTTPException) as other:
+            await webhook_callback("run-1", _request("198.51.100.1"), PAYLOAD, supabase=MagicMock(), pg=None)
+
+    assert exc_info.value.status_code == 429
+    assert other.value.status_code == 400
+    handler.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_throttled_client_is_rejected_before_hashing():
+    """Test that a client over the limit gets a 429 without its secret being checked."""
+    webhooks._callback_failures["203.0.113.7"] = webhooks.CALLBACK_FAILURE_LIMIT
+    verify = MagicMock(return_value=True)
+    handler = AsyncMock(return_value=True)
+    with patch("api.v1.webhooks.verify_callback_secret", verify), \
+         patch("api.v1.webhooks.record_workflow_callback", handler):
+        with pytest.raises(HTTPException) as exc_info:
+            await webhook_callback("run-1", _request(), VALID, supabase=MagicMock(), pg=None)
+
+    assert exc_info.value.status_code == 429
+    verify.assert_not_called()
+    handler.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_valid_secret_resets_failures_and_is_checked_once():
+    """Test that a correct secret clears the client's failures and is verified only once."""
+    webhooks._callback_failures["203.0.113.7"] = webhooks.CALLBACK_FAILURE_LIMIT - 1
+    verify = MagicMock(side_effect=lambda key: key == "right")
+    handler = AsyncMock(return_value=True)
+    with patch("api.v1.webhooks.verify_callback_secret", verify), \
+         patch("api.v1.webhooks.record_workflow_callback", handler), \
+         patch("api.workflow_service.verify_callback_secret") as service_verify, \
+         patch("api.v1.webhooks.invalidate_execution"):
+        result = await webhook_callback("run-1", _request(), VALID, supabase=MagicMock(), pg=None)
+
+    assert result["status"] == "success"
+    assert webhooks._callback_failures == {}
+    verify.assert_called_once_with("right")
+    service_verify.assert_not_called()
+    handler.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_handler_failures_are_not_counted():
+    """Test that unknown runs and database errors do not count towards the limit."""
+    with patch("api.v1.webhooks.record_workflow_callback", AsyncMock(return_value=False)):
+        for _ in range(webhooks.CALLBACK_FAILURE_LIMIT + 1):
+            with pytest.raises(HTTPException) as exc_info:
+                await webhook_callback("run-1", _request(), VALID, supabase=MagicMock(), pg=None)
+
+    assert exc_info.value.status_code == 400
+    assert webhooks._callback_failures == {}
@@ -1,66 +1,188 @@
 import asyncio
-import os
+import copy
+import hashlib
+import json
+import pathlib
+import re
 import pytest
+import pytest_asyncio
 import httpx
+import respx
 from unittest.mock import AsyncMock, MagicMock, patch
-from datetime import datetime
+from config import settings
+from api import instance_cache, workflow_service
+from api.n8n_service import N8nClient, shutdown_pools
 from api.workflow_service import (
-    WorkflowExecutor, 
-    handle_workflow_callback, 
+    WorkflowExecutor,
+    handle_workflow_callback,
     execute_workflow_task,
-    generate_webhook_url
+    generate_webhook_url,
+    close_http_client,
+    update_execution,
+    NOW
 )
 
 
-@pytest.fixture
-def async_supabase_client():
-    """Mocked async Supabase client for testing."""
-    mock_client = AsyncMock()
-    mock_client.table = MagicMock()
-    return mock_client
+N8N_URL = "https://n8n.example.com"
+WEBHOOK_URL = f"{N8N_URL}/webhook/abc"
+SECRET_DIGEST = hashlib.sha256(b"test-secret-key").digest()
+MIGRATION_SQL = pathlib.Path(__file__).resolve().parents[2] / "SUPABASE_MIGRATION.sql"
 
 
-@pytest.fixture
-def redis_client():
-    """Mocked Redis client for testing."""
-    mock_client = MagicMock()
-    mock_client.get = MagicMock()
-    mock_client.set = MagicMock()
-    return mock_client
+def _table_columns(table):
+    """Column names of a table as created by SUPABASE_MIGRATION.sql."""
+    body = re.search(
+        rf"CREATE TABLE IF NOT EXISTS {table} \((.*?)\n\);", MIGRATION_SQL.read_text(), re.S
+    ).group(1)
+    return {line.split()[0] for line in body.strip().splitlines()}
+
+
+# Tables whose writes FakeSupabase checks against the real schema
+TABLE_COLUMNS = {'execution_logs': _table_columns('execution_logs')}
+
+
+class FakeResponse:
+    """Stand-in for a postgrest APIResponse."""
+
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeQuery:
+    """Chainable query builder that runs against FakeSupabase's in-memory rows."""
+
+    def __init__(self, db, table):
+        self.db = db
+        self.table = table
+        self.op = None
+        self.payload = None
+        self.filters = []
+
+    def select(self, columns='*'):
+        self.op = 'select'
+        return self
+
+    def insert(self, row):
+        self.op, self.payload = 'insert', row
+        return self
+
+    def update(self, values):
+        self.op, self.payload = 'update', values
+        return self
+
+    def eq(self, column, value):
+        self.filters.append((column, value))
+        return self
+
+    def in_(self, column, values):
+        self.filters.append((column, tuple(values)))
+        return self
+
+    def _matches(self, row):
+        return all(
+            row.get(column) in value if isinstance(value, tuple) else row.get(column) == value
+            for column, value in self.filters
+        )
+
+    async def execute(self):
+        self.db.calls.append((self.table, self.op, copy.deepcopy(self.payload), list(self.filters)))
+        error = self.db.errors.get((self.table, self.op))
+        if error:
+            raise error
+        columns = TABLE_COLUMNS.get(self.table)
+        if columns is not None and self.op in ('insert', 'update'):
+            unknown = set(self.payload) - columns
+            if unknown:
+                # What PostgREST answers for a column the table doesn't have
+                raise Exception(f"Could not find the {sorted(unknown)} column of '{self.table}' in the schema cache")
+        rows = self.db.tables.setdefault(self.table, [])
+        if self.op == 'insert':
+            rows.append(dict(self.payload))
+            return FakeResponse([self.payload])
+        matched = [row for row in rows if self._matches(row)]
+        if self.op == 'update':
+            for row in matched:
+                row.update(self.payload)
+        return FakeResponse(matched)
+
+
+class FakeRPC:
+    def __init__(self, db, name, params):
+        self.db = db
+        self.name = name
+        self.params = params
+
+    async def execute(self):
+        self.db.calls.append(('rpc', self.name, copy.deepcopy(self.params), []))
+        return FakeResponse([len(self.db.calls)])
+
+
+class FakeSupabase:
+    """
+    Minimal AsyncSupabase stand-in.
+
+    Rows live in `tables`; every executed query is appended to `calls` as
+    (table, op, payload, filters). Map (table, op) to an exception in
+    `errors` to make that query fail.
+    """
+
+    def __init__(self, tables=None):
+        self.tables = tables or {}
+        self.calls = []
+        self.errors = {}
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def rpc(self, name, params):
+        return FakeRPC(self, name, params)
+
+    def updates(self, table='execution_logs'):
+        return [payload for t, op, payload, _ in self.calls if t == table and op == 'update']
 
 
 @pytest.fixture
-def celery_app():
-    """Mocked Celery app for testing."""
-    mock_app = MagicMock()
-    mock_app.conf = {
-        'task_always_eager': True,  # Run tasks synchronously for testing
-        'task_eager_propagates': True
-    }
-    return mock_app
+def supabase():
+    """In-memory Supabase with one instance and one running execution."""
+    return FakeSupabase({
+        'instances': [{
+            "id": "test-instance-123", "url": N8N_URL, "api_key_encrypted": "test-api-key", "is_active": True
+        }],
+        'execution_logs': [{"run_id": "test-run-123", "status": "running", "input_data": {"test": "data"}}],
+    })
+
+
+@pytest_asyncio.fixture(autouse=True)
+async def reset_shared_clients():
+    """Drop caches and pooled clients so each test gets a fresh event loop's clients."""
+    N8nClient._workflow_cache.clear()
+    instance_cache._instances.clear()
+    workflow_service._webhook_targets.clear()
+    yield
+    N8nClient._workflow_cache.clear()
+    instance_cache._instances.clear()
+    workflow_service._webhook_targets.clear()
+    await close_http_client()
+    await shutdown_pools()
 
 
 @pytest.fixture
-def sample_workflow_json():
-    """Sample workflow JSON for testing."""
-    return {
+def n8n():
+    """respx router with the test workflow and its webhook."""
+    workflow = {
         "id": "test-workflow-123",
         "name": "Test Workflow",
-        "nodes": [
-            {
-                "id": "node1",
-                "name": "HTTP Request",
-                "type": "n8n-nodes-base.httpRequest",
-                "parameters": {
-                    "url": "https://httpbin.org/post",
-                    "method": "POST",
-                    "options": {}
-                },
-                "position": [0, 0]
-            }
-        ],
-        "connections": {}
+        "nodes": [{
+            "type": "n8n-nodes-base.webhook",
+            "parameters": {"path": "abc", "httpMethod": "POST"},
+        }],
+        "connections": {},
     }
+    with respx.mock(assert_all_called=False) as router:
+        router.get(f"{N8N_URL}/api/v1/workflows/test-workflow-123").mock(
+            return_value=httpx.Response(200, json=workflow)
+        )
+        yield router
 
 
 @pytest.fixture
@@ -77,272 +199,211 @@ def sample_execution_data():
     }
 
 
+async def _run_task(supabase):
+    await execute_workflow_task(
+        supabase,
+        "test-run-123",
+        "https://backend.example.com/api/v1/webhook/callback/test-run-123",
+        {"test": "data"},
+        N8N_URL,
+        "test-api-key",
+        "test-workflow-123"
+    )
+
+
 @pytest.mark.asyncio
-async def test_queue_execution_success(async_supabase_client, sample_execution_data):
+async def test_queue_execution_success(supabase, sample_execution_data):
     """Test successful queueing of workflow execution."""
-    # Set up mock responses
-    async_supabase_client.table.return_value.insert.return_value.execute = AsyncMock()
-    instance_details = {
-        "id": "test-instance-123",
-        "url": "https://n8n.example.com",
-        "api_key": "test-api-key"
-    }
-    select_mock = AsyncMock()
-    select_mock.eq.return_value.execute.return_value = MagicMock(data=[instance_details])
-    async_supabase_client.table.return_value.select = MagicMock(return_value=select_mock)
-    
-    # Create executor and call queue_execution
-    executor = WorkflowExecutor(async_supabase_client, MagicMock())
+    executor = WorkflowExecutor(supabase, None)
     result = await executor.queue_execution(
         workflow_id=sample_execution_data["workflow_id"],
         user_id=sample_execution_data["user_id"],
         input_data=sample_execution_data["input_data"],
         instance_id=sample_execution_data["instance_id"]
     )
-    
+
     # Assertions
     assert result is not None
     assert len(result) == 36  # UUID length
-    # Verify the insert was called
-    async_supabase_client.table.return_value.insert.assert_called_once()
-    # Verify instance details were retrieved
-    async_supabase_client.table.return_value.select.assert_called_once()
+    ops = [(table, op) for table, op, _, _ in supabase.calls]
+    assert ops == [('execution_logs', 'insert'), ('instances', 'select'), ('rpc', 'pgmq_send')]
+    # The inserted row must be JSON-ready for the PostgREST request body
+    json.dumps(supabase.calls[0][2])
+    message = supabase.calls[-1][2]['msg']
+    assert message['run_id'] == result
+    assert message['instance_id'] == "test-instance-123"
+    assert 'api_key' not in message
 
 
-@pytest.mark.asyncio
-async def test_queue_execution_invalid_data(async_supabase_client):
-    """Test that invalid input_data raises an error."""
-    executor = WorkflowExecutor(async_supabase_client, MagicMock())
-    
-    # Test with empty input_data
-    with pytest.raises(ValueError):
-        await executor.queue_execution(
-            workflow_id="test-workflow-123",
-            user_id="test-user-123",
-            input_data={},
-            instance_id="test-instance-123"
-        )
-    
-    # Test with non-dict input_data
-    with pytest.raises(ValueError):
-        await executor.queue_execution(
-            workflow_id="test-workflow-123",
-            user_id="test-user-123",
-            input_data="invalid",
-            instance_id="test-instance-123"
-        )
+@pytest.mark.parametrize("input_data", [{}, "invalid", ["a"]])
+def test_execution_input_rejects_invalid_data(input_data):
+    """Test that invalid input_data is rejected at the request model boundary."""
+    from pydantic import TypeAdapter, ValidationError
+    from api.workflow_service import ExecutionInputData
+
+    with pytest.raises(ValidationError):
+        TypeAdapter(ExecutionInputData).validate_python(input_data)
 
 
 @pytest.mark.asyncio
-@patch.dict(os.environ, {'WORKFLOW_CALLBACK_SECRET_KEY': 'test-secret-key'})
-async def test_callback_handler_success(async_supabase_client):
+@patch('api.workflow_service._SECRET_DIGEST', SECRET_DIGEST)
+async def test_callback_handler_success(supabase):
     """Test successful callback handling with valid secret."""
-    # Mock supabase response for finding the execution log
-    select_mock = AsyncMock()
-    select_mock.eq.return_value.execute.return_value = MagicMock(
-        data=[{
-            "run_id": "test-run-123",
-            "status": "running",
-            "input_data": {"test": "data"}
-        }]
-    )
-    async_supabase_client.table.return_value.select = MagicMock(return_value=select_mock)
-    
-    # Mock the update operation
-    async_supabase_client.table.return_value.update.return_value.eq = MagicMock(return_value=AsyncMock())
-    async_supabase_client.table.return_value.update.return_value.eq.return_value.execute = AsyncMock()
-    
-    # Call the callback handler
     result = await handle_workflow_callback(
+        supabase,
         run_id="test-run-123",
         output_data={"result": "success"},
         secret_key="test-secret-key"
     )
-    
+
     # Assertions
     assert result is True
-    # Verify the update was called with success status
-    async_supabase_client.table.return_value.update.assert_called_once()
     # Check that the update included the success status and output data
-    args, kwargs = async_supabase_client.table.return_value.update.call_args
-    update_data = args[0]
+    [update_data] = supabase.updates()
     assert update_data["status"] == "success"
     assert update_data["output_data"]["result"] == "success"
+    assert supabase.tables['execution_logs'][0]["status"] == "success"
 
 
 @pytest.mark.asyncio
-@patch.dict(os.environ, {'WORKFLOW_CALLBACK_SECRET_KEY': 'test-secret-key'})
-async def test_callback_handler_invalid_secret(async_supabase_client):
+@patch('api.workflow_service._SECRET_DIGEST', SECRET_DIGEST)
+async def test_callback_handler_invalid_secret(supabase):
     """Test callback handling with invalid secret key."""
-    # Call the callback handler with wrong secret
     result = await handle_workflow_callback(
+        supabase,
         run_id="test-run-123",
         output_data={"result": "success"},
         secret_key="wrong-secret-key"
     )
-    
+
     # Assertions
     assert result is False
-    # Verify that no update was made to the execution log
-    async_supabase_client.table.return_value.update.assert_not_called()
+    # Verify that the database was never touched
+    assert supabase.calls == []
 
 
 @pytest.mark.asyncio
-@patch.dict(os.environ, {'WORKFLOW_CALLBACK_SECRET_KEY': 'test-secret-key'})
-async def test_callback_handler_not_found(async_supabase_client):
+@patch('api.workflow_service._SECRET_DIGEST', SECRET_DIGEST)
+async def test_callback_handler_not_found(supabase):
     """Test callback handling with unknown run_id."""
-    # Mock supabase response - no execution log found
-    select_mock = AsyncMock()
-    select_mock.eq.return_value.execute.return_value = MagicMock(data=[])
-    async_supabase_client.table.return_value.select = MagicMock(return_value=select_mock)
-    
-    # Call the callback handler
     result = await handle_workflow_callback(
+        supabase,
         run_id="unknown-run-id",
         output_data={"result": "success"},
         secret_key="test-secret-key"
     )
-    
+
     # Assertions
     assert result is False
+    assert supabase.tables['execution_logs'][0]["status"] == "running"
 
 
 @pytest.mark.asyncio
 async def test_generate_webhook_url():
     """Test that webhook URL is generated correctly."""
-    # Patch the config.BACKEND_URL import
-    with patch('api.workflow_service.BACKEND_URL', 'https://myapp.com'):
-        run_id = "test-run-123"
-        webhook_url = generate_webhook_url(run_id)
-        
-        # Assertions
-        expected_url = "https://myapp.com/v1/webhook/callback/test-run-123"
-        assert webhook_url == expected_url
-
-
-@pytest.mark.asyncio
-async def test_celery_task_success(async_supabase_client):
-    """Test that the Celery task executes successfully."""
-    # Mock the update operations
-    update_mock = MagicMock()
-    update_mock.eq.return_value.execute = AsyncMock()
-    async_supabase_client.table.return_value.update = MagicMock(return_value=update_mock)
-    
-    # Mock httpx client to simulate successful API call
-    with patch('httpx.AsyncClient') as mock_client_class:
-        mock_client = AsyncMock()
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_client.post.return_value = mock_response
-        mock_client_class.return_value.__aenter__.return_value = mock_client
-        
-        # Mock Supabase import inside the function
-        with patch('api.workflow_service.supabase', async_supabase_client):
-            # Call the task function directly
-            await execute_workflow_task(
-                run_id="test-run-123",
-                webhook_url="https://example.com/webhook",
-                input_data={"test": "data"},
-                instance_url="https://n8n.example.com",
-                api_key="test-api-key"
-            )
-    
-    # Verify the status was updated to 'running'
-    assert async_supabase_client.table.return_value.update.called
-    # Check that the update was called with 'running' status
-    calls = async_supabase_client.table.return_value.update.call_args_list
-    running_update_called = any(call[0][0].get('status') == 'running' for call in calls)
-    assert running_update_called
-
-
-@pytest.mark.asyncio
-async def test_celery_task_retry_on_network_error(async_supabase_client):
-    """Test that the Celery task implements retry logic on network errors."""
-    # Mock the update operations
-    update_mock = MagicMock()
-    update_mock.eq.return_value.execute = AsyncMock()
-    async_supabase_client.table.return_value.update = MagicMock(return_value=update_mock)
-    
-    # Mock httpx client to raise a network error multiple times, then succeed
-    with patch('httpx.AsyncClient') as mock_client_class, \
-         patch('asyncio.sleep', new_callable=AsyncMock) as mock_sleep:
-        mock_client = AsyncMock()
-        # Configure it to raise a network error the first few times, then succeed
-        mock_client.post.side_effect = [
-            httpx.RequestError("Network error"),
-            httpx.RequestError("Network error"), 
-            MagicMock(status_code=200)  # Success on third attempt
-        ]
-        mock_client_class.return_value.__aenter__.return_value = mock_client
-        
-        # Mock Supabase import inside the function
-        with patch('api.workflow_service.supabase', async_supabase_client):
-            # Call the task function directly
-            await execute_workflow_task(
-                run_id="test-run-123",
-                webhook_url="https://example.com/webhook",
-                input_data={"test": "data"},
-                instance_url="https://n8n.example.com",
-                api_key="test-api-key"
-            )
-    
-    # Verify the status was updated correctly
-    assert async_supabase_client.table.return_value.update.called
-    # Verify sleep was called for the retry delays
-    assert mock_sleep.call_count >= 2  # Called for each retry attempt minus the last success
-
-
-@pytest.mark.asyncio
-async def test_celery_task_timeout(async_supabase_client):
-    """Test that the Celery task handles timeout correctly."""
-    # Mock the update operations
-    update_mock = MagicMock()
-    update_mock.eq.return_value.execute = AsyncMock()
-    async_supabase_client.table.return_value.update = MagicMock(return_value=update_mock)
-    
-    # Mock the httpx client to raise a timeout
-    with patch('httpx.AsyncClient') as mock_client_class:
-        mock_client = AsyncMock()
-        mock_client_class.return_value.__aenter__.return_value = mock_client
-        mock_client.post.side_effect = httpx.TimeoutException("Request timed out")
-        
-        # Mock Supabase import inside the function
-        with patch('api.workflow_service.supabase', async_supabase_client):
-            # Call the task function directly
-            await execute_workflow_task(
-                run_id="test-run-123",
-                webhook_url="https://example.com/webhook",
-                input_data={"test": "data"},
-                instance_url="https://n8n.example.com",
-                api_key="test-api-key"
-            )
-    
-    # Verify the status was updated to 'failed' with timeout message
-    assert async_supabase_client.table.return_value.update.called
-    # It should be called at least twice: once for 'running', once for 'failed'
-    assert async_supabase_client.table.return_value.update.call_count >= 1
-
-
-@pytest.mark.asyncio
-async def test_workflow_executor_initialization():
+    with patch.object(settings, 'BACKEND_URL', 'https://myapp.com'):
+        webhook_url = generate_webhook_url("test-run-123")
+
+    assert webhook_url == "https://myapp.com/api/v1/webhook/callback/test-run-123"
+
+
+@pytest.mark.asyncio
+async def test_execute_workflow_task_success(supabase, n8n):
+    """Test that the task marks the run as running and triggers the webhook."""
+    webhook = n8n.post(WEBHOOK_URL).mock(return_value=httpx.Response(200))
+
+    await _run_task(supabase)
+
+    assert webhook.call_count == 1
+    sent = json.loads(webhook.calls[0].request.content)
+    assert sent == {
+        "test": "data",
+        "_callback_url": "https://backend.example.com/api/v1/webhook/callback/test-run-123",
+        "_run_id": "test-run-123",
+    }
+    statuses = [update['status'] for update in supabase.updates()]
+    assert statuses == ['running']
+
+
+@pytest.mark.asyncio
+async def test_execute_workflow_task_retry_on_network_error(supabase, n8n):
+    """Test that network errors on the webhook are retried with backoff."""
+    webhook = n8n.post(WEBHOOK_URL).mock(side_effect=[
+        httpx.ConnectError("Network error"),
+        httpx.ConnectError("Network error"),
+        httpx.Response(200),
+    ])
+
+    with patch('api.retry.asyncio.sleep', new_callable=AsyncMock) as mock_sleep:
+        await _run_task(supabase)
+
+    assert webhook.call_count == 3
+    assert mock_sleep.await_count == 2
+    assert [update['status'] for update in supabase.updates()] == ['running']
+
+
+@pytest.mark.asyncio
+async def test_execute_workflow_task_timeout(supabase, n8n):
+    """Test that exhausting retries on connect timeouts marks the run as failed."""
+    webhook = n8n.post(WEBHOOK_URL).mock(side_effect=httpx.ConnectTimeout("Connect timed out"))
+
+    with patch('api.retry.asyncio.sleep', new_callable=AsyncMock):
+        await _run_task(supabase)
+
+    assert webhook.call_count == 3
+    failed = supabase.updates()[-1]
+    assert failed['status'] == 'failed'
+    assert 'timed out after 3 attempts' in failed['error_message']
+
+
+@pytest.mark.asyncio
+async def test_execute_workflow_task_failure_does_not_overwrite_callback(supabase, n8n):
+    """Test that a trigger failing after the callback already finished the run leaves it successful."""
+    async def callback_then_timeout(request):
+        supabase.tables['execution_logs'][0]['status'] = 'success'
+        raise httpx.ReadTimeout("Read timed out")
+
+    n8n.post(WEBHOOK_URL).mock(side_effect=callback_then_timeout)
+
+    await _run_task(supabase)
+
+    assert supabase.tables['execution_logs'][0]['status'] == 'success'
+    failed = supabase.updates()[-1]
+    assert failed['status'] == 'failed'
+    assert supabase.calls[-1][3] == [('run_id', 'test-run-123'), ('status', ('pending', 'running'))]
+
+
+@pytest.mark.asyncio
+async def test_execute_workflow_task_does_not_resend_after_read_timeout(supabase, n8n):
+    """Test that a request n8n may already have received is not sent again."""
+    webhook = n8n.post(WEBHOOK_URL).mock(side_effect=httpx.ReadTimeout("Read timed out"))
+
+    with patch('api.retry.asyncio.sleep', new_callable=AsyncMock) as mock_sleep:
+        await _run_task(supabase)
+
+    assert webhook.call_count == 1
+    mock_sleep.assert_not_awaited()
+    failed = supabase.updates()[-1]
+    assert failed['status'] == 'failed'
+    assert 'waiting' in failed['error_message']
+
+
+@pytest.mark.asyncio
+async def test_workflow_executor_initialization(supabase):
     """Test that WorkflowExecutor is initialized correctly."""
-    executor = WorkflowExecutor(async_supabase_client, MagicMock())
-    
+    executor = WorkflowExecutor(supabase, settings)
+
     # Assertions
-    assert executor.supabase is not None
-    assert executor.config is not None
+    assert executor.supabase is supabase
+    assert executor.config is settings
 
 
 @pytest.mark.asyncio
-async def test_queue_execution_missing_instance(async_supabase_client):
+async def test_queue_execution_missing_instance(supabase):
     """Test queue execution with missing instance details."""
-    # Mock supabase to return empty data for instance details
-    select_mock = AsyncMock()
-    select_mock.eq.return_value.execute.return_value = MagicMock(data=[])
-    async_supabase_client.table.return_value.select = MagicMock(return_value=select_mock)
-    
-    executor = WorkflowExecutor(async_supabase_client, MagicMock())
-    
+    supabase.tables['instances'] = []
+    executor = WorkflowExecutor(supabase, None)
+
     # Should raise ValueError when instance is not found
     with pytest.raises(ValueError, match="Instance with ID test-instance-123 not found"):
         await executor.queue_execution(
@@ -354,20 +415,11 @@ async def test_queue_execution_missing_instance(async_supabase_client):
 
 
 @pytest.mark.asyncio
-async def test_queue_execution_missing_instance_credentials(async_supabase_client):
+async def test_queue_execution_missing_instance_credentials(supabase):
     """Test queue execution with missing instance URL or API key."""
-    # Mock supabase to return instance with missing credentials
-    instance_details = {
-        "id": "test-instance-123",
-        "url": "",  # Missing URL
-        "api_key": ""  # Missing API key
-    }
-    select_mock = AsyncMock()
-    select_mock.eq.return_value.execute.return_value = MagicMock(data=[instance_details])
-    async_supabase_client.table.return_value.select = MagicMock(return_value=select_mock)
-    
-    executor = WorkflowExecutor(async_supabase_client, MagicMock())
-    
+    supabase.tables['instances'] = [{"id": "test-instance-123", "url": "", "api_key_encrypted": "", "is_active": True}]
+    executor = WorkflowExecutor(supabase, None)
+
     # Should raise ValueError when credentials are missing
     with pytest.raises(ValueError, match="Missing instance URL or API key"):
         await executor.queue_execution(
@@ -379,84 +431,94 @@ async def test_queue_execution_missing_instance_credentials(async_supabase_clien
 
 
 @pytest.mark.asyncio
-async def test_callback_handler_supabase_error(async_supabase_client):
-    """Test callback handler when Supabase operations fail."""
-    # Mock supabase to raise an exception when selecting
-    select_mock = AsyncMock()
-    select_mock.eq.return_value.execute.side_effect = Exception("Database error")
-    async_supabase_client.table.return_value.select = MagicMock(return_value=select_mock)
-    
-    with patch.dict(os.environ, {'WORKFLOW_CALLBACK_SECRET_KEY': 'test-secret-key'}):
-        result = await handle_workflow_callback(
-            run_id="test-run-123",
-            output_data={"result": "success"},
-            secret_key="test-secret-key"
-        )
-    
-    # Should return False when there's an error
-    assert result is False
+@patch('api.workflow_service._SECRET_DIGEST', SECRET_DIGEST)
+async def test_callback_handler_single_round_trip(supabase):
+    """Test that the callback updates the run without a lookup query first."""
+    result = await handle_workflow_callback(
+        supabase,
+        run_id="test-run-123",
+        output_data={"result": "success"},
+        secret_key="test-secret-key"
+    )
+
+    assert result is True
+    assert [(table, op) for table, op, _, _ in supabase.calls] == [('execution_logs', 'update')]
 
 
 @pytest.mark.asyncio
-async def test_callback_handler_update_error(async_supabase_client):
+@patch('api.workflow_service._SECRET_DIGEST', SECRET_DIGEST)
+async def test_callback_handler_ignores_duplicate_delivery(supabase):
+    """Test that a retried callback for a finished run succeeds without rewriting it."""
+    first = await handle_workflow_callback(
+        supabase, run_id="test-run-123", output_data={"result": "first"}, secret_key="test-secret-key"
+    )
+    second = await handle_workflow_callback(
+        supabase, run_id="test-run-123", output_data={"result": "retry"}, secret_key="test-secret-key"
+    )
+
+    assert first is second is True
+    assert supabase.tables['execution_logs'][0]["output_data"] == {"result": "first"}
+    assert [op for _, op, _, _ in supabase.calls] == ['update', 'update', 'select']
+
+
+@pytest.mark.asyncio
+@patch('api.workflow_service._SECRET_DIGEST', SECRET_DIGEST)
+async def test_callback_handler_update_error(supabase):
     """Test callback handler when the update operation fails."""
-    # Mock supabase to return a valid execution log but fail on update
-    select_mock = AsyncMock()
-    select_mock.eq.return_value.execute.return_value = MagicMock(
-        data=[{
-            "run_id": "test-run-123",
-            "status": "running",
-            "input_data": {"test": "data"}
-        }]
+    supabase.errors[('execution_logs', 'update')] = Exception("Update failed")
+
+    result = await handle_workflow_callback(
+        supabase,
+        run_id="test-run-123",
+        output_data={"result": "success"},
+        secret_key="test-secret-key"
     )
-    async_supabase_client.table.return_value.select = MagicMock(return_value=select_mock)
-    
-    # Mock update to raise an exception
-    update_mock = MagicMock()
-    update_mock.eq.return_value.execute.side_effect = Exception("Update failed")
-    async_supabase_client.table.return_value.update = MagicMock(return_value=update_mock)
-    
-    with patch.dict(os.environ, {'WORKFLOW_CALLBACK_SECRET_KEY': 'test-secret-key'}):
-        result = await handle_workflow_callback(
-            run_id="test-run-123",
-            output_data={"result": "success"},
-            secret_key="test-secret-key"
-        )
-    
+
     # Should return False when update fails
     assert result is False
 
 
 @pytest.mark.asyncio
-async def test_celery_task_supabase_update_error(async_supabase_client):
-    """Test Celery task when Supabase update fails."""
-    # Mock the update operations to raise an exception
-    update_mock = MagicMock()
-    update_mock.eq.return_value.execute.side_effect = Exception("Database error")
-    async_supabase_client.table.return_value.update = MagicMock(return_value=update_mock)
-    
-    # Mock httpx client to simulate successful API call
-    with patch('httpx.AsyncClient') as mock_client_class:
-        mock_client = AsyncMock()
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_client.post.return_value = mock_response
-        mock_client_class.return_value.__aenter__.return_value = mock_client
-        
-        # Mock Supabase import inside the function
-        with patch('api.workflow_service.supabase', async_supabase_client):
-            # Call the task function directly
-            # This should handle the exception internally and not raise
-            await execute_workflow_task(
-                run_id="test-run-123",
-                webhook_url="https://example.com/webhook",
-                input_data={"test": "data"},
-                instance_url="https://n8n.example.com",
-                api_key="test-api-key"
-            )
-    
-    # Verify the status update was attempted
-    assert async_supabase_client.table.return_value.update.called
+async def test_execute_workflow_task_supabase_update_error(supabase, n8n):
+    """Test that a failed status write is logged without undoing the trigger."""
+    supabase.errors[('execution_logs', 'update')] = Exception("Database error")
+    webhook = n8n.post(WEBHOOK_URL).mock(return_value=httpx.Response(200))
+
+    # This should handle the exception internally and not raise
+    await _run_task(supabase)
+
+    assert len(supabase.updates()) == 1
+    assert webhook.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_execute_workflow_task_fast_failure_writes_once(supabase, n8n):
+    """Test that a trigger failing within the delay records 'failed' in one write."""
+    n8n.post(WEBHOOK_URL).mock(return_value=httpx.Response(404))
+
+    await _run_task(supabase)
+
+    updates = supabase.updates()
+    assert [update['status'] for update in updates] == ['failed']
+    assert updates[0]['started_at'] and updates[0]['completed_at']
+
+
+@pytest.mark.asyncio
+async def test_execute_workflow_task_slow_trigger_marks_running_first(supabase, n8n):
+    """Test that a trigger slower than the delay marks a pending run running before it finishes."""
+    supabase.tables['execution_logs'][0]['status'] = 'pending'
+    statuses_during_trigger = []
+
+    async def slow_trigger(*args):
+        await asyncio.sleep(0.05)
+        statuses_during_trigger.append(supabase.tables['execution_logs'][0]['status'])
+
+    with patch('api.workflow_service.RUNNING_STATUS_DELAY', 0.01), \
+            patch('api.workflow_service._trigger_workflow', slow_trigger):
+        await _run_task(supabase)
+
+    assert statuses_during_trigger == ['running']
+    assert [update['status'] for update in supabase.updates()] == ['running']
 
 
 @pytest.mark.asyncio
@@ -464,7 +526,7 @@ async def test_workflow_executor_init_with_none_values():
     """Test WorkflowExecutor initialization with None values."""
     # This should not raise an error - the values will be checked when methods are called
     executor = WorkflowExecutor(None, None)
-    
+
     assert executor.supabase is None
     assert executor.config is None
 
@@ -472,11 +534,235 @@ async def test_workflow_executor_init_with_none_values():
 @pytest.mark.asyncio
 async def test_generate_webhook_url_with_default():
     """Test webhook URL generation with default URL."""
-    # Test when BACKEND_URL is None
-    with patch('api.workflow_service.BACKEND_URL', None):
-        run_id = "test-run-123"
-        webhook_url = generate_webhook_url(run_id)
-        
-        # Should default to localhost
-        expected_url = "http://localhost:8000/v1/webhook/callback/test-run-123"
-        assert webhook_url == expected_url
\ No newline at end of file
+    with patch.object(settings, 'BACKEND_URL', None):
+        webhook_url = generate_webhook_url("test-run-123")
+
+    # Should default to localhost
+    assert webhook_url == "http://localhost:8000/api/v1/webhook/callback/test-run-123"
+
+
+@pytest.mark.asyncio
+async def test_get_http_client_is_shared():
+    """Test that webhook triggers reuse one pooled client."""
+    from api.workflow_service import get_http_client
+
+    first = await get_http_client()
+    second = await get_http_client()
+    assert first is second
+
+    await close_http_client()
+    assert first.is_closed
+    third = await get_http_client()
+    assert third is not first
+
+
+@pytest.mark.asyncio
+async def test_trigger_webhook_does_not_retry_http_errors(n8n):
+    """Test that an n8n rejection is surfaced without retrying."""
+    from api.workflow_service import _trigger_webhook
+
+    webhook = n8n.post(WEBHOOK_URL).mock(return_value=httpx.Response(404))
+
+    with patch('api.retry.asyncio.sleep', new_callable=AsyncMock) as mock_sleep:
+        with pytest.raises(httpx.HTTPStatusError):
+            await _trigger_webhook("POST", WEBHOOK_URL, {})
+
+    assert webhook.call_count == 1
+    mock_sleep.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_prepare_execution_uses_pg_pool(supabase, sample_execution_data):
+    """Test that a run is recorded and its instance resolved in one pooled statement."""
+    pg = MagicMock()
+    pg.execute = AsyncMock()
+    pg.fetchrow = AsyncMock(return_value={"id": "test-instance-123", "url": N8N_URL, "api_key_encrypted": "test-api-key"})
+    executor = WorkflowExecutor(supabase, settings, pg=pg)
+
+    message = await executor.prepare_execution(
+        "test-run-456",
+        sample_execution_data["workflow_id"],
+        sample_execution_data["user_id"],
+        sample_execution_data["input_data"],
+        sample_execution_data["instance_id"]
+    )
+
+    assert message["instance_id"] == "test-instance-123"
+    query, *args = pg.fetchrow.await_args.args
+    assert query == workflow_service.PG_INSERT_EXECUTION_LOG_WITH_INSTANCE
+    assert tuple(args[:4]) == ("test-run-456", "test-workflow-123", "test-instance-123", "pending")
+    assert json.loads(args[4]) == sample_execution_data["input_data"]
+    pg.execute.assert_not_awaited()
+    assert supabase.calls == []
+
+
+@pytest.mark.asyncio
+async def test_prepare_execution_with_cached_instance_only_inserts(supabase, sample_execution_data):
+    """Test that a cached instance leaves just the insert for the pool."""
+    instance_cache._instances["test-instance-123"] = {
+        "id": "test-instance-123", "url": N8N_URL, "api_key_encrypted": "test-api-key"
+    }
+    pg = MagicMock()
+    pg.execute = AsyncMock()
+    pg.fetchrow = AsyncMock()
+    executor = WorkflowExecutor(supabase, settings, pg=pg)
+
+    await executor.prepare_execution(
+        "test-run-456",
+        sample_execution_data["workflow_id"],
+        sample_execution_data["user_id"],
+        sample_execution_data["input_data"],
+        sample_execution_data["instance_id"]
+    )
+
+    assert pg.execute.await_args.args[0] == workflow_service.PG_INSERT_EXECUTION_LOG
+    pg.fetchrow.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_update_execution_never_rewrites_a_finished_run(supabase):
+    """Test that a terminal status cannot overwrite another, so cached finished rows stay valid."""
+    supabase.tables['execution_logs'][0]['status'] = 'success'
+
+    updated = await update_execution(supabase, "test-run-123", {"status": "failed", "error_message": "late"})
+
+    assert updated is False
+    assert supabase.tables['execution_logs'][0]['status'] == 'success'
+
+
+@pytest.mark.asyncio
+async def test_update_execution_uses_pg_pool(supabase):
+    """Test that status writes go to Postgres in one statement when a pool is given."""
+    pg = MagicMock()
+    pg.execute = AsyncMock(return_value="UPDATE 1")
+
+    updated = await update_execution(
+        supabase, "test-run-123", {"status": "running", "started_at": "2025-01-01T00:00:00"},
+        from_statuses=("pending",), pg=pg
+    )
+
+    query, run_id, values, statuses = pg.execute.await_args.args
+    assert updated is True
+    assert 'SET ("status", "started_at")' in query
+    assert query.endswith("AND status = ANY($3)")
+    assert run_id == "test-run-123"
+    assert statuses == ["pending"]
+    assert json.loads(values) == {"status": "running", "started_at": "2025-01-01T00:00:00"}
+    assert supabase.calls == []
+
+
+@pytest.mark.asyncio
+async def test_prepare_execution_caches_instance(supabase, sample_execution_data):
+    """Test that repeat runs on one instance look it up only once."""
+    executor = WorkflowExecutor(supabase, settings)
+
+    for run_id in ("run-1", "run-2"):
+        await executor.prepare_execution(
+            run_id,
+            sample_execution_data["workflow_id"],
+            sample_execution_data["user_id"],
+            sample_execution_data["input_data"],
+            sample_execution_data["instance_id"]
+        )
+
+    lookups = [call for call in supabase.calls if call[0] == 'instances']
+    assert len(lookups) == 1
+
+
+@pytest.mark.asyncio
+async def test_execute_workflow_task_reuses_webhook_target(supabase, n8n):
+    """Test that repeat runs trigger the webhook without fetching the workflow again."""
+    webhook = n8n.post(WEBHOOK_URL).mock(return_value=httpx.Response(200))
+    definition = n8n.routes[0]
+
+    await _run_task(supabase)
+    N8nClient._workflow_cache.clear()
+    await _run_task(supabase)
+
+    assert webhook.call_count == 2
+    assert definition.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_execute_workflow_task_re_resolves_moved_webhook(supabase, n8n):
+    """Test that a 404 from a remembered webhook URL resolves the workflow again."""
+    workflow_service._webhook_targets[(N8N_URL, "test-workflow-123")] = ("POST", f"{N8N_URL}/webhook/old")
+    stale = n8n.post(f"{N8N_URL}/webhook/old").mock(return_value=httpx.Response(404))
+    webhook = n8n.post(WEBHOOK_URL).mock(return_value=httpx.Response(200))
+
+    await _run_task(supabase)
+
+    assert stale.call_count == 1
+    assert webhook.call_count == 1
+    assert workflow_service._webhook_targets[(N8N_URL, "test-workflow-123")] == ("POST", WEBHOOK_URL)
+    assert [update['status'] for update in supabase.updates()] == ['running']
+
+
+@pytest.mark.asyncio
+async def test_update_execution_stamps_now_in_postgres(supabase):
+    """Test that NOW timestamps are set by Postgres on the pool and in Python otherwise."""
+    pg = MagicMock()
+    pg.execute = AsyncMock(return_value="UPDATE 1")
+
+    await update_execution(supabase, "test-run-123", {"status": "failed", "completed_at": NOW}, pg=pg)
+    await update_execution(supabase, "test-run-123", {"status": "failed", "completed_at": NOW})
+
+    query, _, values, statuses = pg.execute.await_args.args
+    assert '"completed_at" = now()' in query
+    assert json.loads(values) == {"status": "failed"}
+    assert statuses == ["pending", "running"]
+    [update] = supabase.updates()
+    assert isinstance(update["completed_at"], str)
+
+
+@pytest.mark.asyncio
+async def test_insert_execution_log_passes_input_data_by_reference(supabase):
+    """Test that the insert row reuses the caller's input_data instead of copying it."""
+    from api.workflow_service import ExecutionLogCreate
+
+    input_data = {"nested": {"items": [1, 2, 3]}}
+    inserted = []
+    supabase.table = lambda name: MagicMock(insert=lambda row: inserted.append(row) or MagicMock(execute=AsyncMock()))
+    executor = WorkflowExecutor(supabase, settings)
+
+    await executor._insert_execution_log(ExecutionLogCreate(
+        run_id="test-run-456", workflow_id="wf", instance_id="inst", input_data=input_data
+    ))
+
+    assert inserted[0]["input_data"] is input_data
+
+
+@pytest.mark.asyncio
+async def test_defer_execution_records_pending_run_before_enqueueing(supabase):
+    """Test that a deferred run can be polled as soon as its run_id is returned."""
+    executor = WorkflowExecutor(supabase, settings)
+
+    run_id = await executor.defer_execution("wf", "user", {"a": 1}, "test-instance-123")
+
+    assert [(table, op) for table, op, _, _ in supabase.calls] == [
+        ('execution_logs', 'insert'), ('rpc', 'pgmq_send')
+    ]
+    row = supabase.calls[0][2]
+    assert row['run_id'] == run_id and row['status'] == 'pending'
+    assert supabase.calls[1][2]['msg'] == {
+        'run_id': run_id, 'workflow_id': 'wf', 'instance_id': 'test-instance-123', 'input_data': {'a': 1}
+    }
+
+
+def test_execution_log_insert_columns_exist():
+    """Test that both insert paths only write columns execution_logs has."""
+    from api.workflow_service import EXECUTION_LOG_INSERT_COLUMNS, ExecutionLogCreate, _execution_log_row
+
+    row = _execution_log_row(ExecutionLogCreate(
+        run_id="test-run-456", workflow_id="wf", instance_id="inst", input_data={}
+    ))
+
+    assert set(EXECUTION_LOG_INSERT_COLUMNS) <= TABLE_COLUMNS['execution_logs']
+    assert tuple(row) == EXECUTION_LOG_INSERT_COLUMNS
+
+
+@pytest.mark.asyncio
+async def test_fake_supabase_rejects_unknown_columns(supabase):
+    """Test that the fake fails like PostgREST on a column the table doesn't have."""
+    with pytest.raises(Exception, match="user_id"):
+        await supabase.table('execution_logs').insert({"run_id": "r", "user_id": "u"}).execute()
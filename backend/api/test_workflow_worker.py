@@ -0,0 +1,223 @@
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, call, patch
+
+from api import instance_cache
+from api.workflow_service import WEBHOOK_RESPONSE_TIMEOUT
+from api.workflow_worker import MAX_DELIVERIES, VISIBILITY_TIMEOUT, WorkflowWorker
+
+
+def _record(msg_id, read_ct=1, run_id=None):
+    return {
+        "msg_id": msg_id,
+        "read_ct": read_ct,
+        "message": {
+            "run_id": run_id or f"run-{msg_id}",
+            "webhook_url": "https://backend/api/v1/webhook/callback/x",
+            "input_data": {"a": 1},
+            "instance_id": "inst-1",
+            "workflow_id": "wf-1",
+        },
+    }
+
+
+@pytest.fixture(autouse=True)
+def cached_instance():
+    instance_cache._instances["inst-1"] = {
+        "id": "inst-1", "url": "https://n8n.example.com", "api_key_encrypted": "key"
+    }
+    yield
+    instance_cache._instances.clear()
+
+
+@pytest.mark.asyncio
+async def test_run_once_executes_and_acknowledges_batch():
+    """Test that each message runs as a coroutine and is deleted."""
+    supabase = MagicMock()
+    with patch('api.workflow_worker.read_executions', AsyncMock(return_value=[_record(1), _record(2)])) as mock_read, \
+         patch('api.workflow_worker.delete_executions', AsyncMock()) as mock_delete, \
+         patch('api.workflow_worker.execute_workflow_task', AsyncMock()) as mock_execute:
+        worker = WorkflowWorker(supabase)
+        processed = await worker.run_once()
+        await worker.drain()
+
+    assert processed == 2
+    assert {c.args[1] for c in mock_execute.call_args_list} == {"run-1", "run-2"}
+    mock_delete.assert_has_awaits([call(supabase, [1]), call(supabase, [2])], any_order=True)
+    mock_read.assert_awaited_once_with(supabase, VISIBILITY_TIMEOUT, 10)
+
+
+def test_visibility_timeout_outlasts_slowest_trigger():
+    """Test that a message stays hidden longer than a trigger can wait on n8n."""
+    assert VISIBILITY_TIMEOUT > 2 * WEBHOOK_RESPONSE_TIMEOUT
+
+
+@pytest.mark.asyncio
+async def test_run_once_acknowledges_each_run_as_it_finishes():
+    """Test that a slow run does not delay acknowledging the rest of the batch."""
+    supabase = MagicMock()
+    release = asyncio.Event()
+    deleted = []
+
+    async def execute(_supabase, run_id, *args, **kwargs):
+        if run_id == "run-1":
+            await release.wait()
+
+    async def delete(_supabase, msg_ids):
+        deleted.extend(msg_ids)
+
+    with patch('api.workflow_worker.read_executions', AsyncMock(return_value=[_record(1), _record(2)])), \
+         patch('api.workflow_worker.delete_executions', delete), \
+         patch('api.workflow_worker.execute_workflow_task', execute):
+        worker = WorkflowWorker(supabase)
+        await worker.run_once()
+        for _ in range(5):
+            await asyncio.sleep(0)
+        assert deleted == [2]
+        release.set()
+        await worker.drain()
+
+    assert deleted == [2, 1]
+
+
+@pytest.mark.asyncio
+async def test_slow_run_does_not_block_reads():
+    """Test that new messages start while an earlier run is still in flight."""
+    supabase = MagicMock()
+    release = asyncio.Event()
+    started = []
+
+    async def execute(_supabase, run_id, *args, **kwargs):
+        started.append(run_id)
+        if run_id == "run-1":
+            await release.wait()
+
+    reads = AsyncMock(side_effect=[[_record(1)], [_record(2)]])
+    with patch('api.workflow_worker.read_executions', reads), \
+         patch('api.workflow_worker.delete_executions', AsyncMock()), \
+         patch('api.workflow_worker.execute_workflow_task', execute):
+        worker = WorkflowWorker(supabase, max_concurrency=2)
+        await worker.run_once()
+        await worker.run_once()
+        for _ in range(5):
+            await asyncio.sleep(0)
+        assert started == ["run-1", "run-2"]
+        assert len(worker._in_flight) == 1
+        release.set()
+        await worker.drain()
+
+    # The second read only asked for the one remaining slot
+    assert reads.await_args_list[1].args[2] == 1
+
+
+@pytest.mark.asyncio
+async def test_run_once_skips_read_when_all_slots_busy():
+    """Test that no messages are read (and hidden) while every slot is running."""
+    supabase = MagicMock()
+    release = asyncio.Event()
+
+    async def execute(*args, **kwargs):
+        await release.wait()
+
+    reads = AsyncMock(return_value=[_record(1)])
+    with patch('api.workflow_worker.read_executions', reads), \
+         patch('api.workflow_worker.delete_executions', AsyncMock()), \
+         patch('api.workflow_worker.execute_workflow_task', execute):
+        worker = WorkflowWorker(supabase, max_concurrency=1)
+        assert await worker.run_once() == 1
+        assert await worker.run_once() == 0
+        release.set()
+        await worker.drain()
+
+    reads.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_run_once_archives_poison_messages():
+    """Test that messages past the delivery limit are archived, not executed."""
+    supabase = MagicMock()
+    records = [_record(1), _record(2, read_ct=MAX_DELIVERIES + 1)]
+    with patch('api.workflow_worker.read_executions', AsyncMock(return_value=records)), \
+         patch('api.workflow_worker.delete_executions', AsyncMock()) as mock_delete, \
+         patch('api.workflow_worker.archive_executions', AsyncMock()) as mock_archive, \
+         patch('api.workflow_worker.execute_workflow_task', AsyncMock()) as mock_execute:
+        worker = WorkflowWorker(supabase)
+        await worker.run_once()
+        await worker.drain()
+
+    mock_archive.assert_awaited_once_with(supabase, [2])
+    mock_delete.assert_awaited_once_with(supabase, [1])
+    assert mock_execute.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_run_once_empty_queue():
+    """Test that an empty read does nothing."""
+    with patch('api.workflow_worker.read_executions', AsyncMock(return_value=[])), \
+         patch('api.workflow_worker.delete_executions', AsyncMock()) as mock_delete:
+        assert await WorkflowWorker(MagicMock()).run_once() == 0
+    mock_delete.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_queue_execution_enqueues_run():
+    """Test that queue_execution sends the run to the queue instead of spawning a task."""
+    from api.workflow_service import WorkflowExecutor
+
+    executor = WorkflowExecutor(MagicMock(), None)
+    executor._insert_execution_log = AsyncMock()
+    executor._get_instance_details = AsyncMock(
+        return_value={"url": "https://n8n.example.com", "api_key_encrypted": "key"}
+    )
+    with patch('api.workflow_service.send_execution', AsyncMock(return_value=1)) as mock_send:
+        run_id = await executor.queue_execution("wf-1", "user", {"a": 1}, "inst-1")
+
+    payload = mock_send.call_args[0][1]
+    assert payload["run_id"] == run_id
+    assert payload["workflow_id"] == "wf-1"
+    assert payload["webhook_url"].endswith(f"/api/v1/webhook/callback/{run_id}")
+    assert payload["instance_id"] == "inst-1"
+    assert "api_key" not in payload
+
+
+@pytest.mark.asyncio
+async def test_message_credentials_are_resolved_from_instance():
+    """Test that the worker looks up the API key rather than reading it from the message."""
+    with patch('api.workflow_worker.execute_workflow_task', AsyncMock()) as mock_execute:
+        await WorkflowWorker(MagicMock())._execute(_record(1)["message"])
+
+    assert mock_execute.call_args[0][4:6] == ("https://n8n.example.com", "key")
+
+
+@pytest.mark.asyncio
+async def test_message_for_deactivated_instance_fails_run():
+    """Test that a queued run whose instance was removed is marked failed."""
+    instance_cache._instances.clear()
+    worker = WorkflowWorker(MagicMock())
+    worker.executor._fetch_instance = AsyncMock(return_value=None)
+    worker._mark_failed = AsyncMock()
+
+    with patch('api.workflow_worker.execute_workflow_task', AsyncMock()) as mock_execute:
+        await worker._execute(_record(1)["message"])
+
+    mock_execute.assert_not_awaited()
+    worker._mark_failed.assert_awaited_once_with("run-1", "Instance with ID inst-1 not found")
+
+
+@pytest.mark.asyncio
+async def test_deferred_message_runs_without_recording_again():
+    """Test that id-only messages are executed without a second execution log insert."""
+    worker = WorkflowWorker(MagicMock())
+    worker.executor._insert_execution_log = AsyncMock()
+    deferred = {
+        "run_id": "run-1", "workflow_id": "wf-1",
+        "instance_id": "inst-1", "input_data": {"a": 1},
+    }
+
+    with patch('api.workflow_worker.execute_workflow_task', AsyncMock()) as mock_execute:
+        await worker._execute(deferred)
+
+    worker.executor._insert_execution_log.assert_not_awaited()
+    assert mock_execute.call_args[0][2].endswith("/api/v1/webhook/callback/run-1")
+    assert mock_execute.call_args[0][4] == "https://n8n.example.com"
@@ -0,0 +1,50 @@
+import pytest
+from fastapi import Response
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from api.v1.workflows import list_workflows
+
+INSTANCE = {"id": "inst-1", "url": "https://n8n.example.com", "api_key_encrypted": "key"}
+WORKFLOWS = [
+    {"id": "wf-1", "name": "First", "active": True, "tags": []},
+    {"id": "wf-2", "name": "Second", "active": False, "tags": []},
+]
+
+
+def _n8n_client(workflows):
+    client = MagicMock()
+    client.get_workflows = AsyncMock(return_value=workflows)
+    client.__aenter__ = AsyncMock(return_value=client)
+    client.__aexit__ = AsyncMock(return_value=None)
+    return MagicMock(return_value=client)
+
+
+@pytest.fixture
+def n8n():
+    with patch("api.v1.workflows.get_active_instance", AsyncMock(return_value=INSTANCE)), \
+            patch("api.v1.workflows.N8nClient", _n8n_client(WORKFLOWS)):
+        yield
+
+
+@pytest.mark.asyncio
+async def test_list_workflows_sets_etag(n8n):
+    """Test that the listing is returned with an ETag header."""
+    response = Response()
+
+    result = await list_workflows(response, instance_id="inst-1", if_none_match=None, supabase=MagicMock())
+
+    assert [wf.id for wf in result] == ["wf-1", "wf-2"]
+    assert response.headers["ETag"].startswith('"')
+
+
+@pytest.mark.asyncio
+async def test_list_workflows_etag_returns_304(n8n):
+    """Test that a matching If-None-Match short-circuits with 304."""
+    response = Response()
+    await list_workflows(response, instance_id="inst-1", if_none_match=None, supabase=MagicMock())
+    etag = response.headers["ETag"]
+
+    result = await list_workflows(Response(), instance_id="inst-1", if_none_match=etag, supabase=MagicMock())
+
+    assert result.status_code == 304
+    assert result.headers["ETag"] == etag
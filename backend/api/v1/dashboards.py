@@ -1,12 +1,55 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
-from typing import List, Dict, Any, Optional
-from pydantic import BaseModel
-from datetime import datetime
-import asyncio
+import functools
+import logging
 
-from api.workflow_service import WorkflowExecutor
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import ORJSONResponse
+from postgrest.exceptions import APIError
+from typing import Annotated, List, Dict, Any, Literal, Optional, Tuple, Union
+from pydantic import AliasChoices, BaseModel, ConfigDict, Field, TypeAdapter, ValidationError, create_model
 
-router = APIRouter()
+from api.supabase_async import AsyncSupabase
+from api.workflow_service import ExecutionInputData, WorkflowExecutor
+
+# Dashboard payloads carry nested field definitions; orjson renders them straight to bytes
+router = APIRouter(default_response_class=ORJSONResponse)
+logger = logging.getLogger(__name__)
+
+DASHBOARD_CACHE_TTL = 300
+DASHBOARD_LIST_CACHE_KEY = "dashboards:list"
+# PostgREST error code when an RPC function is not in its schema cache
+RPC_NOT_FOUND = "PGRST202"
+# Columns returned by list_dashboards; nested fields come back whole
+DASHBOARD_LIST_COLUMNS = (
+    'id,name,description,workflow_id,instance_id,theme_color,created_at,dashboard_fields(*)'
+)
+
+# Direct Postgres reads (used when SUPABASE_DB_URL is set). Rows are built as
+# jsonb in SQL so they match PostgREST's select('*, dashboard_fields(*)') shape,
+# timestamps included, and decode straight into the response models.
+_DASHBOARD_JSON = """
+    to_jsonb(d) || jsonb_build_object(
+        'dashboard_fields',
+        COALESCE(
+            (SELECT jsonb_agg(to_jsonb(f) ORDER BY f.id) FROM dashboard_fields f WHERE f.dashboard_id = d.id),
+            '[]'::jsonb
+        )
+    )
+"""
+PG_GET_DASHBOARD = f"SELECT ({_DASHBOARD_JSON})::text FROM dashboards d WHERE d.id = $1"
+# Page size when a client pages through dashboards without giving a limit
+DEFAULT_DASHBOARD_PAGE_SIZE = 50
+
+PG_LIST_DASHBOARDS = f"""
+    SELECT COALESCE(jsonb_agg(page.row ORDER BY page.id), '[]'::jsonb)::text
+    FROM (
+        SELECT d.id, {_DASHBOARD_JSON} AS row
+        FROM dashboards d
+        WHERE d.id > $1
+        ORDER BY d.id
+        LIMIT $2
+    ) page
+"""
 
 # --- Pydantic Schemas ---
 
@@ -28,10 +71,14 @@ class DashboardCreate(BaseModel):
     fields: List[DashboardFieldCreate]
 
 class DashboardFieldResponse(DashboardFieldCreate):
+    model_config = ConfigDict(from_attributes=True, extra='ignore')
+    
     id: int
     dashboard_id: int
 
 class DashboardResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True, extra='ignore')
+    
     id: int
     name: str
     description: Optional[str]
@@ -39,164 +86,307 @@ class DashboardResponse(BaseModel):
     instance_id: str
     theme_color: str
     created_at: str
-    fields: List[DashboardFieldResponse]
+    # Supabase embeds the join as dashboard_fields; accept it as-is
+    fields: List[DashboardFieldResponse] = Field(
+        validation_alias=AliasChoices('fields', 'dashboard_fields')
+    )
+
+# Bulk-dumps field lists in pydantic-core instead of one model_dump call per field
+FIELD_LIST_ADAPTER = TypeAdapter(List[DashboardFieldCreate])
 
 class DashboardExecuteRequest(BaseModel):
-    inputs: Dict[str, Any]
+    inputs: ExecutionInputData
+
+# --- Input models compiled from dashboard field specs ---
+
+# Builder field type -> accepted Python type. Checkboxes are rendered as
+# strings by the dashboard form, so either representation is accepted.
+FIELD_TYPES: Dict[str, Any] = {
+    "text": str,
+    "email": str,
+    "textarea": str,
+    "number": Union[int, float],
+    "checkbox": Union[bool, str],
+}
+
+FieldSpec = Tuple[str, str, bool, Optional[Tuple[str, ...]]]
+
+def _field_specs(fields: List[Dict[str, Any]]) -> Tuple[FieldSpec, ...]:
+    """Reduce field rows to the hashable parts that shape the input model."""
+    return tuple(
+        (f['name'], f['type'], bool(f.get('required')), tuple(f['options']) if f.get('options') else None)
+        for f in fields
+    )
+
+@functools.lru_cache(maxsize=1024)
+def compile_dashboard_model(specs: Tuple[FieldSpec, ...]) -> type[BaseModel]:
+    """
+    Build (once per distinct field spec) a model that validates dashboard inputs.
+    
+    Keyed on the spec itself rather than the dashboard id, so an edited
+    dashboard simply maps to a new entry and nothing needs invalidating.
+    Unknown keys are passed through untouched.
+    """
+    definitions = {}
+    # Field names are user-defined, so bind them as aliases of positional
+    # attributes; names like "_id" or "model_x" would otherwise be rejected
+    for i, (name, field_type, required, options) in enumerate(specs):
+        if required:
+            annotation = Literal[options] if options else FIELD_TYPES.get(field_type, Any)
+            definitions[f"field_{i}"] = (annotation, Field(..., alias=name))
+        else:
+            # An unselected optional <select> submits "", which is passed
+            # through as before
+            annotation = Literal[options + ("",)] if options else FIELD_TYPES.get(field_type, Any)
+            definitions[f"field_{i}"] = (Optional[annotation], Field(None, alias=name))
+    return create_model(
+        'DashboardInputs', __config__=ConfigDict(extra='allow'), **definitions
+    )
+
+# --- Dependencies ---
+# Declared async so FastAPI resolves them inline instead of dispatching
+# each one to the threadpool as it does for plain def dependencies.
+
+async def get_supabase(request: Request) -> AsyncSupabase:
+    return request.app.state.supabase_async
+
+async def get_redis(request: Request):
+    return request.app.state.redis
+
+async def get_workflow_executor(request: Request) -> WorkflowExecutor:
+    return request.app.state.workflow_executor
+
+async def get_pg(request: Request):
+    # None unless SUPABASE_DB_URL is configured
+    return request.app.state.pg
 
-# --- Dependency to get Supabase client ---
+SupabaseDep = Annotated[AsyncSupabase, Depends(get_supabase)]
+RedisDep = Annotated[Any, Depends(get_redis)]
+ExecutorDep = Annotated[WorkflowExecutor, Depends(get_workflow_executor)]
+PgDep = Annotated[Any, Depends(get_pg)]
 
-def get_supabase(request: Request):
-    return request.app.state.supabase
+# --- Redis read-through cache ---
+# Cache failures are logged and treated as misses so Redis is never on the
+# critical path for correctness.
+
+def _dashboard_cache_key(dashboard_id: int) -> str:
+    return f"dashboard:{dashboard_id}"
+
+async def _cache_get(redis, key: str) -> Optional[Any]:
+    try:
+        cached = await redis.get(key)
+    except Exception as e:
+        logger.warning(f"Redis GET {key} failed: {e}")
+        return None
+    return orjson.loads(cached) if cached is not None else None
+
+async def _cache_set(redis, key: str, value: Any) -> None:
+    try:
+        await redis.set(key, orjson.dumps(value), ex=DASHBOARD_CACHE_TTL)
+    except Exception as e:
+        logger.warning(f"Redis SET {key} failed: {e}")
+
+async def _cache_hget(redis, key: str, field: str) -> Optional[Any]:
+    try:
+        cached = await redis.hget(key, field)
+    except Exception as e:
+        logger.warning(f"Redis HGET {key} {field} failed: {e}")
+        return None
+    return orjson.loads(cached) if cached is not None else None
+
+async def _cache_hset(redis, key: str, field: str, value: Any) -> None:
+    try:
+        await redis.hset(key, field, orjson.dumps(value))
+        # Only the write that creates the hash sets its TTL, so busy pages
+        # cannot keep older fields alive past DASHBOARD_CACHE_TTL
+        await redis.expire(key, DASHBOARD_CACHE_TTL, nx=True)
+    except Exception as e:
+        logger.warning(f"Redis HSET {key} {field} failed: {e}")
+
+async def _cache_delete(redis, *keys: str) -> None:
+    try:
+        await redis.delete(*keys)
+    except Exception as e:
+        logger.warning(f"Redis DELETE {keys} failed: {e}")
+
+async def _fetch_dashboard(supabase, redis, dashboard_id: int, pg=None) -> Optional[Dict[str, Any]]:
+    """
+    Fetch a dashboard row with its fields, served from Redis when cached.
+    
+    Misses read Postgres directly when a pool is configured, otherwise PostgREST.
+    """
+    key = _dashboard_cache_key(dashboard_id)
+    dashboard = await _cache_get(redis, key)
+    if dashboard is not None:
+        return dashboard
+    
+    if pg is not None:
+        raw = await pg.fetchval(PG_GET_DASHBOARD, dashboard_id)
+        if raw is None:
+            return None
+        dashboard = orjson.loads(raw)
+    else:
+        response = await supabase.table('dashboards').select('*, dashboard_fields(*)').eq('id', dashboard_id).execute()
+        if not response.data:
+            return None
+        dashboard = response.data[0]
+    
+    await _cache_set(redis, key, dashboard)
+    return dashboard
+
+async def _create_dashboard_without_rpc(supabase, dashboard_data: DashboardCreate) -> Dict[str, Any]:
+    """
+    Fallback for databases without create_dashboard_with_fields.
+    
+    Field rows need the generated dashboard id, so the two inserts stay
+    sequential; the response is assembled from the rows both inserts return
+    instead of reselecting the join.
+    """
+    dashboard_response = await supabase.table('dashboards').insert(
+        dashboard_data.model_dump(exclude={'fields'})
+    ).execute()
+    dashboard = dashboard_response.data[0]
+    
+    fields = []
+    if dashboard_data.fields:
+        dashboard_id = dashboard['id']
+        fields_response = await supabase.table('dashboard_fields').insert([
+            {**field, "dashboard_id": dashboard_id}
+            for field in FIELD_LIST_ADAPTER.dump_python(dashboard_data.fields, mode='json')
+        ]).execute()
+        fields = fields_response.data
+    
+    return {**dashboard, "dashboard_fields": fields}
 
 # --- Endpoints ---
 
 @router.post("/", response_model=DashboardResponse)
-async def create_dashboard(dashboard_data: DashboardCreate, supabase=Depends(get_supabase)):
+async def create_dashboard(
+    dashboard_data: DashboardCreate,
+    supabase: SupabaseDep,
+    redis: RedisDep
+):
     """Create a new dashboard with fields."""
     try:
-        # Insert dashboard
-        dashboard_insert = {
-            "name": dashboard_data.name,
-            "description": dashboard_data.description,
-            "workflow_id": dashboard_data.workflow_id,
-            "instance_id": dashboard_data.instance_id,
-            "theme_color": dashboard_data.theme_color
-        }
+        try:
+            # Insert dashboard + fields and read back the joined row in one transaction
+            response = await supabase.rpc(
+                'create_dashboard_with_fields', {'p': dashboard_data.model_dump()}
+            ).execute()
+        except APIError as e:
+            if e.code != RPC_NOT_FOUND:
+                raise
+            logger.warning("create_dashboard_with_fields is missing; run SUPABASE_CREATE_DASHBOARD_RPC.sql")
+            dashboard_with_fields = await _create_dashboard_without_rpc(supabase, dashboard_data)
+        else:
+            if not response.data:
+                raise HTTPException(status_code=500, detail="Failed to create dashboard")
+            dashboard_with_fields = response.data[0]
         
-        dashboard_response = await asyncio.to_thread(
-            lambda: supabase.table('dashboards').insert(dashboard_insert).execute()
+        await _cache_delete(
+            redis, _dashboard_cache_key(dashboard_with_fields['id']), DASHBOARD_LIST_CACHE_KEY
         )
         
-        if not dashboard_response.data:
-            raise HTTPException(status_code=500, detail="Failed to create dashboard")
-        
-        created_dashboard = dashboard_response.data[0]
-        dashboard_id = created_dashboard['id']
-        
-        # Insert fields
-        fields_to_insert = [
-            {
-                "dashboard_id": dashboard_id,
-                "name": field.name,
-                "label": field.label,
-                "type": field.type,
-                "required": field.required,
-                "default_value": field.default_value,
-                "description": field.description,
-                "options": field.options
-            }
-            for field in dashboard_data.fields
-        ]
-        
-        if fields_to_insert:
-            await asyncio.to_thread(
-                lambda: supabase.table('dashboard_fields').insert(fields_to_insert).execute()
-            )
-        
-        # Fetch complete dashboard with fields
-        complete_dashboard = await asyncio.to_thread(
-            lambda: supabase.table('dashboards').select('*, dashboard_fields(*)').eq('id', dashboard_id).execute()
-        )
-        
-        if not complete_dashboard.data:
-            raise HTTPException(status_code=500, detail="Failed to fetch created dashboard")
-        
-        dashboard_with_fields = complete_dashboard.data[0]
-        
-        # Transform to match response model
-        return {
-            "id": dashboard_with_fields['id'],
-            "name": dashboard_with_fields['name'],
-            "description": dashboard_with_fields['description'],
-            "workflow_id": dashboard_with_fields['workflow_id'],
-            "instance_id": dashboard_with_fields['instance_id'],
-            "theme_color": dashboard_with_fields['theme_color'],
-            "created_at": dashboard_with_fields['created_at'],
-            "fields": dashboard_with_fields.get('dashboard_fields', [])
-        }
+        return DashboardResponse.model_validate(dashboard_with_fields)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create dashboard: {str(e)}")
 
 @router.get("/", response_model=List[DashboardResponse])
-async def list_dashboards(supabase=Depends(get_supabase)):
-    """List all dashboards with their fields."""
+async def list_dashboards(
+    supabase: SupabaseDep,
+    redis: RedisDep,
+    pg: PgDep,
+    cursor: Optional[int] = Query(None, ge=0, description="Return dashboards with id greater than this"),
+    limit: Optional[int] = Query(None, ge=1, le=200)
+):
+    """
+    List dashboards with their fields.
+    
+    Without cursor or limit every dashboard is returned, as the sidebar
+    expects; with either, one page of up to `limit` (default 50) dashboards
+    after id `cursor` is returned.
+    """
     try:
-        response = await asyncio.to_thread(
-            lambda: supabase.table('dashboards').select('*, dashboard_fields(*)').execute()
-        )
+        if cursor is not None and limit is None:
+            limit = DEFAULT_DASHBOARD_PAGE_SIZE
+        cursor = cursor or 0
+        
+        # Every page lives in one hash so create_dashboard drops them all at once
+        page_key = f"{cursor}:{limit}" if limit is not None else "all"
+        cached = await _cache_hget(redis, DASHBOARD_LIST_CACHE_KEY, page_key)
+        if cached is not None:
+            return cached
         
-        dashboards = []
-        for dashboard in response.data:
-            dashboards.append({
-                "id": dashboard['id'],
-                "name": dashboard['name'],
-                "description": dashboard['description'],
-                "workflow_id": dashboard['workflow_id'],
-                "instance_id": dashboard['instance_id'],
-                "theme_color": dashboard['theme_color'],
-                "created_at": dashboard['created_at'],
-                "fields": dashboard.get('dashboard_fields', [])
-            })
+        if pg is not None:
+            # LIMIT NULL is LIMIT ALL
+            dashboards = orjson.loads(await pg.fetchval(PG_LIST_DASHBOARDS, cursor, limit))
+        else:
+            query = (
+                supabase.table('dashboards')
+                .select(DASHBOARD_LIST_COLUMNS)
+                .gt('id', cursor)
+                .order('id')
+            )
+            if limit is not None:
+                query = query.limit(limit)
+            response = await query.execute()
+            dashboards = response.data
         
+        await _cache_hset(redis, DASHBOARD_LIST_CACHE_KEY, page_key, dashboards)
         return dashboards
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch dashboards: {str(e)}")
 
 @router.get("/{dashboard_id}", response_model=DashboardResponse)
-async def get_dashboard(dashboard_id: int, supabase=Depends(get_supabase)):
+async def get_dashboard(
+    dashboard_id: int,
+    supabase: SupabaseDep,
+    redis: RedisDep,
+    pg: PgDep
+):
     """Get a specific dashboard by ID."""
     try:
-        response = await asyncio.to_thread(
-            lambda: supabase.table('dashboards').select('*, dashboard_fields(*)').eq('id', dashboard_id).execute()
-        )
+        dashboard = await _fetch_dashboard(supabase, redis, dashboard_id, pg)
         
-        if not response.data:
+        if dashboard is None:
             raise HTTPException(status_code=404, detail="Dashboard not found")
         
-        dashboard = response.data[0]
-        return {
-            "id": dashboard['id'],
-            "name": dashboard['name'],
-            "description": dashboard['description'],
-            "workflow_id": dashboard['workflow_id'],
-            "instance_id": dashboard['instance_id'],
-            "theme_color": dashboard['theme_color'],
-            "created_at": dashboard['created_at'],
-            "fields": dashboard.get('dashboard_fields', [])
-        }
+        return DashboardResponse.model_validate(dashboard)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch dashboard: {str(e)}")
 
-@router.post("/{dashboard_id}/execute")
+@router.post("/{dashboard_id}/execute", status_code=202)
 async def execute_dashboard(
     dashboard_id: int, 
     request: DashboardExecuteRequest, 
-    supabase=Depends(get_supabase)
+    supabase: SupabaseDep,
+    redis: RedisDep,
+    pg: PgDep,
+    executor: ExecutorDep
 ):
     """Execute a workflow associated with a dashboard."""
     try:
         # Fetch dashboard
-        dashboard_response = await asyncio.to_thread(
-            lambda: supabase.table('dashboards').select('*').eq('id', dashboard_id).execute()
-        )
+        dashboard = await _fetch_dashboard(supabase, redis, dashboard_id, pg)
         
-        if not dashboard_response.data:
+        if dashboard is None:
             raise HTTPException(status_code=404, detail="Dashboard not found")
         
-        dashboard = dashboard_response.data[0]
-        
-        # Initialize WorkflowExecutor
-        executor = WorkflowExecutor(supabase, None)
+        input_model = compile_dashboard_model(_field_specs(dashboard.get('dashboard_fields') or []))
+        try:
+            inputs = input_model.model_validate(request.inputs).model_dump(by_alias=True, exclude_unset=True)
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=e.errors(include_url=False))
         
-        # Queue execution
-        run_id = await executor.queue_execution(
+        # Records the pending run and enqueues it; the worker resolves the
+        # instance and triggers n8n
+        run_id = await executor.defer_execution(
             workflow_id=dashboard['workflow_id'],
             user_id="anonymous_dashboard_user",
-            input_data=request.inputs,
+            input_data=inputs,
             instance_id=dashboard['instance_id']
         )
         
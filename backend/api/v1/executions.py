@@ -1,13 +1,26 @@
 """
 API endpoints for managing n8n workflow executions.
 """
-from typing import List, Optional, Dict, Any
-from fastapi import APIRouter, HTTPException, Depends, Request, Query
-from pydantic import BaseModel
-import asyncio
+import base64
+import binascii
+import hashlib
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import orjson
+from fastapi import APIRouter, HTTPException, Depends, Header, Request, Query, Response
+from fastapi.responses import ORJSONResponse
+from postgrest.exceptions import APIError
+from pydantic import BaseModel, TypeAdapter
+from cachetools import LRUCache, TTLCache
 from datetime import datetime
+from uuid import UUID
 
-router = APIRouter()
+from api.loaders import BatchLoader
+from api.supabase_async import AsyncSupabase
+from api.workflow_service import TERMINAL_STATUSES, ExecutionInputData, WorkflowExecutor
+
+router = APIRouter(default_response_class=ORJSONResponse)
+logger = logging.getLogger(__name__)
 
 
 # Pydantic models
@@ -29,7 +42,7 @@ class ExecutionResponse(BaseModel):
 class ExecutionCreate(BaseModel):
     workflow_id: str
     instance_id: str
-    input_data: Dict[str, Any]
+    input_data: ExecutionInputData
 
 
 class ExecutionStartResponse(BaseModel):
@@ -38,121 +51,364 @@ class ExecutionStartResponse(BaseModel):
     message: str
 
 
-# Dependency to get Supabase client
-def get_supabase(request: Request):
-    return request.app.state.supabase
+class ExecutionCountResponse(BaseModel):
+    count: int
+
+
+class ExecutionStatsResponse(BaseModel):
+    total: int
+
+
+# Fields for the list view; JSONB payloads are only fetched on request.
+# Rows come from our own table, so they are built with model_construct
+# instead of being validated field by field.
+_SUMMARY_FIELDS = (
+    'workflow_id', 'workflow_name', 'status', 'created_at', 'started_at', 'completed_at', 'error_message'
+)
+_DATA_FIELDS = ('input_data', 'output_data')
+_DETAIL_FIELDS = _SUMMARY_FIELDS + _DATA_FIELDS + ('input_schema', 'output_schema')
+EXECUTION_SUMMARY_COLUMNS = ','.join(('run_id',) + _SUMMARY_FIELDS)
+EXECUTION_DATA_COLUMNS = ','.join(_DATA_FIELDS)
+
+
+EXECUTION_LIST_ADAPTER = TypeAdapter(List[ExecutionResponse])
+
+
+def _to_response(execution: Dict[str, Any], fields: Tuple[str, ...]) -> ExecutionResponse:
+    return ExecutionResponse.model_construct(
+        run_id=str(execution['run_id']),
+        **{k: execution.get(k) for k in fields}
+    )
+
+
+# Trigger-maintained copy of execution_logs without the JSONB payloads
+SUMMARY_TABLE = 'execution_summaries'
+# PostgREST error codes for an unknown table (v11 passes Postgres' through)
+TABLE_NOT_FOUND = frozenset({'42P01', 'PGRST205'})
+
+# Execution totals keyed by filter tuple
+_count_cache: TTLCache = TTLCache(maxsize=256, ttl=5)
+
+# Planner estimate of the unfiltered total, refreshed every 10 seconds
+_stats_cache: TTLCache = TTLCache(maxsize=1, ttl=10)
+PG_ESTIMATE_EXECUTIONS = "SELECT reltuples::bigint FROM pg_class WHERE relname = 'execution_logs'"
+
+# Finished runs don't change again (update_execution never writes over a
+# terminal status), so they are kept until evicted by size
+_terminal_cache: LRUCache = LRUCache(maxsize=10_000)
+
+
+# Shared executor created at startup; it holds no per-request state
+def get_workflow_executor(request: Request) -> WorkflowExecutor:
+    return request.app.state.workflow_executor
+
+
+# Reads go through the async PostgREST client, awaited on the event loop
+def get_async_supabase(request: Request) -> AsyncSupabase:
+    return request.app.state.supabase_async
+
+
+def get_run_loader(request: Request) -> BatchLoader:
+    return request.app.state.run_loader
+
 
+def get_pg(request: Request):
+    # None unless SUPABASE_DB_URL is configured
+    return request.app.state.pg
 
-@router.get("/executions", response_model=List[ExecutionResponse], tags=["Executions"])
+
+def _or(query, conditions: str):
+    """
+    Add a PostgREST `or=(...)` filter.
+    
+    postgrest-py < 0.14 (pinned by supabase 2.0) has no or_(), so the
+    logic-tree parameter is added directly. Repeated `or` parameters are
+    ANDed together by PostgREST.
+    """
+    query.params = query.params.add('or', f'({conditions})')
+    return query
+
+
+async def _execute(build: Callable[[str], Any], use_summaries: bool):
+    """
+    Execute a list query, preferring the narrow execution_summaries table.
+    
+    Falls back to execution_logs while SUPABASE_CREATE_EXECUTION_SUMMARIES.sql
+    has not been applied.
+    
+    Args:
+        build: Returns the query for a given table name
+        use_summaries: False when the query needs columns only execution_logs has
+    """
+    if not use_summaries:
+        return await build('execution_logs').execute()
+    try:
+        return await build(SUMMARY_TABLE).execute()
+    except APIError as e:
+        if e.code not in TABLE_NOT_FOUND:
+            raise
+        logger.warning("execution_summaries is missing; run SUPABASE_CREATE_EXECUTION_SUMMARIES.sql")
+        return await build('execution_logs').execute()
+
+
+# Filter builders in _apply_filters argument order. The date range is
+# half-open ([start_date, end_date)) so consecutive windows never overlap and
+# the created_at index can be range-scanned.
+_FILTERS: Tuple[Callable[[Any, Any], Any], ...] = (
+    lambda q, v: q.eq('workflow_id', v),
+    lambda q, v: q.eq('instance_id', v),
+    lambda q, v: q.eq('status', v),
+    lambda q, v: q.gte('created_at', v.isoformat()),
+    lambda q, v: q.lt('created_at', v.isoformat()),
+    # Simple text search on the JSON representation of input_data/output_data;
+    # more advanced search would need specific keys or full-text search
+    lambda q, v: _or(q, f"input_data.ilike.%{v}%,output_data.ilike.%{v}%"),
+)
+
+
+def _apply_filters(
+    query,
+    workflow_id: Optional[str],
+    instance_id: Optional[str],
+    status: Optional[str],
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    search: Optional[str]
+):
+    """
+    Apply the shared execution list filters to a PostgREST query.
+    
+    Only the filters that were given touch the query builder.
+    """
+    values = (workflow_id, instance_id, status, start_date, end_date, search)
+    for apply, value in zip(_FILTERS, values):
+        if value:
+            query = apply(query, value)
+    return query
+
+
+@router.get(
+    "/executions",
+    response_model=None,
+    responses={200: {"model": List[ExecutionResponse]}},
+    tags=["Executions"]
+)
 async def list_executions(
     workflow_id: Optional[str] = Query(None, description="Filter by workflow ID"),
     instance_id: Optional[str] = Query(None, description="Filter by instance ID"),
     status: Optional[str] = Query(None, description="Filter by status"),
-    start_date: Optional[datetime] = Query(None, description="Filter by start date (ISO format)"),
-    end_date: Optional[datetime] = Query(None, description="Filter by end date (ISO format)"),
+    start_date: Optional[datetime] = Query(None, description="Filter by start date, inclusive (ISO format)"),
+    end_date: Optional[datetime] = Query(None, description="Filter by end date, exclusive (ISO format)"),
     search: Optional[str] = Query(None, description="Search text in input/output data"),
+    include_data: bool = Query(False, description="Include input_data and output_data"),
     limit: int = Query(50, le=100, description="Max results to return"),
-    offset: int = Query(0, ge=0, description="Pagination offset"),
-    supabase=Depends(get_supabase)
+    offset: int = Query(0, ge=0, description="Pagination offset (ignored when cursor is set)"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    supabase: AsyncSupabase = Depends(get_async_supabase)
 ):
     """
     List all workflow executions with optional filtering.
+    
+    Rows are summaries unless include_data is set; schemas and the full
+    record are served by GET /executions/{run_id}. Only the requested page
+    is fetched; use GET /executions/count for the total.
+    
+    Pages are ordered by (created_at, run_id) descending. A full page sets
+    the X-Next-Cursor header; passing it back as `cursor` seeks straight to
+    the next page instead of scanning past `offset` rows.
     """
+    columns = EXECUTION_SUMMARY_COLUMNS
+    if include_data:
+        columns = f"{columns},{EXECUTION_DATA_COLUMNS}"
+    
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    def build(table: str):
+        query = _apply_filters(
+            supabase.table(table).select(columns),
+            workflow_id, instance_id, status, start_date, end_date, search
+        )
+        # order() adds one parameter per call; PostgREST wants a single list
+        query.params = query.params.set('order', 'created_at.desc,run_id.desc')
+        if after is not None:
+            created_at, run_id = after
+            return _or(
+                query,
+                f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",run_id.lt.{run_id})'
+            ).limit(limit)
+        return query.range(offset, offset + limit - 1)
+    
     try:
-        query = supabase.table('execution_logs').select('*', count='exact')
-        
-        if workflow_id:
-            query = query.eq('workflow_id', workflow_id)
-        if instance_id:
-            query = query.eq('instance_id', instance_id)
-        if status:
-            query = query.eq('status', status)
-        if start_date:
-            query = query.gte('created_at', start_date.isoformat())
-        if end_date:
-            query = query.lte('created_at', end_date.isoformat())
-        
-        if search:
-            # Search in input_data and output_data JSONB columns
-            # Note: This is a simple text search on the JSON representation
-            # For more advanced search, we might need specific keys or full-text search
-            or_filter = f"input_data.ilike.%{search}%,output_data.ilike.%{search}%"
-            query = query.or_(or_filter)
-        
-        query = query.order('created_at', desc=True).range(offset, offset + limit - 1)
-        
-        response = await asyncio.to_thread(lambda: query.execute())
-        
-        return [
-            ExecutionResponse(
-                run_id=str(execution['run_id']),
-                workflow_id=execution['workflow_id'],
-                workflow_name=execution.get('workflow_name'),
-                status=execution['status'],
-                created_at=execution['created_at'],
-                started_at=execution.get('started_at'),
-                completed_at=execution.get('completed_at'),
-                error_message=execution.get('error_message'),
-                input_data=execution.get('input_data'),
-                output_data=execution.get('output_data'),
-                input_schema=execution.get('input_schema'),
-                output_schema=execution.get('output_schema')
-            )
-            for execution in response.data
-        ]
+        # Payloads and payload search only exist on execution_logs
+        result = await _execute(build, use_summaries=not (include_data or search))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch executions: {str(e)}")
+    
+    rows = result.data
+    fields = _SUMMARY_FIELDS + _DATA_FIELDS if include_data else _SUMMARY_FIELDS
+    # Serialized in one pass by the adapter; a response_model would dump and
+    # re-validate every row first. Unset fields (payloads) are left out.
+    content = EXECUTION_LIST_ADAPTER.dump_python(
+        [_to_response(execution, fields) for execution in rows], mode='json', exclude_unset=True
+    )
+    headers = {}
+    if len(rows) == limit:
+        headers['X-Next-Cursor'] = encode_cursor(rows[-1]['created_at'], str(rows[-1]['run_id']))
+    return ORJSONResponse(content, headers=headers)
+
+
+def encode_cursor(created_at: str, run_id: str) -> str:
+    """Encode the sort key of the last row on a page as an opaque cursor."""
+    return base64.urlsafe_b64encode(orjson.dumps([created_at, run_id])).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """
+    Decode a cursor produced by encode_cursor.
+    
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        created_at, run_id = orjson.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at).isoformat(), str(UUID(run_id))
+    except (ValueError, TypeError, binascii.Error, orjson.JSONDecodeError):
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+@router.get("/executions/count", response_model=ExecutionCountResponse, tags=["Executions"])
+async def count_executions(
+    workflow_id: Optional[str] = Query(None, description="Filter by workflow ID"),
+    instance_id: Optional[str] = Query(None, description="Filter by instance ID"),
+    status: Optional[str] = Query(None, description="Filter by status"),
+    start_date: Optional[datetime] = Query(None, description="Filter by start date, inclusive (ISO format)"),
+    end_date: Optional[datetime] = Query(None, description="Filter by end date, exclusive (ISO format)"),
+    search: Optional[str] = Query(None, description="Search text in input/output data"),
+    supabase: AsyncSupabase = Depends(get_async_supabase)
+):
+    """
+    Count workflow executions matching the same filters as GET /executions.
+    
+    Totals are cached for a few seconds since pagers poll them repeatedly.
+    """
+    key = (workflow_id, instance_id, status, start_date, end_date, search)
+    cached = _count_cache.get(key)
+    if cached is not None:
+        return ExecutionCountResponse(count=cached)
+    
+    def build(table: str):
+        return _apply_filters(
+            supabase.table(table).select('run_id', count='exact'),
+            workflow_id, instance_id, status, start_date, end_date, search
+        ).limit(1)
+    
+    try:
+        response = await _execute(build, use_summaries=not search)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to count executions: {str(e)}")
+    
+    _count_cache[key] = response.count or 0
+    return ExecutionCountResponse(count=_count_cache[key])
+
+
+@router.get("/executions/stats", response_model=ExecutionStatsResponse, tags=["Executions"])
+async def execution_stats(
+    supabase: AsyncSupabase = Depends(get_async_supabase),
+    pg = Depends(get_pg)
+):
+    """
+    Approximate total number of executions.
+    
+    Uses the planner's row estimate instead of an exact count, which would
+    scan the whole table. Read from pg_class when the direct Postgres pool
+    is configured, otherwise from PostgREST's estimated count.
+    """
+    cached = _stats_cache.get('total')
+    if cached is not None:
+        return ExecutionStatsResponse(total=cached)
+    
+    try:
+        if pg is not None:
+            total = await pg.fetchval(PG_ESTIMATE_EXECUTIONS)
+        else:
+            response = await (
+                supabase.table('execution_logs')
+                .select('run_id', count='estimated')
+                .limit(1)
+                .execute()
+            )
+            total = response.count
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch execution stats: {str(e)}")
+    
+    # reltuples is -1 until the table is first analyzed
+    _stats_cache['total'] = max(total or 0, 0)
+    return ExecutionStatsResponse(total=_stats_cache['total'])
 
 
 @router.get("/executions/{run_id}", response_model=ExecutionResponse, tags=["Executions"])
-async def get_execution(run_id: str, supabase=Depends(get_supabase)):
+async def get_execution(
+    run_id: UUID,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    loader: BatchLoader = Depends(get_run_loader)
+):
     """
     Get a specific execution by run_id.
+    
+    Finished runs are served from an in-process cache, and lookups from
+    concurrent requests are batched into one query by the shared run loader.
+    Responses carry an ETag; pollers sending it back as If-None-Match get a
+    304 while the run is unchanged.
     """
+    key = str(run_id)
     try:
-        response = await asyncio.to_thread(
-            lambda: supabase.table('execution_logs').select('*').eq('run_id', run_id).execute()
-        )
-        
-        if not response.data:
-            raise HTTPException(status_code=404, detail="Execution not found")
-        
-        execution = response.data[0]
-        return ExecutionResponse(
-            run_id=str(execution['run_id']),
-            workflow_id=execution['workflow_id'],
-            workflow_name=execution.get('workflow_name'),
-            status=execution['status'],
-            created_at=execution['created_at'],
-            started_at=execution.get('started_at'),
-            completed_at=execution.get('completed_at'),
-            error_message=execution.get('error_message'),
-            input_data=execution.get('input_data'),
-            output_data=execution.get('output_data'),
-            input_schema=execution.get('input_schema'),
-            output_schema=execution.get('output_schema')
-        )
+        execution = _terminal_cache.get(key)
+        if execution is None:
+            execution = await loader.load(key)
+            if execution is None:
+                raise HTTPException(status_code=404, detail="Execution not found")
+            if execution['status'] in TERMINAL_STATUSES:
+                _terminal_cache[key] = execution
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch execution: {str(e)}")
+    
+    etag = _etag(execution)
+    if if_none_match == etag:
+        return Response(status_code=304, headers={'ETag': etag})
+    response.headers['ETag'] = etag
+    return _to_response(execution, _DETAIL_FIELDS)
+
+
+def _etag(execution: Dict[str, Any]) -> str:
+    digest = hashlib.sha1(
+        f"{execution['run_id']}:{execution['status']}:{execution.get('completed_at')}".encode()
+    ).hexdigest()
+    return f'"{digest}"'
+
+
+def invalidate_execution(run_id: str) -> None:
+    """Drop a cached execution so the next read goes to the database."""
+    _terminal_cache.pop(str(run_id), None)
 
 
 @router.post("/executions", response_model=ExecutionStartResponse, tags=["Executions"], status_code=202)
 async def create_execution(
     execution: ExecutionCreate,
-    supabase=Depends(get_supabase)
+    executor: WorkflowExecutor = Depends(get_workflow_executor)
 ):
     """
     Start a new workflow execution.
     Returns immediately with run_id. Use GET /executions/{run_id} to check status.
     """
     try:
-        # Get workflow details to get name
-        from api.workflow_service import WorkflowExecutor
-        
-        executor = WorkflowExecutor(supabase, None)
-        
         run_id = await executor.queue_execution(
             workflow_id=execution.workflow_id,
             user_id="mvp-user",  # Placeholder for MVP
@@ -1,12 +1,22 @@
 """
 API endpoints for managing n8n instances.
 """
-from typing import List, Optional
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
 from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import ORJSONResponse
+from postgrest.types import ReturnMethod
 from pydantic import BaseModel, HttpUrl
-import asyncio
+from uuid import UUID
+
+from api.instance_cache import invalidate_instance, updating_instance
+from api.loaders import BatchLoader
+from api.n8n_service import N8nClient
+from api.supabase_async import AsyncSupabase
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
+logger = logging.getLogger(__name__)
 
 
 # Pydantic models
@@ -32,63 +42,76 @@ class InstanceResponse(BaseModel):
     updated_at: str
 
 
-# Dependency to get Supabase client
-def get_supabase(request: Request):
-    return request.app.state.supabase
+# Columns returned to clients; the API key never leaves the database.
+# Rows come from our own table (url was validated on insert), so they are
+# built with model_construct instead of being validated field by field.
+_INSTANCE_FIELDS = ('name', 'url', 'is_active', 'created_at', 'updated_at')
+INSTANCE_COLUMNS = ','.join(('id',) + _INSTANCE_FIELDS)
+
+
+def _to_response(instance: Dict[str, Any]) -> InstanceResponse:
+    return InstanceResponse.model_construct(
+        id=str(instance['id']),
+        **{k: instance[k] for k in _INSTANCE_FIELDS}
+    )
+
+
+# Dependency to get the async Supabase client
+def get_supabase(request: Request) -> AsyncSupabase:
+    return request.app.state.supabase_async
+
+
+def get_instance_loader(request: Request) -> BatchLoader:
+    return request.app.state.instance_loader
 
 
 @router.get("/instances", response_model=List[InstanceResponse], tags=["Instances"])
-async def list_instances(supabase=Depends(get_supabase)):
+async def list_instances(supabase: AsyncSupabase = Depends(get_supabase)):
     """
     List all connected n8n instances.
     """
-    import logging
-    logger = logging.getLogger("uvicorn.error")
-    
     try:
-        logger.info("Fetching instances from database...")
-        response = await asyncio.to_thread(
-            lambda: supabase.table('instances').select('*').eq('is_active', True).order('created_at', desc=True).execute()
-        )
+        response = await supabase.table('instances').select(INSTANCE_COLUMNS).eq('is_active', True).order('created_at', desc=True).execute()
         
-        logger.info(f"Response data: {response.data}")
+        # Lazy %-formatting: the row list is only rendered when debug is on
+        logger.debug("Fetched instances: %s", response.data)
         
-        return [
-            InstanceResponse(
-                id=str(instance['id']),
-                name=instance['name'],
-                url=instance['url'],
-                is_active=instance['is_active'],
-                created_at=instance['created_at'],
-                updated_at=instance['updated_at']
-            )
-            for instance in response.data
-        ]
+        return [_to_response(instance) for instance in response.data]
     except Exception as e:
-        logger.error(f"Error fetching instances: {str(e)}", exc_info=True)
+        logger.error("Error fetching instances: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to fetch instances: {str(e)}")
 
 
 @router.post("/instances", response_model=InstanceResponse, tags=["Instances"], status_code=201)
-async def create_instance(instance: InstanceCreate, supabase=Depends(get_supabase)):
+async def create_instance(instance: InstanceCreate, supabase: AsyncSupabase = Depends(get_supabase)):
     """
     Create a new n8n instance connection.
     """
+    async def check_connection() -> bool:
+        async with N8nClient(str(instance.url), instance.api_key) as client:
+            return await client.validate_connection()
+    
     try:
-        # Validate connection to n8n instance
-        from api.n8n_service import N8nClient
+        # The n8n check and the duplicate-name lookup are independent, so
+        # run them together and report every problem at once
+        is_valid, existing = await asyncio.gather(
+            check_connection(),
+            supabase.table('instances').select('id').eq('name', instance.name).eq('is_active', True).limit(1).execute(),
+            return_exceptions=True
+        )
+        if isinstance(existing, Exception):
+            raise existing
         
-        client = N8nClient(str(instance.url), instance.api_key)
-        try:
-            is_valid = await client.validate_connection()
-            if not is_valid:
-                raise HTTPException(
-                    status_code=400, 
-                    detail="Failed to connect to n8n instance. Please check your URL and API Key."
-                )
-        except Exception as e:
-            # Pass through the specific error message from the client (e.g. Unauthorized)
-            raise HTTPException(status_code=400, detail=str(e))
+        errors = []
+        if isinstance(is_valid, Exception):
+            # Pass through the specific error message from the client (e.g. invalid URL)
+            errors.append(str(is_valid))
+        elif not is_valid:
+            errors.append("Failed to connect to n8n instance. Please check your URL and API Key.")
+        if existing.data:
+            errors.append(f"An instance named '{instance.name}' already exists.")
+        if errors:
+            raise HTTPException(status_code=400, detail=" ".join(errors))
         
         # Insert into database
         data = {
@@ -98,19 +121,11 @@ async def create_instance(instance: InstanceCreate, supabase=Depends(get_supabas
             'is_active': True
         }
         
-        response = await asyncio.to_thread(
-            lambda: supabase.table('instances').insert(data).execute()
-        )
+        response = await supabase.table('instances').insert(data).execute()
         
         created = response.data[0]
-        return InstanceResponse(
-            id=str(created['id']),
-            name=created['name'],
-            url=created['url'],
-            is_active=created['is_active'],
-            created_at=created['created_at'],
-            updated_at=created['updated_at']
-        )
+        invalidate_instance(created['id'])
+        return _to_response(created)
     except HTTPException:
         raise
     except Exception as e:
@@ -118,27 +133,20 @@ async def create_instance(instance: InstanceCreate, supabase=Depends(get_supabas
 
 
 @router.get("/instances/{instance_id}", response_model=InstanceResponse, tags=["Instances"])
-async def get_instance(instance_id: str, supabase=Depends(get_supabase)):
+async def get_instance(instance_id: UUID, loader: BatchLoader = Depends(get_instance_loader)):
     """
     Get a specific n8n instance by ID.
+    
+    Lookups from concurrent requests are batched into one query by the
+    shared instance loader.
     """
     try:
-        response = await asyncio.to_thread(
-            lambda: supabase.table('instances').select('*').eq('id', instance_id).execute()
-        )
+        instance = await loader.load(str(instance_id))
         
-        if not response.data:
+        if instance is None:
             raise HTTPException(status_code=404, detail="Instance not found")
         
-        instance = response.data[0]
-        return InstanceResponse(
-            id=str(instance['id']),
-            name=instance['name'],
-            url=instance['url'],
-            is_active=instance['is_active'],
-            created_at=instance['created_at'],
-            updated_at=instance['updated_at']
-        )
+        return _to_response(instance)
     except HTTPException:
         raise
     except Exception as e:
@@ -146,18 +154,25 @@ async def get_instance(instance_id: str, supabase=Depends(get_supabase)):
 
 
 @router.delete("/instances/{instance_id}", tags=["Instances"], status_code=204)
-async def delete_instance(instance_id: str, supabase=Depends(get_supabase)):
+async def delete_instance(instance_id: str, supabase: AsyncSupabase = Depends(get_supabase)):
     """
     Delete an n8n instance (soft delete by setting is_active=false).
     """
     try:
-        response = await asyncio.to_thread(
-            lambda: supabase.table('instances').update({'is_active': False}).eq('id', instance_id).execute()
-        )
+        # One round-trip: the update returns the affected rows (PostgREST
+        # return=representation), so an empty result means not found
+        async with updating_instance(instance_id):
+            response = await supabase.table('instances').update(
+                {'is_active': False}, returning=ReturnMethod.representation
+            ).eq('id', instance_id).execute()
         
         if not response.data:
             raise HTTPException(status_code=404, detail="Instance not found")
         
+        # Drop this instance's cached workflow data; the pooled connection
+        # to its host is shared and stays open until shutdown
+        deleted = response.data[0]
+        N8nClient.invalidate_for(deleted.get('url'), deleted.get('api_key_encrypted'))
         return None
     except HTTPException:
         raise
@@ -2,16 +2,31 @@
 API endpoints for handling n8n webhook callbacks.
 """
 from typing import Dict, Any
+from cachetools import TTLCache
 from fastapi import APIRouter, HTTPException, Depends, Request, Body
 from pydantic import BaseModel
 
-from api.workflow_service import handle_workflow_callback
+from api.v1.executions import invalidate_execution
+from api.workflow_service import record_workflow_callback, verify_callback_secret
 
 router = APIRouter()
 
+# Callbacks with a wrong secret per client IP. Once a client reaches the
+# limit every callback from it gets a 429 without its secret being hashed,
+# until its last failure ages out of the window. Only secret mismatches are
+# counted and a correct secret clears the count, so behind a reverse proxy
+# where callers share one IP, n8n's own deliveries keep resetting it.
+CALLBACK_FAILURE_LIMIT = 20
+CALLBACK_FAILURE_WINDOW = 60
+_callback_failures: TTLCache = TTLCache(maxsize=10_000, ttl=CALLBACK_FAILURE_WINDOW)
+
 # Dependency to get Supabase client
 def get_supabase(request: Request):
-    return request.app.state.supabase
+    return request.app.state.supabase_async
+
+def get_pg(request: Request):
+    # None unless SUPABASE_DB_URL is configured
+    return request.app.state.pg
 
 class WebhookPayload(BaseModel):
     """
@@ -23,8 +38,10 @@ class WebhookPayload(BaseModel):
 @router.post("/webhook/callback/{run_id}", tags=["Webhooks"])
 async def webhook_callback(
     run_id: str,
+    request: Request,
     payload: WebhookPayload = Body(...),
-    supabase=Depends(get_supabase)
+    supabase=Depends(get_supabase),
+    pg=Depends(get_pg)
 ):
     """
     Receive callback from n8n workflow execution.
@@ -35,18 +52,31 @@ async def webhook_callback(
         "secret_key": "..."
     }
     """
+    # Throttled clients are turned away before their secret is hashed
+    client_ip = request.client.host if request.client else None
+    if _callback_failures.get(client_ip, 0) >= CALLBACK_FAILURE_LIMIT:
+        raise HTTPException(status_code=429, detail="Too many rejected callbacks")
+    
+    if not verify_callback_secret(payload.secret_key):
+        _callback_failures[client_ip] = _callback_failures.get(client_ip, 0) + 1
+        raise HTTPException(status_code=400, detail="Failed to process callback. Invalid secret or run_id.")
+    # A correct secret clears the client's record of rejected ones
+    _callback_failures.pop(client_ip, None)
+    
     try:
-        success = await handle_workflow_callback(
+        # The secret is verified once here, so the handler only records the result
+        success = await record_workflow_callback(
             supabase,
             run_id,
             payload.output_data,
-            payload.secret_key
+            pg=pg
         )
-        
-        if not success:
-            raise HTTPException(status_code=400, detail="Failed to process callback. Invalid secret or run_id.")
-            
-        return {"status": "success", "message": "Callback processed"}
-        
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Callback error: {str(e)}")
+    
+    if not success:
+        raise HTTPException(status_code=400, detail="Failed to process callback. Invalid secret or run_id.")
+    
+    # Drop any cached copy so the next read sees the callback's result
+    invalidate_execution(run_id)
+    return {"status": "success", "message": "Callback processed"}
@@ -1,10 +1,17 @@
 """
 API endpoints for managing n8n workflows.
 """
+import hashlib
 from typing import List, Optional
-from fastapi import APIRouter, HTTPException, Depends, Request, Query
+
+import orjson
+from fastapi import APIRouter, HTTPException, Depends, Header, Request, Response, Query
 from pydantic import BaseModel
-import asyncio
+
+from api.instance_cache import get_active_instance
+from api.n8n_service import N8nClient, parse_input_schema, parse_output_schema
+from api.supabase_async import AsyncSupabase
+from api.workflow_service import ExecutionInputData, WorkflowExecutor
 
 router = APIRouter()
 
@@ -28,7 +35,7 @@ class WorkflowDetail(BaseModel):
 
 class WorkflowExecuteRequest(BaseModel):
     instance_id: str
-    input_data: dict
+    input_data: ExecutionInputData
 
 
 class WorkflowExecuteResponse(BaseModel):
@@ -37,81 +44,86 @@ class WorkflowExecuteResponse(BaseModel):
     message: str
 
 
-# Dependency to get Supabase client
-def get_supabase(request: Request):
-    return request.app.state.supabase
+# Shared executor created at startup; it holds no per-request state
+def get_workflow_executor(request: Request) -> WorkflowExecutor:
+    return request.app.state.workflow_executor
+
+
+# Reads go through the async PostgREST client, awaited on the event loop
+def get_async_supabase(request: Request) -> AsyncSupabase:
+    return request.app.state.supabase_async
 
 
 @router.get("/workflows", response_model=List[WorkflowResponse], tags=["Workflows"])
 async def list_workflows(
+    response: Response,
     instance_id: str = Query(..., description="ID of the n8n instance"),
-    supabase=Depends(get_supabase)
+    if_none_match: Optional[str] = Header(None),
+    supabase: AsyncSupabase = Depends(get_async_supabase)
 ):
     """
     List all workflows from a specific n8n instance.
+    
+    The n8n listing is cached per instance for 30 seconds by N8nClient.
+    Responses carry an ETag of the listing; clients sending it back as
+    If-None-Match get a 304 while it is unchanged.
     """
     try:
         # Get instance details
-        instance_response = await asyncio.to_thread(
-            lambda: supabase.table('instances').select('*').eq('id', instance_id).eq('is_active', True).execute()
-        )
+        instance = await get_active_instance(supabase, instance_id)
         
-        if not instance_response.data:
+        if instance is None:
             raise HTTPException(status_code=404, detail="Instance not found")
         
-        instance = instance_response.data[0]
-        
         # Connect to n8n instance
-        from api.n8n_service import N8nClient
-        client = N8nClient(instance['url'], instance['api_key_encrypted'])
+        async with N8nClient(instance['url'], instance['api_key_encrypted']) as client:
+            workflows = await client.get_workflows()
         
-        workflows = await client.get_workflows()
-        
-        return [
-            WorkflowResponse(
-                id=wf['id'],
-                name=wf['name'],
-                active=wf['active']
-            )
+        listing = [
+            {'id': wf['id'], 'name': wf['name'], 'active': wf['active']}
             for wf in workflows
         ]
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch workflows: {str(e)}")
+    
+    etag = f'"{hashlib.md5(orjson.dumps(listing)).hexdigest()}"'
+    if if_none_match == etag:
+        return Response(status_code=304, headers={'ETag': etag})
+    response.headers['ETag'] = etag
+    return [WorkflowResponse.model_construct(**wf) for wf in listing]
 
 
 @router.get("/workflows/{workflow_id}", response_model=WorkflowDetail, tags=["Workflows"])
 async def get_workflow(
     workflow_id: str,
     instance_id: str = Query(..., description="ID of the n8n instance"),
-    supabase=Depends(get_supabase)
+    supabase: AsyncSupabase = Depends(get_async_supabase)
 ):
     """
     Get a specific workflow with full details including input schema.
     """
     try:
         # Get instance details
-        instance_response = await asyncio.to_thread(
-            lambda: supabase.table('instances').select('*').eq('id', instance_id).eq('is_active', True).execute()
-        )
+        instance = await get_active_instance(supabase, instance_id)
         
-        if not instance_response.data:
+        if instance is None:
             raise HTTPException(status_code=404, detail="Instance not found")
         
-        instance = instance_response.data[0]
-        
         # Connect to n8n instance
-        from api.n8n_service import N8nClient, parse_input_schema, parse_output_schema
-        client = N8nClient(instance['url'], instance['api_key_encrypted'])
+        async with N8nClient(instance['url'], instance['api_key_encrypted']) as client:
+            workflow = await client.get_workflow_by_id(workflow_id)
         
-        workflow = await client.get_workflow_by_id(workflow_id)
-        
-        # Parse input and output schemas from workflow
+        # Parse input and output schemas from workflow. Each parser runs its
+        # own early-exit walk of the nodes (not memoized); N8nClient caches
+        # the workflow dict itself, so repeat reads skip the n8n fetch.
         input_schema = parse_input_schema(workflow)
         output_schema = parse_output_schema(workflow)
         
-        return WorkflowDetail(
+        # response_model validates the node graph on the way out; building
+        # the model unvalidated here avoids walking it twice
+        return WorkflowDetail.model_construct(
             id=workflow['id'],
             name=workflow['name'],
             active=workflow['active'],
@@ -130,7 +142,7 @@ async def get_workflow(
 async def execute_workflow(
     workflow_id: str,
     request_data: WorkflowExecuteRequest,
-    supabase=Depends(get_supabase)
+    executor: WorkflowExecutor = Depends(get_workflow_executor)
 ):
     """
     Execute a workflow with the provided input data.
@@ -142,12 +154,6 @@ async def execute_workflow(
     4. Returns a run_id for tracking
     """
     try:
-        # Use the shared WorkflowExecutor service
-        from api.workflow_service import WorkflowExecutor
-        
-        # Initialize executor (config is not strictly used by the class currently, so None is fine)
-        executor = WorkflowExecutor(supabase, None)
-        
         # Queue the execution
         # Note: We use a placeholder user_id for MVP
         run_id = await executor.queue_execution(
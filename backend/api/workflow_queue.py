@@ -0,0 +1,64 @@
+"""
+Postgres-backed queue for workflow executions.
+
+Thin wrappers over the pgmq RPC functions defined in
+SUPABASE_CREATE_WORKFLOW_QUEUE.sql. Producers (WorkflowExecutor) enqueue a
+run and return immediately; the worker in api.workflow_worker reads
+batches and runs them as coroutines on its own event loop.
+"""
+
+from typing import Any, Dict, List
+
+WORKFLOW_QUEUE = "workflows"
+
+
+async def send_execution(supabase_client, payload: Dict[str, Any], delay: int = 0) -> int:
+    """
+    Enqueue a workflow execution.
+
+    Args:
+        supabase_client: Async Supabase client
+        payload: JSON-serializable execution message
+        delay: Seconds before the message becomes visible
+
+    Returns:
+        int: pgmq message id
+    """
+    response = await supabase_client.rpc(
+        'pgmq_send', {'queue_name': WORKFLOW_QUEUE, 'msg': payload, 'delay': delay}
+    ).execute()
+    return response.data[0]
+
+
+async def read_executions(supabase_client, visibility_timeout: int, batch_size: int) -> List[Dict[str, Any]]:
+    """
+    Read up to `batch_size` messages, hiding them for `visibility_timeout` seconds.
+
+    A message that is not deleted or archived before the timeout expires
+    becomes visible again, so a crashed worker never loses a run.
+
+    Returns:
+        List of pgmq message records (msg_id, read_ct, enqueued_at, vt, message)
+    """
+    response = await supabase_client.rpc(
+        'pgmq_read', {'queue_name': WORKFLOW_QUEUE, 'vt': visibility_timeout, 'qty': batch_size}
+    ).execute()
+    return response.data or []
+
+
+async def delete_executions(supabase_client, msg_ids: List[int]) -> None:
+    """Acknowledge processed messages."""
+    if not msg_ids:
+        return
+    await supabase_client.rpc(
+        'pgmq_delete', {'queue_name': WORKFLOW_QUEUE, 'msg_ids': msg_ids}
+    ).execute()
+
+
+async def archive_executions(supabase_client, msg_ids: List[int]) -> None:
+    """Move messages that keep failing to the archive table for inspection."""
+    if not msg_ids:
+        return
+    await supabase_client.rpc(
+        'pgmq_archive', {'queue_name': WORKFLOW_QUEUE, 'msg_ids': msg_ids}
+    ).execute()
@@ -2,7 +2,7 @@
 Service for async workflow execution.
 
 This service handles:
-1. Queues workflows to Celery
+1. Queues workflows on the pgmq workflow queue (see api.workflow_queue)
 2. Generates webhook URLs
 3. Handles callbacks from n8n
 
@@ -12,30 +12,165 @@ Key Architecture:
 """
 
 import asyncio
+import hashlib
+import hmac
 import logging
 import uuid
 from datetime import datetime
-from typing import Dict, Any, Optional
+from functools import lru_cache
+from typing import Annotated, Dict, Any, Optional, Tuple
 from urllib.parse import urljoin
 
 import httpx
+import msgspec
+import orjson
+from cachetools import TTLCache
 from pydantic import BaseModel, Field
 
-from api.n8n_service import N8nClient
+from config import settings
+from api.instance_cache import INSTANCE_COLUMNS, cached_instance
+from api.n8n_service import N8nClient, is_webhook_node
+from api.retry import async_retry
+from api.workflow_queue import send_execution
 
 
-# Pydantic models for type hints
-class ExecutionLogCreate(BaseModel):
-    """Pydantic model for creating execution logs."""
-    run_id: str = Field(..., description="Unique identifier for the execution run")
-    user_id: str = Field(..., description="ID of the user executing the workflow")
-    workflow_id: str = Field(..., description="ID of the workflow being executed")
-    instance_id: str = Field(..., description="ID of the n8n instance")
-    status: str = Field(default="pending", description="Current status of execution")
-    input_data: Dict[str, Any] = Field(default_factory=dict, description="Input data for the workflow")
-    created_at: datetime = Field(default_factory=datetime.utcnow, description="When the execution was created")
+# SHA-256 of the callback secret, computed once (None if unset, which rejects
+# every callback). Comparing fixed-length digests keeps compare_digest from
+# leaking the secret's length as well.
+_SECRET_DIGEST: Optional[bytes] = (
+    hashlib.sha256(settings.WORKFLOW_CALLBACK_SECRET_KEY.encode()).digest()
+    if settings.WORKFLOW_CALLBACK_SECRET_KEY else None
+)
+
+# Process-wide client for webhook triggers so keep-alive connections are reused
+# across runs instead of paying a TCP/TLS handshake per execution
+_HTTPX: Optional[httpx.AsyncClient] = None
+
+
+async def get_http_client() -> httpx.AsyncClient:
+    """
+    Get the shared HTTP client used to trigger n8n webhooks, creating it on first use.
+    
+    Returns:
+        httpx.AsyncClient: Pooled client shared by all executions
+    """
+    global _HTTPX
+    if _HTTPX is None or _HTTPX.is_closed:
+        _HTTPX = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=200, max_keepalive_connections=100),
+            timeout=httpx.Timeout(30.0, connect=5.0),
+            http2=True,
+        )
+    return _HTTPX
+
+
+# Webhook trigger retry policy. Webhook POSTs start a workflow and are not
+# idempotent, so only failures before the request is sent are retried; once
+# n8n has it, the call waits up to WEBHOOK_RESPONSE_TIMEOUT for the response
+# (webhooks that respond when the last node finishes can take a while)
+WEBHOOK_MAX_ATTEMPTS = 3
+WEBHOOK_CONNECT_TIMEOUT = 5.0
+WEBHOOK_RESPONSE_TIMEOUT = 300.0
+WEBHOOK_TIMEOUT = httpx.Timeout(
+    WEBHOOK_RESPONSE_TIMEOUT, connect=WEBHOOK_CONNECT_TIMEOUT, pool=WEBHOOK_CONNECT_TIMEOUT
+)
+_WEBHOOK_UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+# (method, n8n webhook URL) per (instance URL, workflow id), so triggers
+# don't fetch and scan the workflow on every run
+_webhook_targets: TTLCache = TTLCache(maxsize=1024, ttl=600)
+
+# Runs whose trigger completes within this many seconds skip the separate
+# 'running' write that precedes it
+RUNNING_STATUS_DELAY = 1.0
+
+
+async def close_http_client() -> None:
+    """Close the shared webhook HTTP client. Called on application shutdown."""
+    global _HTTPX
+    if _HTTPX is not None:
+        await _HTTPX.aclose()
+        _HTTPX = None
+
+
+# Direct Postgres statements, used when a pool is configured. Status updates
+# go through jsonb_populate_record so the same JSON-shaped values the
+# Supabase path sends are cast to each column's type by Postgres.
+# Columns written when a run is recorded, on both the pool and Supabase paths
+EXECUTION_LOG_INSERT_COLUMNS = ('run_id', 'workflow_id', 'instance_id', 'status', 'input_data')
+PG_INSERT_EXECUTION_LOG = f"""
+INSERT INTO execution_logs ({', '.join(EXECUTION_LOG_INSERT_COLUMNS)})
+VALUES ($1, $2, $3, $4, $5::jsonb)
+"""
+PG_GET_INSTANCE = f"SELECT {INSTANCE_COLUMNS} FROM instances WHERE id = $1 AND is_active"
+# Inserts the run and reads its instance in one round-trip; the insert
+# happens even when no active instance row comes back
+PG_INSERT_EXECUTION_LOG_WITH_INSTANCE = f"""
+WITH run AS ({PG_INSERT_EXECUTION_LOG})
+SELECT {INSTANCE_COLUMNS} FROM instances WHERE id = $3 AND is_active
+"""
+
+
+def _pg_update_execution(
+    columns,
+    stamped,
+    from_statuses: Optional[Tuple[str, ...]]
+) -> str:
+    names = ', '.join(f'"{column}"' for column in columns)
+    assignments = [
+        f"({names}) = (SELECT {names} FROM jsonb_populate_record(NULL::execution_logs, $2::jsonb))"
+    ]
+    assignments += [f'"{column}" = now()' for column in stamped]
+    query = f"UPDATE execution_logs SET {', '.join(assignments)} WHERE run_id = $1"
+    if from_statuses:
+        query += " AND status = ANY($3)"
+    return query
+
+
+# Value for a timestamp column in update_execution that should be stamped
+# with the current time: by Postgres' now() on the pool, in Python otherwise
+NOW = object()
+
+
+PG_EXECUTION_EXISTS = "SELECT EXISTS (SELECT 1 FROM execution_logs WHERE run_id = $1)"
+
+# Runs a callback may still complete; anything else is a duplicate delivery
+UNFINISHED_STATUSES = ('pending', 'running')
+# Statuses a run never leaves: update_execution only writes them over an
+# unfinished run, so readers may cache finished rows indefinitely
+TERMINAL_STATUSES = frozenset({'success', 'failed'})
 
 
+# Workflow input as accepted at the API boundary: a non-empty JSON object.
+# Request models use this so FastAPI rejects bad input with a 422 before the
+# executor is reached.
+ExecutionInputData = Annotated[Dict[str, Any], Field(min_length=1)]
+
+
+# Execution log row built by the executor from already-validated values, so
+# it is a plain msgspec struct rather than a validating model. Every field is
+# an execution_logs column; request-scoped values such as user_id stay out.
+# created_at is left to the column's DEFAULT now().
+class ExecutionLogCreate(msgspec.Struct):
+    """Execution log row to insert."""
+    run_id: str
+    workflow_id: str
+    instance_id: str
+    status: str = "pending"
+    input_data: Dict[str, Any] = {}
+
+
+def _execution_log_row(execution_log: ExecutionLogCreate) -> Dict[str, Any]:
+    """
+    Build the insert row, restricted to EXECUTION_LOG_INSERT_COLUMNS.
+    
+    The row is shallow, so input_data goes into the request body by
+    reference instead of being copied first.
+    """
+    return {column: getattr(execution_log, column) for column in EXECUTION_LOG_INSERT_COLUMNS}
+
+
+# Pydantic models for type hints
 class CallbackPayload(BaseModel):
     """Pydantic model for callback payload from n8n."""
     run_id: str = Field(..., description="Unique identifier for the execution run")
@@ -47,19 +182,22 @@ class WorkflowExecutor:
     """
     Service class for executing workflows asynchronously.
     
-    This class handles queuing workflows to Celery and managing the execution lifecycle.
+    This class handles queuing workflows and managing the execution lifecycle.
     """
     
-    def __init__(self, supabase_client, config):
+    def __init__(self, supabase_client, config, pg=None):
         """
         Initialize the WorkflowExecutor.
         
         Args:
-            supabase_client: Client for interacting with Supabase
+            supabase_client: Async Supabase client (api.supabase_async.AsyncSupabase)
             config: Configuration object containing backend URL and other settings
+            pg: Optional asyncpg pool; when set, execution logs and instance
+                lookups use it instead of the Supabase client
         """
         self.supabase = supabase_client
         self.config = config
+        self.pg = pg
         self.logger = logging.getLogger(__name__)
     
     async def queue_execution(
@@ -82,59 +220,159 @@ class WorkflowExecutor:
             str: Unique run_id for tracking the execution
             
         Raises:
-            ValueError: If input_data is invalid
+            ValueError: If the instance is missing or has no URL/API key
         """
-        # Validate input_data is not empty
-        if not input_data or not isinstance(input_data, dict):
-            raise ValueError("input_data must be a non-empty dictionary")
-        
+        # input_data is validated by the request model (ExecutionInputData)
         # Generate unique run_id
         run_id = str(uuid.uuid4())
         
+        message = await self.prepare_execution(run_id, workflow_id, user_id, input_data, instance_id)
+        
+        # Enqueue for the workflow worker, which runs execute_workflow_task
+        await send_execution(self.supabase, message)
+        self.logger.info(f"Queued workflow execution for run_id: {run_id}")
+        
+        # Return run_id immediately
+        return run_id
+    
+    async def defer_execution(
+        self,
+        workflow_id: str,
+        user_id: str,
+        input_data: Dict[str, Any],
+        instance_id: str
+    ) -> str:
+        """
+        Record a pending run and enqueue it without resolving its instance.
+        
+        The request path costs the execution log insert and a queue write;
+        the worker resolves the instance (and fails the run if it is gone)
+        before executing it. The row exists before the message does, so the
+        run_id can be polled immediately and a redelivered message never
+        inserts it twice.
+        
+        Returns:
+            str: Unique run_id for tracking the execution
+        """
+        run_id = str(uuid.uuid4())
+        await self._insert_execution_log(ExecutionLogCreate(
+            run_id=run_id,
+            workflow_id=workflow_id,
+            instance_id=instance_id,
+            status='pending',
+            input_data=input_data
+        ))
+        await send_execution(self.supabase, {
+            'run_id': run_id,
+            'workflow_id': workflow_id,
+            'instance_id': instance_id,
+            'input_data': input_data
+        })
+        self.logger.info(f"Deferred workflow execution for run_id: {run_id}")
+        return run_id
+    
+    async def prepare_execution(
+        self,
+        run_id: str,
+        workflow_id: str,
+        user_id: str,
+        input_data: Dict[str, Any],
+        instance_id: str
+    ) -> Dict[str, Any]:
+        """
+        Record a pending run and build its queue message.
+        
+        The instance is checked here so a bad instance fails the request, but
+        its API key is left out of the message: pgmq keeps messages in a table
+        (and archives poisoned ones), so the worker resolves the key itself.
+        
+        Returns:
+            Dict: Queue message with run_id, webhook_url, input_data,
+            instance_id and workflow_id
+            
+        Raises:
+            ValueError: If the instance is missing or has no URL/API key
+        """
         # Insert row in execution_logs: { run_id, status: 'pending', input_data }
         execution_log = ExecutionLogCreate(
             run_id=run_id,
-            user_id=user_id,
             workflow_id=workflow_id,
             instance_id=instance_id,
             status='pending',
             input_data=input_data
         )
         
-        # Assuming Supabase table name is 'execution_logs'
-        # Insert execution log into Supabase
-        await self._insert_execution_log(execution_log)
+        # Insert the execution log and check the n8n instance URL/API key
+        _instance_credentials(await self._record_execution(execution_log), instance_id)
+        
+        # We need to pass workflow_id to find the webhook path
+        return {
+            'run_id': run_id,
+            'webhook_url': generate_webhook_url(run_id),
+            'input_data': input_data,
+            'instance_id': instance_id,
+            'workflow_id': workflow_id
+        }
+    
+    async def get_instance_credentials(self, instance_id: str) -> Tuple[str, str]:
+        """
+        Resolve an instance's URL and API key, from the instance cache when possible.
         
-        # Get user's n8n instance URL/API key from Supabase
-        instance_details = await self._get_instance_details(instance_id)
-        if not instance_details:
-            raise ValueError(f"Instance with ID {instance_id} not found")
+        Returns:
+            Tuple of (instance_url, api_key)
+            
+        Raises:
+            ValueError: If the instance is missing or has no URL/API key
+        """
+        return _instance_credentials(await self._get_instance_details(instance_id), instance_id)
+    
+    async def _record_execution(self, execution_log: ExecutionLogCreate) -> Optional[Dict[str, Any]]:
+        """
+        Insert the pending execution log and resolve its instance.
         
-        instance_url = instance_details.get("url")
-        api_key = instance_details.get("api_key")
+        With a Postgres pool, an instance cache miss is served by the same
+        statement as the insert; otherwise the two are separate calls.
         
-        if not instance_url or not api_key:
-            raise ValueError("Missing instance URL or API key")
+        Args:
+            execution_log: Execution log data to insert
+            
+        Returns:
+            Dict with id, url and api_key_encrypted, or None if not found
+        """
+        if self.pg is None:
+            await self._insert_execution_log(execution_log)
+            return await self._get_instance_details(execution_log.instance_id)
         
-        # Get workflow's webhook_url (or generate if missing)
-        webhook_url = await self._get_or_generate_webhook_url(run_id)
+        inserted = False
         
-        # Queue Celery task: execute_workflow_task(run_id, webhook_url, input_data)
-        # For MVP, we'll call it directly instead of queueing
-        # We need to pass workflow_id to find the webhook path
-        asyncio.create_task(execute_workflow_task(
-            self.supabase,
-            run_id,
-            webhook_url,
-            input_data,
-            instance_url,
-            api_key,
-            workflow_id
-        ))
-        self.logger.info(f"Started async workflow execution for run_id: {run_id}")
+        async def insert_and_fetch() -> Optional[Dict[str, Any]]:
+            nonlocal inserted
+            row = await self.pg.fetchrow(
+                PG_INSERT_EXECUTION_LOG_WITH_INSTANCE, *self._pg_execution_log_args(execution_log)
+            )
+            inserted = True
+            return dict(row) if row is not None else None
         
-        # Return run_id immediately
-        return run_id
+        try:
+            instance = await cached_instance(execution_log.instance_id, insert_and_fetch)
+        except Exception as e:
+            self.logger.error(f"Failed to insert execution log: {str(e)}")
+            raise
+        # Cache hits, including misses coalesced onto another run's fetch,
+        # still need their own row
+        if not inserted:
+            await self._insert_execution_log(execution_log)
+        return instance
+    
+    @staticmethod
+    def _pg_execution_log_args(execution_log: ExecutionLogCreate) -> Tuple[Any, ...]:
+        return (
+            execution_log.run_id,
+            execution_log.workflow_id,
+            execution_log.instance_id,
+            execution_log.status,
+            orjson.dumps(execution_log.input_data).decode()
+        )
     
     async def _insert_execution_log(self, execution_log: ExecutionLogCreate) -> None:
         """
@@ -144,53 +382,80 @@ class WorkflowExecutor:
             execution_log: Execution log data to insert
         """
         try:
-            # Supabase-py v2 is synchronous, wrap in asyncio.to_thread
-            await asyncio.to_thread(
-                self.supabase.table('execution_logs').insert(execution_log.dict()).execute
-            )
+            if self.pg is not None:
+                await self.pg.execute(PG_INSERT_EXECUTION_LOG, *self._pg_execution_log_args(execution_log))
+                return
+            await self.supabase.table('execution_logs').insert(_execution_log_row(execution_log)).execute()
         except Exception as e:
             self.logger.error(f"Failed to insert execution log: {str(e)}")
             raise
     
     async def _get_instance_details(self, instance_id: str) -> Optional[Dict[str, Any]]:
         """
-        Get n8n instance details from Supabase.
+        Get active n8n instance details, from the shared instance cache when possible.
         
         Args:
             instance_id: ID of the instance to retrieve
             
         Returns:
-            Dict with instance details or None if not found
+            Dict with id, url and api_key_encrypted, or None if not found
         """
         try:
-            response = await asyncio.to_thread(
-                lambda: self.supabase.table('instances').select('*').eq('id', instance_id).execute()
-            )
-            if response.data:
-                return response.data[0]
-            return None
+            return await cached_instance(instance_id, lambda: self._fetch_instance(instance_id))
         except Exception as e:
             self.logger.error(f"Failed to get instance details: {str(e)}")
             raise
     
-    async def _get_or_generate_webhook_url(self, run_id: str) -> str:
-        """
-        Get existing webhook URL for this run or generate a new one.
-        
-        Args:
-            run_id: ID of the execution run
-            
-        Returns:
-            str: The webhook URL for this execution
-        """
-        # Generate webhook URL
-        webhook_url = generate_webhook_url(run_id)
-        
-        # In a real implementation, you might want to store this URL in a database
-        # so you can track the relationship between run_id and webhook_url
-        # For this example, we just generate it on-demand
-        
-        return webhook_url
+    async def _fetch_instance(self, instance_id: str) -> Optional[Dict[str, Any]]:
+        """Load an active instance from Postgres or Supabase, bypassing the cache."""
+        if self.pg is not None:
+            row = await self.pg.fetchrow(PG_GET_INSTANCE, instance_id)
+            return dict(row) if row is not None else None
+        response = await (
+            self.supabase.table('instances')
+            .select(INSTANCE_COLUMNS)
+            .eq('id', instance_id)
+            .eq('is_active', True)
+            .execute()
+        )
+        return response.data[0] if response.data else None
+
+
+def _instance_credentials(instance: Optional[Dict[str, Any]], instance_id: str) -> Tuple[str, str]:
+    """Return (url, api_key) from an instance row, rejecting unusable instances."""
+    if not instance:
+        raise ValueError(f"Instance with ID {instance_id} not found")
+    
+    instance_url = instance.get("url")
+    api_key = instance.get("api_key_encrypted")
+    
+    if not instance_url or not api_key:
+        raise ValueError("Missing instance URL or API key")
+    return instance_url, api_key
+
+
+@async_retry(
+    max_attempts=WEBHOOK_MAX_ATTEMPTS,
+    base_delay=0.5,
+    max_delay=10.0,
+    retry_on=_WEBHOOK_UNSENT_ERRORS
+)
+async def _trigger_webhook(method: str, url: str, payload: Dict[str, Any]) -> httpx.Response:
+    """
+    Call an n8n webhook through the shared client.
+    
+    Only connection and pool errors are retried, since the request never
+    reached n8n; anything after that could start the workflow twice.
+    
+    Raises:
+        httpx.HTTPStatusError: If n8n rejects the request (not retried)
+        httpx.TimeoutException: If n8n could not be reached after
+            WEBHOOK_MAX_ATTEMPTS, or did not respond within WEBHOOK_RESPONSE_TIMEOUT
+    """
+    client = await get_http_client()
+    response = await client.request(method, url, json=payload, timeout=WEBHOOK_TIMEOUT)
+    response.raise_for_status()
+    return response
 
 
 def generate_webhook_url(run_id: str) -> str:
@@ -203,14 +468,155 @@ def generate_webhook_url(run_id: str) -> str:
     Returns:
         str: The full webhook URL in format https://your-backend.com/v1/webhook/callback/{run_id}
     """
-    from config import settings
-    base_url = settings.BACKEND_URL or "http://localhost:8000"
+    return f"{_webhook_base(settings.BACKEND_URL)}{run_id}"
+
+
+@lru_cache(maxsize=4)
+def _webhook_base(backend_url: Optional[str]) -> str:
+    """Callback URL prefix for a backend URL, joined once rather than per run."""
+    # Format: https://your-backend.com/api/v1/webhook/callback/
+    return urljoin(backend_url or "http://localhost:8000", "/api/v1/webhook/callback/")
+
+
+async def update_execution(
+    supabase_client,
+    run_id: str,
+    values: Dict[str, Any],
+    from_statuses: Optional[Tuple[str, ...]] = None,
+    pg=None
+) -> bool:
+    """
+    Write status fields to a run's execution log.
+    
+    Goes straight to Postgres when a pool is given, otherwise through the
+    async Supabase client.
+    
+    Args:
+        supabase_client: Async Supabase client
+        run_id: The unique identifier for the execution run
+        values: Columns to update; timestamp columns may be set to NOW
+        from_statuses: Only update the row while its status is one of these,
+            so a run that has already moved on is not overwritten. Writes
+            of a terminal status default to UNFINISHED_STATUSES.
+        pg: Optional asyncpg pool
+        
+    Returns:
+        bool: True if a row was updated
+    """
+    if from_statuses is None and values.get('status') in TERMINAL_STATUSES:
+        from_statuses = UNFINISHED_STATUSES
+    stamped = [column for column, value in values.items() if value is NOW]
+    if pg is not None:
+        data = {column: value for column, value in values.items() if value is not NOW}
+        args = [run_id, orjson.dumps(data).decode()]
+        if from_statuses:
+            args.append(list(from_statuses))
+        result = await pg.execute(_pg_update_execution(data, stamped, from_statuses), *args)
+        return result != 'UPDATE 0'
+    if stamped:
+        now = datetime.utcnow().isoformat()
+        values = {**values, **{column: now for column in stamped}}
+    query = supabase_client.table('execution_logs').update(values).eq('run_id', run_id)
+    if from_statuses:
+        query = query.in_('status', list(from_statuses))
+    response = await query.execute()
+    return bool(response.data)
+
+
+async def _mark_running(supabase_client, run_id: str, started_at: str, pg=None) -> None:
+    """Mark a pending run as running, logging rather than raising on failure."""
+    try:
+        await update_execution(
+            supabase_client,
+            run_id,
+            {'status': 'running', 'started_at': started_at},
+            from_statuses=('pending',),
+            pg=pg
+        )
+    except Exception as e:
+        logging.error(f"Failed to update execution status to 'running': {str(e)}")
+
+
+async def _resolve_webhook_target(
+    instance_url: str,
+    api_key: str,
+    workflow_id: str
+) -> Tuple[str, str]:
+    """
+    Find the workflow's webhook node and return its (method, n8n webhook URL).
+    
+    Raises:
+        Exception: If the workflow has no usable webhook node
+    """
+    # Fetch workflow to find webhook path
+    async with N8nClient(instance_url, api_key) as n8n_client:
+        workflow = await n8n_client.get_workflow_by_id(workflow_id)
+    nodes = workflow.get("nodes", [])
+    webhook_node = next((n for n in nodes if is_webhook_node(n)), None)
+    
+    if not webhook_node:
+        raise Exception("No Webhook node found in workflow")
+        
+    # Extract path and method
+    params = webhook_node.get("parameters", {})
+    path = params.get("path", "")
+    method = params.get("httpMethod", "POST")
+    
+    if not path:
+        raise Exception("Webhook node has no path configured")
+        
+    # Construct n8n webhook URL
+    # n8n webhook URLs are typically /webhook/{path}
+    # Ensure instance_url ends with /
+    base_url = instance_url.rstrip("/")
+    return method, f"{base_url}/webhook/{path}"
+
+
+async def _trigger_workflow(
+    run_id: str,
+    webhook_url: str,
+    input_data: Dict[str, Any],
+    instance_url: str,
+    api_key: str,
+    workflow_id: str
+) -> None:
+    """
+    POST the run's input to the workflow's n8n webhook.
     
-    # Format: https://your-backend.com/v1/webhook/callback/{run_id}
-    webhook_path = f"/api/v1/webhook/callback/{run_id}"
-    webhook_url = urljoin(base_url, webhook_path)
+    The webhook's method and URL are remembered per workflow, so repeat
+    runs skip fetching the workflow from n8n. A 404 from a remembered URL
+    means the webhook changed; it is resolved again and retried once.
+    
+    Raises:
+        Exception: If the workflow has no usable webhook node
+        httpx.HTTPStatusError: If n8n rejects the request
+        httpx.TimeoutException: If n8n could not be reached or did not respond
+    """
+    # Prepare payload: input_data + _callback_url
+    payload = {
+        **input_data,
+        "_callback_url": webhook_url,
+        "_run_id": run_id
+    }
     
-    return webhook_url
+    key = (instance_url, workflow_id)
+    target = _webhook_targets.get(key)
+    if target is None:
+        target = _webhook_targets[key] = await _resolve_webhook_target(instance_url, api_key, workflow_id)
+    else:
+        try:
+            logging.info(f"Triggering n8n webhook: {target[1]}")
+            await _trigger_webhook(*target, payload)
+            return
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code != 404:
+                raise
+            # Drop the stale definition too so the workflow is fetched fresh
+            N8nClient.invalidate_for(instance_url, api_key, workflow_id)
+            target = _webhook_targets[key] = await _resolve_webhook_target(instance_url, api_key, workflow_id)
+    
+    logging.info(f"Triggering n8n webhook: {target[1]}")
+    await _trigger_webhook(*target, payload)
 
 
 async def execute_workflow_task(
@@ -220,171 +626,174 @@ async def execute_workflow_task(
     input_data: Dict[str, Any], 
     instance_url: str, 
     api_key: str,
-    workflow_id: str
+    workflow_id: str,
+    pg=None
 ) -> None:
     """
-    Celery task to execute the workflow.
+    Trigger a queued workflow run on n8n and record its status.
     
     This function:
-    - Updates execution_logs: status = 'running'
-    - Fetches n8n instance URL + API key from Supabase Vault
-    - POSTs input_data to n8n webhook_url
-    - Handles exceptions, updates status to 'failed'
-    - Sets timeout: 15 minutes per execution
+    - POSTs input_data to the workflow's n8n webhook
+    - Updates execution_logs: status = 'running' once, either when the
+      trigger is slower than RUNNING_STATUS_DELAY or after it succeeds
+    - Handles exceptions, updates status to 'failed' in a single write,
+      unless a callback has already finished the run
+    - Retries connection failures with jittered backoff; a request n8n has
+      received is never sent again
     
     Args:
-        supabase_client: Supabase client instance
+        supabase_client: Async Supabase client
         run_id: The unique identifier for the execution run
         webhook_url: The webhook URL to call
         input_data: Input data to send to the workflow
         instance_url: URL of the n8n instance
         api_key: API key for the n8n instance
+        workflow_id: ID of the workflow to trigger
+        pg: Optional asyncpg pool for the status writes
     """
+    # Taken here rather than with now() since the 'running' write may come
+    # after the trigger has finished
+    started_at = datetime.utcnow().isoformat()
+    trigger = asyncio.ensure_future(
+        _trigger_workflow(run_id, webhook_url, input_data, instance_url, api_key, workflow_id)
+    )
     
-    # Update execution_logs: status = 'running'
     try:
-        await asyncio.to_thread(
-            lambda: supabase_client.table('execution_logs')
-            .update({'status': 'running', 'started_at': datetime.utcnow().isoformat()})
-            .eq('run_id', run_id)
-            .execute()
-        )
-    except Exception as e:
-        logging.error(f"Failed to update execution status to 'running': {str(e)}")
-        return  # Exit if we can't update status - continuing would be inconsistent
-    
-    # Create n8n client
-    n8n_client = N8nClient(instance_url, api_key)
-    
-    # Set timeout to 15 minutes (900 seconds)
-    timeout = httpx.Timeout(900.0)  # 15 minutes
-    
-    try:
-            # Fetch workflow to find webhook path
-            workflow = await n8n_client.get_workflow_by_id(workflow_id)
-            nodes = workflow.get("nodes", [])
-            webhook_node = next((n for n in nodes if "webhook" in n.get("type", "").lower()), None)
-            
-            if not webhook_node:
-                raise Exception("No Webhook node found in workflow")
-                
-            # Extract path and method
-            params = webhook_node.get("parameters", {})
-            path = params.get("path", "")
-            method = params.get("httpMethod", "POST")
-            
-            if not path:
-                raise Exception("Webhook node has no path configured")
-                
-            # Construct n8n webhook URL
-            # n8n webhook URLs are typically /webhook/{path}
-            # Ensure instance_url ends with /
-            base_url = instance_url.rstrip("/")
-            n8n_webhook_url = f"{base_url}/webhook/{path}"
-            
-            logging.info(f"Triggering n8n webhook: {n8n_webhook_url}")
-            
-            # Prepare payload: input_data + _callback_url
-            payload = {
-                **input_data,
-                "_callback_url": webhook_url,
-                "_run_id": run_id
-            }
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.request(method, n8n_webhook_url, json=payload)
-                response.raise_for_status()
-            
-            logging.info(f"Successfully triggered workflow for run_id: {run_id}")
-            
-    except httpx.TimeoutException:
+        # Fast triggers get one status write; slow ones are shown as running
+        # while n8n is still being called
+        done, _ = await asyncio.wait({trigger}, timeout=RUNNING_STATUS_DELAY)
+        if not done:
+            await _mark_running(supabase_client, run_id, started_at, pg)
+        await trigger
+    except httpx.TimeoutException as e:
         logging.error(f"Workflow execution timed out for run_id: {run_id}")
+        if isinstance(e, _WEBHOOK_UNSENT_ERRORS):
+            error_message = f'Webhook trigger timed out after {WEBHOOK_MAX_ATTEMPTS} attempts'
+        else:
+            error_message = f'Webhook trigger timed out waiting {WEBHOOK_RESPONSE_TIMEOUT:.0f}s for n8n to respond'
         # Update execution_logs: status = 'failed' with timeout message
         try:
-            await asyncio.to_thread(
-                lambda: supabase_client.table('execution_logs')
-                .update({
-                    'status': 'failed', 
-                    'error_message': 'Execution timed out after 15 minutes',
-                    'completed_at': datetime.utcnow().isoformat()
-                })
-                .eq('run_id', run_id)
-                .execute()
-            )
+            await update_execution(supabase_client, run_id, {
+                'status': 'failed', 
+                'error_message': error_message,
+                'started_at': started_at,
+                'completed_at': NOW
+            }, from_statuses=UNFINISHED_STATUSES, pg=pg)
         except Exception as e:
             logging.error(f"Failed to update execution status after timeout: {str(e)}")
     except Exception as e:
         logging.error(f"Failed to execute workflow for run_id {run_id}: {str(e)}")
         # Update execution_logs: status = 'failed' with error message
         try:
-            await asyncio.to_thread(
-                lambda: supabase_client.table('execution_logs')
-                .update({
-                    'status': 'failed', 
-                    'error_message': str(e),
-                    'completed_at': datetime.utcnow().isoformat()
-                })
-                .eq('run_id', run_id)
-                .execute()
-            )
+            await update_execution(supabase_client, run_id, {
+                'status': 'failed', 
+                'error_message': str(e),
+                'started_at': started_at,
+                'completed_at': NOW
+            }, from_statuses=UNFINISHED_STATUSES, pg=pg)
         except Exception as update_error:
             logging.error(f"Failed to update execution status after error: {str(update_error)}")
+    else:
+        if done:
+            await _mark_running(supabase_client, run_id, started_at, pg)
+        logging.info(f"Successfully triggered workflow for run_id: {run_id}")
+    finally:
+        # Only pending if this task was cancelled mid-trigger
+        trigger.cancel()
+
+
+async def _execution_exists(supabase_client, run_id: str, pg=None) -> bool:
+    """Check whether an execution log row exists for run_id."""
+    if pg is not None:
+        return await pg.fetchval(PG_EXECUTION_EXISTS, run_id)
+    response = await supabase_client.table('execution_logs').select('run_id').eq('run_id', run_id).execute()
+    return bool(response.data)
+
+
+def verify_callback_secret(secret_key: str) -> bool:
+    """
+    Check a callback's secret against WORKFLOW_CALLBACK_SECRET_KEY.
+    
+    compare_digest avoids leaking the secret through early-exit timing.
+    """
+    return _SECRET_DIGEST is not None and hmac.compare_digest(
+        hashlib.sha256(secret_key.encode()).digest(), _SECRET_DIGEST
+    )
 
 
 async def handle_workflow_callback(
     supabase_client,
     run_id: str, 
     output_data: Dict[str, Any], 
-    secret_key: str
+    secret_key: str,
+    pg=None
 ) -> bool:
     """
     Handle callback from n8n workflow execution.
     
     This function:
     - Validates secret_key matches (stored in env var)
-    - Finds execution_logs row by run_id
-    - Updates: { status: 'success', output_data, completed_at }
-    - Can trigger Supabase Realtime event (optional, for WebSocket push)
+    - Records the result through record_workflow_callback
     
     Args:
-        supabase_client: Supabase client instance
+        supabase_client: Async Supabase client
         run_id: The unique identifier for the execution run
         output_data: Output data from the workflow execution
         secret_key: Secret key for authentication
+        pg: Optional asyncpg pool
         
     Returns:
-        bool: True if callback was handled successfully, False otherwise
+        bool: True if callback was handled successfully or was a duplicate,
+        False otherwise
     """
-    import os
-    from config import settings
-    
     # Validate secret_key matches (stored in env var)
-    expected_secret = settings.WORKFLOW_CALLBACK_SECRET_KEY
-    if not expected_secret or secret_key != expected_secret:
+    if not verify_callback_secret(secret_key):
         logging.warning(f"Invalid secret key for callback with run_id: {run_id}")
         return False
     
-    try:
-        # Find execution_logs row by run_id
-        response = await asyncio.to_thread(
-            lambda: supabase_client.table('execution_logs').select('*').eq('run_id', run_id).execute()
-        )
-        
-        if not response.data:
-            logging.warning(f"Execution log not found for run_id: {run_id}")
-            return False
+    return await record_workflow_callback(supabase_client, run_id, output_data, pg=pg)
+
+
+async def record_workflow_callback(
+    supabase_client,
+    run_id: str,
+    output_data: Dict[str, Any],
+    pg=None
+) -> bool:
+    """
+    Record the result of a callback whose secret was already verified.
+    
+    This function:
+    - Updates the execution_logs row for run_id: { status: 'success', output_data, completed_at },
+      only while the run is unfinished so n8n's retries of a delivered
+      callback write nothing
+    - Can trigger Supabase Realtime event (optional, for WebSocket push)
+    
+    Args:
+        supabase_client: Async Supabase client
+        run_id: The unique identifier for the execution run
+        output_data: Output data from the workflow execution
+        pg: Optional asyncpg pool
         
+    Returns:
+        bool: True if callback was recorded or was a duplicate, False otherwise
+    """
+    try:
         # Update: { status: 'success', output_data, completed_at }
-        await asyncio.to_thread(
-            lambda: supabase_client.table('execution_logs')
-            .update({
-                'status': 'success',
-                'output_data': output_data,
-                'completed_at': datetime.utcnow().isoformat()
-            })
-            .eq('run_id', run_id)
-            .execute()
-        )
+        # The update reports whether it matched, so no lookup is needed first
+        updated = await update_execution(supabase_client, run_id, {
+            'status': 'success',
+            'output_data': output_data,
+            'completed_at': NOW
+        }, from_statuses=UNFINISHED_STATUSES, pg=pg)
+        
+        if not updated:
+            # Either a retried delivery for a finished run or an unknown run_id
+            if not await _execution_exists(supabase_client, run_id, pg):
+                logging.warning(f"Execution log not found for run_id: {run_id}")
+                return False
+            logging.info(f"Ignoring duplicate callback for finished run_id: {run_id}")
+            return True
         
         logging.info(f"Successfully updated execution log for run_id: {run_id}")
         
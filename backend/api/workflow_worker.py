@@ -0,0 +1,205 @@
+"""
+Async worker for queued workflow executions.
+
+Reads the pgmq workflow queue whenever a run slot is free and runs
+execute_workflow_task for each message as a task on the event loop, so there
+is no asyncio.run-per-task or thread pool in between and a slow run only
+holds its own slot.
+
+Run standalone with:
+    python -m api.workflow_worker
+
+or in-process alongside the API by setting WORKFLOW_WORKER_IN_PROCESS=true.
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, Optional, Set
+
+from api.n8n_service import shutdown_pools
+from api.pg_pool import create_pg_pool
+from api.supabase_async import AsyncSupabase
+from api.workflow_queue import archive_executions, delete_executions, read_executions
+from api.workflow_service import (
+    NOW, UNFINISHED_STATUSES, WEBHOOK_RESPONSE_TIMEOUT, WorkflowExecutor,
+    close_http_client, execute_workflow_task, generate_webhook_url, update_execution
+)
+
+logger = logging.getLogger(__name__)
+
+# Messages delivered more often than this are archived instead of retried
+MAX_DELIVERIES = 3
+
+# Seconds a read message stays hidden. Must outlast the slowest run, or the
+# message is redelivered and the workflow started again while still running:
+# a trigger can wait WEBHOOK_RESPONSE_TIMEOUT twice (once more after a stale
+# webhook URL is re-resolved), plus connect retries and workflow lookups
+VISIBILITY_TIMEOUT = int(2 * WEBHOOK_RESPONSE_TIMEOUT) + 300
+
+
+class WorkflowWorker:
+    """
+    Polls the workflow queue and executes runs concurrently.
+    """
+
+    def __init__(
+        self,
+        supabase_client,
+        batch_size: int = 10,
+        max_concurrency: int = 50,
+        visibility_timeout: int = VISIBILITY_TIMEOUT,
+        poll_interval: float = 1.0,
+        pg=None
+    ):
+        """
+        Initialize the worker.
+
+        Args:
+            supabase_client: Async Supabase client used for the queue and execution logs
+            batch_size: Maximum messages read per poll
+            max_concurrency: Maximum runs in flight; reads stop while all are busy
+            visibility_timeout: Seconds a read message stays hidden from other workers
+            poll_interval: Seconds to wait when the queue is empty
+            pg: Optional asyncpg pool for execution log reads and writes
+        """
+        self.supabase = supabase_client
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.visibility_timeout = visibility_timeout
+        self.poll_interval = poll_interval
+        self.pg = pg
+        self.executor = WorkflowExecutor(supabase_client, None, pg=pg)
+        self._in_flight: Set[asyncio.Task] = set()
+
+    async def _mark_failed(self, run_id: str, error: str) -> None:
+        try:
+            await update_execution(self.supabase, run_id, {
+                'status': 'failed',
+                'error_message': error,
+                'completed_at': NOW
+            }, from_statuses=UNFINISHED_STATUSES, pg=self.pg)
+        except Exception as e:
+            logger.error(f"Failed to mark run {run_id} as failed: {str(e)}")
+
+    async def _execute(self, message: Dict[str, Any]) -> None:
+        try:
+            # Messages carry only the instance id; the API key stays out of
+            # the queue tables and is resolved through the instance cache
+            if 'instance_id' in message:
+                instance_url, api_key = await self.executor.get_instance_credentials(message['instance_id'])
+            else:
+                # Queued before messages stopped carrying credentials
+                instance_url, api_key = message['instance_url'], message['api_key']
+        except ValueError as e:
+            logger.error(f"Cannot run {message['run_id']}: {str(e)}")
+            await self._mark_failed(message['run_id'], str(e))
+            return
+
+        await execute_workflow_task(
+            self.supabase,
+            message['run_id'],
+            # Deferred runs (WorkflowExecutor.defer_execution) leave the
+            # callback URL to the worker; their row is already recorded
+            message.get('webhook_url') or generate_webhook_url(message['run_id']),
+            message['input_data'],
+            instance_url,
+            api_key,
+            message['workflow_id'],
+            pg=self.pg
+        )
+
+    async def _process(self, record: Dict[str, Any]) -> None:
+        """Run one message and acknowledge it as soon as its run finishes."""
+        try:
+            await self._execute(record['message'])
+        except Exception as e:
+            logger.error(f"Workflow message {record['msg_id']} raised: {e}")
+        # execute_workflow_task records its own failures on the execution log,
+        # so every message that ran is acknowledged regardless of outcome
+        await delete_executions(self.supabase, [record['msg_id']])
+
+    def _finished(self, task: asyncio.Task) -> None:
+        self._in_flight.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Failed to acknowledge {task.get_name()}: {task.exception()}")
+
+    async def run_once(self) -> int:
+        """
+        Read up to one message per free slot and start running them.
+
+        Runs are started as tasks rather than awaited, so a slow run holds
+        only its own slot and the next read can happen straight away.
+
+        Returns:
+            int: Number of messages read
+        """
+        free = self.max_concurrency - len(self._in_flight)
+        if free <= 0:
+            return 0
+        records = await read_executions(self.supabase, self.visibility_timeout, min(self.batch_size, free))
+        if not records:
+            return 0
+
+        poisoned = [r['msg_id'] for r in records if r.get('read_ct', 1) > MAX_DELIVERIES]
+        runnable = [r for r in records if r['msg_id'] not in poisoned]
+        if poisoned:
+            logger.error(f"Archiving {len(poisoned)} workflow messages after {MAX_DELIVERIES} deliveries")
+            await archive_executions(self.supabase, poisoned)
+
+        for record in runnable:
+            task = asyncio.create_task(self._process(record), name=f"workflow message {record['msg_id']}")
+            self._in_flight.add(task)
+            task.add_done_callback(self._finished)
+
+        return len(records)
+
+    async def drain(self) -> None:
+        """Wait for every started run to finish."""
+        while self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+
+    async def run(self, stop_event: Optional[asyncio.Event] = None) -> None:
+        """
+        Poll until `stop_event` is set (or forever), then let started runs finish.
+        """
+        stop_event = stop_event or asyncio.Event()
+        logger.info("Workflow worker started")
+        while not stop_event.is_set():
+            if len(self._in_flight) >= self.max_concurrency:
+                # Every slot is busy; read again as soon as one frees up
+                await asyncio.wait(
+                    set(self._in_flight), timeout=self.poll_interval, return_when=asyncio.FIRST_COMPLETED
+                )
+                continue
+            try:
+                processed = await self.run_once()
+            except Exception as e:
+                logger.error(f"Workflow worker poll failed: {str(e)}")
+                processed = 0
+            if not processed:
+                try:
+                    await asyncio.wait_for(stop_event.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        await self.drain()
+        logger.info("Workflow worker stopped")
+
+
+async def main() -> None:
+    from config import settings
+
+    supabase = AsyncSupabase(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_ROLE_KEY)
+    pg = await create_pg_pool(settings.SUPABASE_DB_URL) if settings.SUPABASE_DB_URL else None
+    try:
+        await WorkflowWorker(supabase, pg=pg).run()
+    finally:
+        if pg is not None:
+            await pg.close()
+        await supabase.aclose()
+        await close_http_client()
+        await shutdown_pools()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -4,7 +4,9 @@ Configuration management using Pydantic Settings.
 This module loads environment variables into a typed Pydantic model,
 providing validation and IDE support.
 """
-from pydantic import HttpUrl
+from functools import lru_cache
+from typing import Optional
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -20,9 +22,15 @@ class Settings(BaseSettings):
     )
 
     # Supabase
-    SUPABASE_URL: HttpUrl
+    # URLs are kept as plain strings; they are only joined into request URLs,
+    # so URL parsing at startup would be wasted work
+    SUPABASE_URL: str
     SUPABASE_ANON_KEY: str
     SUPABASE_SERVICE_ROLE_KEY: str
+    # Direct Postgres connection string (optional). Either the direct
+    # connection or the transaction-mode pooler works; the pool disables
+    # asyncpg's prepared statement cache.
+    SUPABASE_DB_URL: Optional[str] = None
 
     # Redis
     REDIS_URL: str  # Pydantic doesn't have a RedisDsn type, string is fine
@@ -31,7 +39,7 @@ class Settings(BaseSettings):
     JWT_SECRET: str
 
     # n8n
-    N8N_API_BASE_URL: HttpUrl
+    N8N_API_BASE_URL: str
 
     # CORS Origins
     FRONTEND_URL: str
@@ -43,10 +51,25 @@ class Settings(BaseSettings):
     # Webhook security
     WORKFLOW_CALLBACK_SECRET_KEY: str = "change-in-production"
     
+    # Run the workflow queue worker inside the API process
+    # Set to false when running `python -m api.workflow_worker` separately
+    WORKFLOW_WORKER_IN_PROCESS: bool = True
+    
     # Logging
     LOG_LEVEL: str = "INFO"
     ENVIRONMENT: str = "development"
 
 
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """
+    Return the process-wide settings, reading the environment only once.
+
+    Returns:
+        Settings: The loaded application settings
+    """
+    return Settings()
+
+
 # Instantiate the settings object
-settings = Settings()
+settings = get_settings()
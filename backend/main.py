@@ -4,23 +4,26 @@ Main application file for the FastAPI backend.
 This file initializes the FastAPI app, configures middleware,
 sets up exception handlers, and includes the API routers.
 """
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 
+import redis.asyncio as aioredis
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from fastapi.exceptions import RequestValidationError
 from pydantic import ValidationError
 
 from config import settings
 from api.router import api_router
-from api.v1 import dashboards
-from models import models
-from models.database import engine
-
-# Create database tables
-#models.Base.metadata.create_all(bind=engine)
+from api.loaders import table_loader
+from api.n8n_service import shutdown_pools
+from api.pg_pool import create_pg_pool
+from api.supabase_async import AsyncSupabase
+from api.workflow_service import WorkflowExecutor, close_http_client
+from api.workflow_worker import WorkflowWorker
+from api.v1 import dashboards, instances
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -39,17 +42,56 @@ async def lifespan(app: FastAPI):
     logger.info(f"Frontend URL: {settings.FRONTEND_URL}")
     
     # Initialize Supabase client
-    from supabase import create_client
-    app.state.supabase = create_client(
-        str(settings.SUPABASE_URL),
+    app.state.supabase_async = AsyncSupabase(
+        settings.SUPABASE_URL,
         settings.SUPABASE_SERVICE_ROLE_KEY
     )
     logger.info("Supabase client initialized")
     
+    # Single-row reads from concurrent requests are batched into one query
+    app.state.run_loader = table_loader(app.state.supabase_async, 'execution_logs', 'run_id')
+    app.state.instance_loader = table_loader(
+        app.state.supabase_async, 'instances', 'id', instances.INSTANCE_COLUMNS
+    )
+    
+    # Optional direct Postgres pool for dashboard reads and execution log
+    # writes; without it both go through Supabase
+    app.state.pg = None
+    if settings.SUPABASE_DB_URL:
+        app.state.pg = await create_pg_pool(settings.SUPABASE_DB_URL)
+        logger.info("Postgres pool initialized")
+    
+    # One executor shared by every request; it holds no per-request state
+    app.state.workflow_executor = WorkflowExecutor(app.state.supabase_async, settings, pg=app.state.pg)
+    
+    # Redis backs the dashboard read-through cache
+    app.state.redis = aioredis.from_url(settings.REDIS_URL)
+    logger.info("Redis client initialized")
+    
+    worker_stop = asyncio.Event()
+    worker_task = None
+    if settings.WORKFLOW_WORKER_IN_PROCESS:
+        worker_task = asyncio.create_task(WorkflowWorker(app.state.supabase_async, pg=app.state.pg).run(worker_stop))
+        logger.info("In-process workflow worker started")
+    
     yield
     
     logger.info("Shutting down...")
-    # Cleanup connections if needed
+    if worker_task is not None:
+        worker_stop.set()
+        await worker_task
+        logger.info("Workflow worker stopped")
+    await app.state.supabase_async.aclose()
+    logger.info("Async Supabase client closed")
+    await app.state.redis.aclose()
+    logger.info("Redis client closed")
+    if app.state.pg is not None:
+        await app.state.pg.close()
+        logger.info("Postgres pool closed")
+    await shutdown_pools()
+    logger.info("n8n connection pools closed")
+    await close_http_client()
+    logger.info("Webhook HTTP client closed")
 
 
 app = FastAPI(
@@ -57,29 +99,31 @@ app = FastAPI(
     description="Backend services for the n8n-interface.",
     version="0.1.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 # --- Middleware ---
-# Filter out empty CORS origins
-cors_origins = [
-    origin for origin in [settings.FRONTEND_URL, settings.PRODUCTION_FRONTEND_URL]
-    if origin and origin.strip() != ""
-]
-
-# Add localhost for development
-if settings.ENVIRONMENT == "development":
-    cors_origins.extend([
-        "http://localhost:5173",
-        "http://localhost:3000",
-        "http://127.0.0.1:5173",
-    ])
+# Filter out empty and duplicate CORS origins (FRONTEND_URL and
+# PRODUCTION_FRONTEND_URL are often the same in a single deployment)
+cors_origins = list(dict.fromkeys(
+    origin.strip() for origin in [settings.FRONTEND_URL, settings.PRODUCTION_FRONTEND_URL]
+    if origin and origin.strip()
+))
+
+# Allow any localhost port for development
+cors_origin_regex = (
+    r"^https?://(localhost|127\.0\.0\.1)(:\d+)?$"
+    if settings.ENVIRONMENT == "development" else None
+)
 
 app.add_middleware(
     CORSMiddleware,
     allow_origins=cors_origins,
+    allow_origin_regex=cors_origin_regex,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 
@@ -90,7 +134,7 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
     Global handler for Pydantic's RequestValidationError.
     Formats the error into a more readable structure.
     """
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=422,
         content={"detail": "Validation Error", "errors": exc.errors()},
     )
@@ -101,7 +145,7 @@ async def pydantic_validation_exception_handler(request: Request, exc: Validatio
     """
     Global handler for Pydantic's base ValidationError.
     """
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=422,
         content={"detail": "Pydantic Validation Error", "errors": exc.errors()},
     )
@@ -112,7 +156,7 @@ async def not_found_exception_handler(request: Request, exc: Exception):
     """
     Global handler for 404 Not Found errors.
     """
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=404,
         content={"detail": "Not Found", "path": request.url.path},
     )
@@ -125,7 +169,7 @@ async def generic_exception_handler(request: Request, exc: Exception):
     Returns a generic 500 Internal Server Error response.
     """
     logger.error(f"Unhandled exception for {request.method} {request.url}: {exc}", exc_info=True)
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={"detail": "Internal Server Error"},
     )
@@ -33,6 +33,7 @@ export default function ExecutionHistory({ workflowId, dashboardId }: ExecutionH
                 workflow_id: workflowId,
                 limit: pageSize.toString(),
                 offset: (page * pageSize).toString(),
+                include_data: 'true',
             });
 
             if (statusFilter) params.append('status', statusFilter);